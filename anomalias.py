@@ -0,0 +1,88 @@
+# ============================================================
+# anomalias.py — detecção de enlaces degradados (latência/perda)
+# Cada host tem um buffer circular com as últimas JANELA_AMOSTRAS
+# latências; a linha de base é a mediana e a dispersão o MAD (desvio
+# absoluto mediano). Tudo numa passada vetorizada (NumPy) por
+# varredura, sem laço Python por host.
+# ============================================================
+import numpy as np
+
+JANELA_AMOSTRAS = 60      # varreduras na linha de base (~10 min a cada 10 s)
+MIN_AMOSTRAS = 12         # antes disso o host não é avaliado
+LIMIAR_ESCORE = 4.0       # desvios robustos acima da mediana
+MIN_DELTA_MS = 20.0       # e pelo menos isso acima da mediana (ms)
+MAD_MINIMO_MS = 1.0       # piso do MAD para enlaces muito estáveis
+LIMIAR_PERDA = 20.0       # perda de pacotes (%) que já conta como degradado
+_K_MAD = 1.4826           # MAD -> desvio-padrão equivalente (normal)
+
+
+def _mediana_linhas(m: np.ndarray, validos: np.ndarray) -> np.ndarray:
+    """
+    Mediana por linha ignorando NaN. np.sort joga os NaN para o fim; com
+    a contagem de válidos de cada linha, a mediana sai por indexação
+    (bem mais rápido que np.nanmedian em matrizes largas).
+    """
+    s = np.sort(m, axis=1)
+    linhas = np.arange(len(s))
+    return 0.5 * (s[linhas, (validos - 1) // 2] + s[linhas, validos // 2])
+
+
+class DetectorAnomalias:
+    """
+    rta/perda chegam como arrays float64 da TabelaEstado (lidos sem cópia
+    via np.frombuffer); NaN = sem medida (host DOWN, sem perfdata).
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self._buf = np.full((n, JANELA_AMOSTRAS), np.nan)
+        self._pos = 0
+        self.escore = np.zeros(n)
+
+    def remapear(self, origem):
+        """
+        Novo inventário: origem[i] é a posição antiga do host i (-1 se é
+        novo). Preserva a linha de base de quem continua.
+        """
+        origem = np.asarray(origem, dtype=np.int64)
+        buf = np.full((len(origem), JANELA_AMOSTRAS), np.nan)
+        existe = origem >= 0
+        buf[existe] = self._buf[origem[existe]]
+        self._buf = buf
+        self.n = len(origem)
+        self.escore = np.zeros(self.n)
+
+    def atualizar(self, rta, perda) -> np.ndarray:
+        """Grava a varredura no buffer e devolve o vetor booleano de degradados."""
+        rta = np.frombuffer(rta, dtype=np.float64)
+        perda = np.frombuffer(perda, dtype=np.float64)
+        self._buf[:, self._pos] = rta
+        self._pos = (self._pos + 1) % JANELA_AMOSTRAS
+
+        validos = np.count_nonzero(~np.isnan(self._buf), axis=1)
+        avaliar = (validos >= MIN_AMOSTRAS) & ~np.isnan(rta)
+        degradado = np.zeros(self.n, dtype=bool)
+        if avaliar.any():
+            buf = self._buf[avaliar]
+            validos = validos[avaliar]
+            mediana = _mediana_linhas(buf, validos)
+            mad = _mediana_linhas(np.abs(buf - mediana[:, None]), validos)
+            delta = rta[avaliar] - mediana
+            escore = delta / (_K_MAD * np.maximum(mad, MAD_MINIMO_MS))
+            self.escore[:] = 0.0
+            self.escore[avaliar] = escore
+            degradado[avaliar] = (escore > LIMIAR_ESCORE) & (delta > MIN_DELTA_MS)
+        with np.errstate(invalid="ignore"):
+            degradado |= perda >= LIMIAR_PERDA
+        return degradado
+
+    def aplicar(self, tabela) -> list:
+        """
+        atualizar() com os arrays da tabela; grava tabela.degradado e
+        devolve as posições cuja marcação mudou.
+        """
+        novo = self.atualizar(tabela.rta, tabela.perda)
+        atual = np.frombuffer(tabela.degradado, dtype=np.uint8)
+        mudou = np.flatnonzero(atual != novo)
+        atual[:] = novo
+        return mudou.tolist()
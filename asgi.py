@@ -0,0 +1,149 @@
+# ============================================================
+# asgi.py — modo assíncrono (ASGI) do servidor
+# Coletor com cliente HTTP assíncrono (httpx, keep-alive + limite
+# de conexões) e streaming de mudanças (/api/stream, SSE).
+# As demais rotas continuam sendo as do Flask (server.py).
+#
+# Uso:
+#   pip install -r requirements-async.txt
+#   uvicorn asgi:app --host 127.0.0.1 --port 8080
+# ============================================================
+import asyncio
+import contextlib
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # versões do Starlette que ainda trazem o adaptador WSGI
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+import server
+
+KEEPALIVE_SSE = 15  # segundos entre comentários ":" para manter a conexão viva
+
+# Evento trocado a cada varredura; clientes do stream aguardam o atual.
+_nova_varredura = asyncio.Event()
+
+# -------------------------------
+# COLETOR ASSÍNCRONO
+# -------------------------------
+
+async def consultar_host(client: httpx.AsyncClient, host: str):
+    """Mesmo contrato de server.consultar_host (data.host, None ou False)."""
+    try:
+        r = await client.get(server.NAGIOS_URL, params={"query": "host", "hostname": host})
+        r.raise_for_status()
+        return r.json().get("data", {}).get("host")
+    except Exception:
+        return False
+
+
+async def varrer(client: httpx.AsyncClient, lista) -> list:
+    # O limite de concorrência é o próprio pool do cliente (max_connections)
+    return await asyncio.gather(*(consultar_host(client, p["host"]) for p in lista))
+
+
+def _sinalizar_varredura():
+    global _nova_varredura
+    anterior, _nova_varredura = _nova_varredura, asyncio.Event()
+    anterior.set()
+
+
+async def coletor_loop():
+    limites = httpx.Limits(
+        max_connections=server.NAGIOS_MAX_CONEXOES,
+        max_keepalive_connections=server.NAGIOS_MAX_CONEXOES,
+    )
+    async with httpx.AsyncClient(
+        auth=(server.NAGIOS_USER, server.NAGIOS_PASS),
+        limits=limites,
+        timeout=httpx.Timeout(8.0, pool=None),  # fila do pool sem timeout
+    ) as client:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not server.REPLICACAO.sou_lider():
+                await asyncio.sleep(1)  # seguidor: os dados vêm do líder (replicacao.py)
+                continue
+            inicio = loop.time()
+            try:
+                # Leitura das planilhas é bloqueante: fora do event loop
+                lista = await asyncio.to_thread(server.reload_if_needed)
+                hostdatas = await varrer(client, lista)
+                agora = int(time.time())
+                # codificar(), anomalias e incidentes são CPU: na thread, para
+                # o event loop seguir atendendo o /api/stream enquanto isso
+                await asyncio.to_thread(server.aplicar_varredura, lista, hostdatas, agora)
+                _sinalizar_varredura()  # _cache já trocado: os streams leem a varredura nova
+                await asyncio.to_thread(server.pos_varredura, agora)
+            except Exception as e:
+                print(f"Falha na varredura do Nagios: {e}")
+            await asyncio.sleep(max(0.0, server.CACHE_SECONDS - (loop.time() - inicio)))
+
+# -------------------------------
+# STREAM DE MUDANÇAS (SSE)
+# -------------------------------
+
+def _evento(nome: str, corpo: bytes) -> bytes:
+    return b"event: " + nome.encode() + b"\ndata: " + corpo + b"\n\n"
+
+
+async def api_stream(request):
+    """
+    Server-Sent Events: um "snapshot" inicial com a lista inteira e, a cada
+    varredura, um evento "mudancas" só com os hosts alterados. Conexões
+    ociosas custam apenas uma corrotina esperando o próximo evento.
+    """
+    async def eventos():
+        yield _evento("snapshot", server._cache["json"])
+        seq = server._cache["seq"]
+        while True:
+            try:
+                await asyncio.wait_for(_nova_varredura.wait(), KEEPALIVE_SSE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if server._cache["seq"] == seq + 1:
+                yield _evento("mudancas", server._cache["mudancas_json"])
+            else:
+                # perdeu varreduras (cliente lento): reenvia tudo
+                yield _evento("snapshot", server._cache["json"])
+            seq = server._cache["seq"]
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# -------------------------------
+# APLICAÇÃO
+# -------------------------------
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    tarefa = asyncio.create_task(coletor_loop())
+    loop = asyncio.get_running_loop()
+    server.REPLICACAO.ao_aplicar = lambda: loop.call_soon_threadsafe(_sinalizar_varredura)
+    server.iniciar_replicacao()
+    server.HISTORICO.iniciar_compactacao()
+    server.NOTIFICADOR.iniciar()
+    try:
+        yield
+    finally:
+        tarefa.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await tarefa
+
+
+app = Starlette(
+    routes=[
+        Route("/api/stream", api_stream),
+        Mount("/", app=WSGIMiddleware(server.app)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,69 @@
+# ============================================================
+# bench_serializacao.py — microbenchmark da serialização do /api/status
+# Compara, para N hosts (padrão 10 mil):
+#   - stdlib: registros() em dicts + json.dumps (caminho antigo, jsonify)
+#   - codificar(): refazer os fragmentos de todos os slots (1x por varredura)
+#   - json(): juntar os fragmentos prontos (custo por requisição)
+#   - json(filtro): só os hosts DOWN
+#
+# Uso: python benchmarks/bench_serializacao.py [N]
+# ============================================================
+import json
+import os
+import random
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from estado import TabelaEstado  # noqa: E402
+from serializacao import CODIFICADOR  # noqa: E402
+
+
+def montar_tabela(n: int) -> TabelaEstado:
+    random.seed(0)
+    promotorias = [
+        {
+            "nome": f"Município {i}",
+            "lat": random.uniform(-33.7, -27.1),
+            "lng": random.uniform(-57.6, -49.7),
+            "host": f"Municipio_{i}",
+        }
+        for i in range(n)
+    ]
+    tabela = TabelaEstado(promotorias)
+    agora = int(time.time())
+    for i in range(n):
+        tabela.aplicar(i, {
+            "status": random.choice([2] * 8 + [4, 1]),
+            "is_flapping": random.random() < 0.02,
+            "last_time_down": agora - random.randint(0, 86400 * 30),
+            "last_time_up": agora - random.randint(0, 60),
+            "plugin_output": f"PING OK - Packet loss = 0%, RTA = {random.uniform(1, 40):.2f} ms",
+        }, agora)
+    tabela.codificar()
+    return tabela
+
+
+def medir(nome: str, fn, repeticoes: int):
+    melhor = min(timeit.repeat(fn, number=1, repeat=repeticoes))
+    print(f"{nome:<34} {melhor * 1000:9.2f} ms")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    tabela = montar_tabela(n)
+    down = [i for i in range(n) if tabela.status_nome(i) == "DOWN"]
+    print(f"{n} hosts, {len(down)} DOWN, codificador: {CODIFICADOR}")
+
+    assert json.loads(tabela.json()) == tabela.registros()
+
+    medir("stdlib (dicts + json.dumps)", lambda: json.dumps(tabela.registros()).encode(), 10)
+    medir("codificar() (por varredura)", tabela.codificar, 10)
+    medir("json() (por requisição)", tabela.json, 50)
+    medir("json(status=DOWN)", lambda: tabela.json(down), 50)
+
+
+if __name__ == "__main__":
+    main()
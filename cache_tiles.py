@@ -0,0 +1,287 @@
+# ============================================================
+# cache_tiles.py — proxy com cache em disco dos tiles do mapa base
+# /tiles/{z}/{x}/{y}.png (OSM) e /tiles/<fonte>/{z}/{x}/{y}.png servem
+# do disco (data/tiles/<fonte>/z/x/y) e só vão à origem no que falta
+# ou passou da validade; se a origem falhar, o tile velho continua
+# servindo. O diretório é um LRU limitado em bytes: o índice fica em
+# memória e, na partida, é refeito pela data de gravação dos arquivos.
+#
+# Configuração (variáveis de ambiente):
+#   TILES_MAX_MB=500                         limite do cache em disco
+#   TILES_ORIGEM_OSM=http://.../{z}/{x}/{y}.png   (idem _ESCURO, _ROTULOS, _SATELITE)
+#
+# Pré-carga da região (RS) nos zooms usados, sem subir o servidor:
+#   python cache_tiles.py --fontes escuro,osm --zoom 6-11
+# ============================================================
+import argparse
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+# fonte -> (URL de origem, mimetype)
+FONTES = {
+    "osm": ("https://tile.openstreetmap.org/{z}/{x}/{y}.png", "image/png"),
+    "escuro": ("https://a.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}.png", "image/png"),
+    "rotulos": ("https://a.basemaps.cartocdn.com/light_only_labels/{z}/{x}/{y}.png", "image/png"),
+    "satelite": ("https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+                 "image/jpeg"),
+}
+ZOOM_MAX_TILE = 20
+VALIDADE_TILE = 30 * 86400     # depois disso, tenta buscar de novo na origem
+MAX_AGE_NAVEGADOR = 7 * 86400  # Cache-Control enviado ao navegador
+TIMEOUT_ORIGEM = 10
+LIMITE_PADRAO_MB = 500
+USER_AGENT = "monitoramento-promotorias/1.0 (cache de tiles)"
+
+# Pré-carga: caixa do RS (sul, oeste, norte, leste) e pausa entre pedidos
+REGIAO_RS = (-33.8, -57.7, -27.0, -49.6)
+ZOOMS_PADRAO = range(6, 12)
+PAUSA_PRE_CARGA = 0.1
+
+
+def origem_da_fonte(fonte: str) -> str:
+    return os.environ.get(f"TILES_ORIGEM_{fonte.upper()}", FONTES[fonte][0])
+
+
+def tile_valido(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= ZOOM_MAX_TILE and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_do_ponto(lat: float, lng: float, z: int):
+    """(x, y) do tile (Web Mercator) que contém o ponto no zoom z."""
+    n = 2 ** z
+    lat_rad = math.radians(lat)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_da_regiao(regiao, zooms):
+    """(z, x, y) de todos os tiles que cobrem a caixa, zoom a zoom."""
+    sul, oeste, norte, leste = regiao
+    for z in zooms:
+        x0, y0 = tile_do_ponto(norte, oeste, z)
+        x1, y1 = tile_do_ponto(sul, leste, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+class CacheTiles:
+    """
+    Índice LRU: caminho relativo -> (bytes, gravado_em), do menos ao mais
+    recentemente usado. Uma busca na origem por tile de cada vez: quem
+    pede um tile já em download espera o mesmo download.
+    """
+
+    def __init__(self, diretorio: str, limite_bytes: int = None, sessao=None):
+        self.diretorio = diretorio
+        if limite_bytes is None:
+            limite_bytes = int(float(os.environ.get("TILES_MAX_MB", LIMITE_PADRAO_MB)) * 1024 * 1024)
+        self.limite = limite_bytes
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._total = 0
+        self._buscando = {}  # caminho relativo -> threading.Event
+        self._sessao = sessao or requests.Session()
+        self._sessao.headers["User-Agent"] = USER_AGENT
+        self.acertos = self.downloads = self.falhas = self.removidos = 0
+        self._carregar_indice()
+
+    def _carregar_indice(self):
+        arquivos = []
+        for raiz, _, nomes in os.walk(self.diretorio):
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                if nome.endswith(".tmp"):
+                    os.remove(caminho)  # gravação interrompida
+                    continue
+                st = os.stat(caminho)
+                arquivos.append((st.st_mtime, os.path.relpath(caminho, self.diretorio), st.st_size))
+        arquivos.sort()
+        for mtime, rel, tamanho in arquivos:
+            self._lru[rel] = (tamanho, mtime)
+            self._total += tamanho
+        with self._lock:
+            self._liberar_espaco()
+
+    @staticmethod
+    def relativo(fonte: str, z: int, x: int, y: int) -> str:
+        return os.path.join(fonte, str(z), str(x), str(y))
+
+    def contem(self, fonte: str, z: int, x: int, y: int) -> bool:
+        with self._lock:
+            return self.relativo(fonte, z, x, y) in self._lru
+
+    # -------------------------------
+    # LEITURA
+    # -------------------------------
+
+    def obter(self, fonte: str, z: int, x: int, y: int):
+        """
+        (bytes, gravado_em, fresco) do tile, ou None se não há cópia
+        local e a origem falhou. fresco=False: cópia vencida servida
+        porque a origem não respondeu.
+        """
+        rel = self.relativo(fonte, z, x, y)
+        with self._lock:
+            info = self._lru.get(rel)
+            if info is not None:
+                self._lru.move_to_end(rel)
+        if info is not None and time.time() - info[1] < VALIDADE_TILE:
+            dados = self._ler(rel)
+            if dados is not None:
+                self._contar("acertos")
+                return dados, info[1], True
+        if self._baixar(fonte, z, x, y):
+            with self._lock:
+                info = self._lru.get(rel)
+            dados = self._ler(rel) if info is not None else None
+            if dados is not None:
+                return dados, info[1], True
+        if info is not None:
+            dados = self._ler(rel)
+            if dados is not None:
+                return dados, info[1], False
+        return None
+
+    def _ler(self, rel: str):
+        try:
+            with open(os.path.join(self.diretorio, rel), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # removido por fora (ou pelo LRU entre o índice e a leitura)
+            with self._lock:
+                info = self._lru.pop(rel, None)
+                if info is not None:
+                    self._total -= info[0]
+            return None
+
+    # -------------------------------
+    # ORIGEM
+    # -------------------------------
+
+    def _baixar(self, fonte: str, z: int, x: int, y: int) -> bool:
+        rel = self.relativo(fonte, z, x, y)
+        with self._lock:
+            evento = self._buscando.get(rel)
+            dono = evento is None
+            if dono:
+                evento = self._buscando[rel] = threading.Event()
+        if not dono:
+            evento.wait(TIMEOUT_ORIGEM + 1)
+            return self.contem(fonte, z, x, y)
+        try:
+            url = origem_da_fonte(fonte).format(z=z, x=x, y=y)
+            r = self._sessao.get(url, timeout=TIMEOUT_ORIGEM)
+            if r.status_code != 200 or not r.content:
+                self._contar("falhas")
+                return False
+            self._gravar(rel, r.content)
+            self._contar("downloads")
+            return True
+        except requests.RequestException:
+            self._contar("falhas")
+            return False
+        finally:
+            with self._lock:
+                self._buscando.pop(rel).set()
+
+    def _gravar(self, rel: str, dados: bytes):
+        caminho = os.path.join(self.diretorio, rel)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tmp = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(dados)
+        os.replace(tmp, caminho)  # leitores nunca veem o arquivo pela metade
+        with self._lock:
+            antigo = self._lru.pop(rel, None)
+            if antigo is not None:
+                self._total -= antigo[0]
+            self._lru[rel] = (len(dados), time.time())
+            self._total += len(dados)
+            self._liberar_espaco()
+
+    def _liberar_espaco(self):
+        """Remove os menos usados até caber no limite (com o lock)."""
+        while self._total > self.limite and len(self._lru) > 1:
+            rel, (tamanho, _) = self._lru.popitem(last=False)
+            self._total -= tamanho
+            self.removidos += 1
+            try:
+                os.remove(os.path.join(self.diretorio, rel))
+            except FileNotFoundError:
+                pass
+
+    def _contar(self, contador: str):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {"tiles": len(self._lru), "bytes": self._total, "limite": self.limite,
+                    "acertos": self.acertos, "downloads": self.downloads,
+                    "falhas": self.falhas, "removidos": self.removidos}
+
+# -------------------------------
+# PRÉ-CARGA
+# -------------------------------
+
+def pre_carregar(cache: CacheTiles, fontes, zooms=ZOOMS_PADRAO, regiao=REGIAO_RS,
+                 pausa: float = PAUSA_PRE_CARGA, progresso=None):
+    """
+    Baixa o que falta da região nos zooms pedidos, um tile por vez e com
+    pausa entre pedidos (os servidores públicos de tiles não aceitam
+    download em massa). Devolve (baixados, já em cache, falhas).
+    """
+    baixados = existentes = falhas = 0
+    for fonte in fontes:
+        for z, x, y in tiles_da_regiao(regiao, zooms):
+            if cache.contem(fonte, z, x, y):
+                existentes += 1
+                continue
+            if cache._baixar(fonte, z, x, y):
+                baixados += 1
+            else:
+                falhas += 1
+            if progresso:
+                progresso(fonte, z, baixados, existentes, falhas)
+            time.sleep(pausa)
+    return baixados, existentes, falhas
+
+
+def _faixa_zoom(texto: str):
+    inicio, _, fim = texto.partition("-")
+    return range(int(inicio), int(fim or inicio) + 1)
+
+
+if __name__ == "__main__":
+    base = os.path.dirname(os.path.abspath(__file__))
+    dados = os.environ.get("DATA_DIR", os.path.join(base, "data"))
+    ap = argparse.ArgumentParser(description="Pré-carrega os tiles da região no cache local.")
+    ap.add_argument("--fontes", default="escuro", help=f"separadas por vírgula: {', '.join(FONTES)}")
+    ap.add_argument("--zoom", default=f"{ZOOMS_PADRAO.start}-{ZOOMS_PADRAO.stop - 1}", help="ex.: 6-11")
+    ap.add_argument("--pausa", type=float, default=PAUSA_PRE_CARGA, help="segundos entre pedidos à origem")
+    args = ap.parse_args()
+
+    fontes = [f.strip() for f in args.fontes.split(",") if f.strip()]
+    desconhecidas = [f for f in fontes if f not in FONTES]
+    if desconhecidas:
+        ap.error(f"fonte(s) desconhecida(s): {', '.join(desconhecidas)}")
+    zooms = _faixa_zoom(args.zoom)
+    total = sum(1 for _ in tiles_da_regiao(REGIAO_RS, zooms)) * len(fontes)
+    print(f"{total} tiles na região (zoom {args.zoom}, fontes {', '.join(fontes)})")
+
+    cache = CacheTiles(os.path.join(dados, "tiles"))
+
+    def _progresso(fonte, z, baixados, existentes, falhas):
+        if baixados and baixados % 100 == 0:
+            print(f"  {fonte} z{z}: {baixados} baixados, {existentes} já em cache, {falhas} falhas")
+
+    b, e, f = pre_carregar(cache, fontes, zooms, pausa=args.pausa, progresso=_progresso)
+    print(f"Concluído: {b} baixados, {e} já em cache, {f} falhas "
+          f"({cache.estatisticas()['bytes'] / 1024 / 1024:.1f} MB em disco)")
@@ -0,0 +1,220 @@
+# ============================================================
+# estado.py — tabela compacta do estado vivo dos hosts
+# Arrays paralelos indexados pela posição no inventário; o coletor
+# atualiza no lugar e a serialização lê direto daqui.
+# ============================================================
+import hashlib
+from array import array
+
+from indices import CODIGO_STATUS, COD_UNKNOWN, COD_WARNING, STATUS_POR_CODIGO
+from metricas import SEM_VALOR, extrair_ping, ou_none
+from serializacao import dumps, juntar
+
+# Código bruto do Nagios (data.host.status) -> código interno
+#   2 = UP, 4 = DOWN, 0 = UNKNOWN, outros = WARNING
+_NAGIOS_PARA_CODIGO = {2: CODIGO_STATUS["UP"], 4: CODIGO_STATUS["DOWN"], 0: COD_UNKNOWN}
+
+
+def codigo_nagios(raw_code) -> int:
+    return _NAGIOS_PARA_CODIGO.get(int(raw_code), COD_WARNING)
+
+
+def _format_duration_dhms(seconds: int) -> str:
+    # Formata como: 2d 03h 15m 42s (omitindo dias se 0)
+    if seconds < 0:
+        seconds = 0
+    d, rem = divmod(seconds, 86400)
+    h, rem = divmod(rem, 3600)
+    m, s = divmod(rem, 60)
+    parts = []
+    if d:
+        parts.append(f"{d}d")
+    parts.append(f"{h:02d}h")
+    parts.append(f"{m:02d}m")
+    parts.append(f"{s:02d}s")
+    return " ".join(parts)
+
+
+_STATUS_JSON = tuple(dumps(s) for s in STATUS_POR_CODIGO)
+_BOOL_JSON = (b"false", b"true")
+
+
+class TabelaEstado:
+    """
+    Estado de todos os hosts em arrays pré-alocados (um slot por posição
+    do inventário): status em código pequeno, epochs em int64 e a saída
+    do plugin numa lista de strings; latência (ms) e perda de pacotes (%)
+    do check_ping em float64, NaN quando ausentes. Nenhum dict por host é
+    criado na varredura; registros para a API são montados só na
+    serialização.
+
+    Cada slot também guarda seu fragmento JSON já codificado (refeito por
+    codificar() depois da varredura), então servir a lista é só juntar
+    bytes. A parte fixa do registro (nome, lat, lng, host) é codificada
+    uma única vez por carga do inventário.
+    """
+
+    __slots__ = ("promotorias", "posicao", "assinatura", "status", "flapping", "last_down", "last_up",
+                 "duracao", "plugin_output", "rta", "perda", "degradado", "_prefixo", "_json")
+
+    def __init__(self, promotorias):
+        n = len(promotorias)
+        self.promotorias = promotorias
+        self.posicao = {p["host"]: i for i, p in enumerate(promotorias)}
+        # identifica a ordem dos hosts (replicação: vetores por posição)
+        self.assinatura = hashlib.sha1("\n".join(self.posicao).encode()).hexdigest()[:12]
+        self.status = bytearray([COD_UNKNOWN]) * n
+        self.flapping = bytearray(n)
+        self.last_down = array("q", bytes(8 * n))
+        self.last_up = array("q", bytes(8 * n))
+        self.duracao = array("q", bytes(8 * n))   # now - last_time_down na varredura
+        self.plugin_output = [""] * n
+        self.rta = array("d", [SEM_VALOR]) * n
+        self.perda = array("d", [SEM_VALOR]) * n
+        self.degradado = bytearray(n)  # latência/perda fora da linha de base (anomalias.py)
+        self._prefixo = [
+            dumps({"nome": p["nome"], "lat": p["lat"], "lng": p["lng"], "host": p["host"]})[:-1] + b","
+            for p in promotorias
+        ]
+        self._json = [None] * n
+        if n:
+            # todos começam iguais (UNKNOWN, sem dados): codifica o slot 0 e
+            # reaproveita o resto dele, então json() já vale antes da 1ª varredura
+            self.codificar((0,))
+            sufixo = self._json[0][len(self._prefixo[0]):]
+            self._json = [prefixo + sufixo for prefixo in self._prefixo]
+
+    def __len__(self):
+        return len(self.promotorias)
+
+    def aplicar(self, i: int, hostdata, agora: int) -> bool:
+        """
+        Grava no slot i o data.host do statusjson.cgi. hostdata vazio/None =
+        host ausente no Nagios (UNKNOWN); False = falha na consulta.
+        Retorna True se algo além da duração e das métricas mudou.
+        """
+        rta = perda = SEM_VALOR
+        if hostdata is False:
+            cod, flap, down, up, out, dur = COD_UNKNOWN, 0, 0, 0, "", 0
+        else:
+            try:
+                cod = codigo_nagios(hostdata.get("status", -1)) if hostdata else COD_UNKNOWN
+                hostdata = hostdata or {}
+                flap = 1 if hostdata.get("is_flapping", False) else 0
+                down = int(hostdata.get("last_time_down", 0) or 0)
+                up = int(hostdata.get("last_time_up", 0) or 0)
+                out = hostdata.get("plugin_output", "") or ""
+                dur = max(agora - down, 0)
+                rta, perda = extrair_ping(hostdata.get("perf_data", ""), out)
+            except Exception:
+                cod, flap, down, up, out, dur = COD_UNKNOWN, 0, 0, 0, "", 0
+
+        self.duracao[i] = dur
+        self.rta[i] = rta
+        self.perda[i] = perda
+        if (self.status[i] == cod and self.flapping[i] == flap and self.last_down[i] == down
+                and self.last_up[i] == up and self.plugin_output[i] == out):
+            return False
+        self.status[i] = cod
+        self.flapping[i] = flap
+        self.last_down[i] = down
+        self.last_up[i] = up
+        self.plugin_output[i] = out
+        return True
+
+    def instantaneo(self, posicoes=None) -> list:
+        """
+        Uma linha por host: [host, status, flapping, last_down, last_up,
+        duracao, plugin_output, rta, perda, degradado] (NaN -> None).
+        """
+        if posicoes is None:
+            posicoes = range(len(self.promotorias))
+        promotorias = self.promotorias
+        return [
+            [promotorias[i]["host"], self.status[i], self.flapping[i], self.last_down[i],
+             self.last_up[i], self.duracao[i], self.plugin_output[i], ou_none(self.rta[i]),
+             ou_none(self.perda[i]), self.degradado[i]]
+            for i in posicoes
+        ]
+
+    def restaurar(self, linhas) -> list:
+        """
+        Preenche os slots com linhas de instantaneo(), casando pelo host;
+        hosts que saíram do inventário são ignorados. Devolve as posições
+        preenchidas (codificar() fica com quem chamou).
+        """
+        posicoes = []
+        for host, cod, flap, down, up, dur, out, rta, perda, degr in linhas:
+            i = self.posicao.get(host)
+            if i is None:
+                continue
+            self.status[i] = cod
+            self.flapping[i] = flap
+            self.last_down[i] = down
+            self.last_up[i] = up
+            self.duracao[i] = dur
+            self.plugin_output[i] = out
+            self.rta[i] = SEM_VALOR if rta is None else rta
+            self.perda[i] = SEM_VALOR if perda is None else perda
+            self.degradado[i] = degr
+            posicoes.append(i)
+        return posicoes
+
+    def status_nome(self, i: int) -> str:
+        return STATUS_POR_CODIGO[self.status[i]]
+
+    def codigo_efetivo(self, i: int) -> int:
+        """Severidade exibida no mapa (flapping conta como WARNING)."""
+        return COD_WARNING if self.flapping[i] else self.status[i]
+
+    def registro(self, i: int) -> dict:
+        """Registro no formato público do /api/status."""
+        p = self.promotorias[i]
+        status = STATUS_POR_CODIGO[self.status[i]]
+        dur = self.duracao[i]
+        return {
+            "nome": p["nome"],
+            "lat": p["lat"],
+            "lng": p["lng"],
+            "host": p["host"],
+            "status": status,  # campo principal
+            "status_nagios": status,  # alias
+            "plugin_output": self.plugin_output[i],
+            "is_flapping": bool(self.flapping[i]),
+            "last_time_down": self.last_down[i],
+            "last_time_up": self.last_up[i],
+            "last_downtime_duration_ms": dur,  # mesmo nome de campo (valores em segundos)
+            "last_downtime_duration_human": _format_duration_dhms(dur),
+            "degraded": bool(self.degradado[i]),
+        }
+
+    def registros(self, posicoes=None) -> list:
+        if posicoes is None:
+            posicoes = range(len(self.promotorias))
+        return [self.registro(i) for i in posicoes]
+
+    def codificar(self, posicoes=None):
+        """Refaz o fragmento JSON dos slots (mesmo formato de registro())."""
+        if posicoes is None:
+            posicoes = range(len(self.promotorias))
+        for i in posicoes:
+            status = _STATUS_JSON[self.status[i]]
+            dur = self.duracao[i]
+            self._json[i] = b"".join((
+                self._prefixo[i],
+                b'"status":', status,
+                b',"status_nagios":', status,
+                b',"plugin_output":', dumps(self.plugin_output[i]),
+                b',"is_flapping":', _BOOL_JSON[self.flapping[i]],
+                b',"last_time_down":%d,"last_time_up":%d,"last_downtime_duration_ms":%d'
+                % (self.last_down[i], self.last_up[i], dur),
+                b',"last_downtime_duration_human":"', _format_duration_dhms(dur).encode(),
+                b'","degraded":', _BOOL_JSON[self.degradado[i]], b'}',
+            ))
+
+    def json(self, posicoes=None) -> bytes:
+        """Lista JSON dos slots pedidos (todos por padrão)."""
+        if posicoes is None:
+            return juntar(self._json)
+        frags = self._json
+        return juntar([frags[i] for i in posicoes])
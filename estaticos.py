@@ -0,0 +1,300 @@
+# ============================================================
+# estaticos.py — pacote dos arquivos estáticos do mapa
+# Na partida, junta o CSS e o JS locais que o index.html carrega num
+# pacote de cada tipo, minifica, nomeia pelo hash do conteúdo
+# (app.<hash>.js, app.<hash>.css, mapa-worker.<hash>.js) e guarda em
+# memória já comprimido (gzip; brotli se o módulo estiver instalado).
+# O index.html é reescrito para apontar para os nomes com hash, que
+# são servidos como imutáveis; só o HTML é revalidado (ETag/304).
+# Arquivos que o CSS referencia com url() relativo (ícones de
+# static/icons, por exemplo) também ganham nome com hash em /assets/,
+# e o url() do pacote é reescrito para eles.
+#
+#   ESTATICOS_DEV=1        (no server.py) serve os arquivos originais, sem pacote
+#   python estaticos.py    só mostra os tamanhos (original/minificado/gzip)
+# ============================================================
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele, só gzip
+    brotli = None
+
+# Arquivos referenciados por dentro do JS (não pelo HTML)
+AVULSOS = ("mapa-worker.js",)
+PREFIXO = "/assets/"
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+
+_LINK_CSS = re.compile(r'<link\s+rel="stylesheet"\s+href="([^":]+)"\s*/?>\s*\n?')
+_SCRIPT = re.compile(r'<script\s+src="([^":]+)"\s*>\s*</script>\s*\n?')
+_COMENTARIO_HTML = re.compile(r"<!--.*?-->\s*\n?", re.DOTALL)
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+?)\1\s*\)""")
+
+# -------------------------------
+# MINIFICAÇÃO
+# -------------------------------
+# Conservadora: só tira comentários e espaços. Quebras de linha ficam
+# (salvo depois de { ( [ , ; e antes de } ] ) ,), então a inserção
+# automática de ponto e vírgula do JS não muda de comportamento.
+
+_PALAVRA = re.compile("[A-Za-z0-9_$\u0080-\uffff]")
+_ANTES_DE_REGEX = set("(,=:[!&|?{};+-*%<>~^")
+_PALAVRAS_ANTES_DE_REGEX = {"return", "typeof", "case", "do", "else", "in", "of", "new",
+                            "delete", "void", "throw", "yield", "await"}
+
+
+def _eh_palavra(c: str) -> bool:
+    return bool(c) and bool(_PALAVRA.match(c))
+
+
+def _ultima_palavra(out) -> str:
+    texto = "".join(out[-3:])
+    m = re.search(r"([A-Za-z_$][A-Za-z0-9_$]*)$", texto)
+    return m.group(1) if m else ""
+
+
+def _pular_string(src: str, i: int) -> int:
+    """Índice logo depois da string ('...' ou "...") que começa em i."""
+    aspa = src[i]
+    i += 1
+    while src[i] != aspa:
+        i += 2 if src[i] == "\\" else 1
+    return i + 1
+
+
+def _pular_regex(src: str, i: int) -> int:
+    i += 1
+    classe = False
+    while True:
+        c = src[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "[":
+            classe = True
+        elif c == "]":
+            classe = False
+        elif c == "/" and not classe:
+            break
+        i += 1
+    i += 1
+    while i < len(src) and _eh_palavra(src[i]):
+        i += 1  # flags
+    return i
+
+
+def _min_js(src: str, i: int = 0, ate_chave: bool = False):
+    """(código minificado, índice final). ate_chave: para no } de um ${...}."""
+    out = []
+    ultimo = ""      # último caractere significativo emitido
+    espaco = None    # None | " " | "\n" pendente
+    profundidade = 0
+    n = len(src)
+
+    def emitir(trecho):
+        nonlocal ultimo, espaco
+        primeiro = trecho[0]
+        if espaco == "\n" and out and ultimo not in "{([,;" and primeiro not in "}]),":
+            out.append("\n")
+        elif espaco is not None and out and (
+                (_eh_palavra(ultimo) and _eh_palavra(primeiro)) or
+                (ultimo in "+-" and primeiro == ultimo)):
+            out.append(" ")
+        out.append(trecho)
+        ultimo = trecho[-1]
+        espaco = None
+
+    while i < n:
+        c = src[i]
+        if c in " \t\r\n":
+            if c == "\n":
+                espaco = "\n"
+            elif espaco is None:
+                espaco = " "
+            i += 1
+        elif src.startswith("//", i):
+            fim = src.find("\n", i)
+            i = n if fim < 0 else fim
+        elif src.startswith("/*", i):
+            i = src.index("*/", i + 2) + 2
+            if espaco is None:
+                espaco = " "
+        elif c in "'\"":
+            fim = _pular_string(src, i)
+            emitir(src[i:fim])
+            i = fim
+        elif c == "`":
+            partes = ["`"]
+            i += 1
+            while src[i] != "`":
+                if src[i] == "\\":
+                    partes.append(src[i:i + 2])
+                    i += 2
+                elif src.startswith("${", i):
+                    codigo, i = _min_js(src, i + 2, ate_chave=True)
+                    partes.append("${" + codigo + "}")
+                    i += 1
+                else:
+                    partes.append(src[i])
+                    i += 1
+            partes.append("`")
+            i += 1
+            emitir("".join(partes))
+        elif c == "/" and (not out or ultimo in _ANTES_DE_REGEX or
+                           _ultima_palavra(out) in _PALAVRAS_ANTES_DE_REGEX):
+            fim = _pular_regex(src, i)
+            emitir(src[i:fim])
+            i = fim
+        else:
+            if c == "{":
+                profundidade += 1
+            elif c == "}":
+                if ate_chave and profundidade == 0:
+                    return "".join(out), i
+                profundidade -= 1
+            j = i + 1
+            if _eh_palavra(c):
+                while j < n and _eh_palavra(src[j]):
+                    j += 1
+            emitir(src[i:j])
+            i = j
+    return "".join(out), i
+
+
+def minificar_js(src: str) -> str:
+    return _min_js(src)[0] + "\n"
+
+
+_CSS_COMENTARIO = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_ESPACOS = re.compile(r"\s+")
+_CSS_EM_VOLTA = re.compile(r"\s*([{};,])\s*")
+
+
+def minificar_css(src: str) -> str:
+    css = _CSS_COMENTARIO.sub("", src)
+    css = _CSS_ESPACOS.sub(" ", css)
+    css = _CSS_EM_VOLTA.sub(r"\1", css)
+    return css.replace(";}", "}").strip() + "\n"
+
+# -------------------------------
+# PACOTE
+# -------------------------------
+
+class PacoteEstatico:
+    """
+    ativos: nome com hash -> (corpo, gzip, brotli ou None, mimetype).
+    index: (corpo, gzip, brotli ou None, etag) do index.html reescrito.
+    """
+
+    def __init__(self, pasta: str, pagina: str = "index.html"):
+        self.pasta = pasta
+        self.pagina = pagina
+        self.ativos = {}
+        self.tamanhos = []  # (nome, original, minificado, gzip) — relatório
+        self.index = None
+        self.montar()
+
+    def _ler(self, caminho_url: str) -> str:
+        with open(os.path.join(self.pasta, caminho_url.lstrip("/")), encoding="utf-8") as f:
+            return f.read()
+
+    def _registrar(self, base: str, ext: str, original: int, texto, mimetype: str) -> str:
+        """texto: str, ou bytes de formato já comprimido (PNG etc.: sem gzip/brotli)."""
+        binario = isinstance(texto, bytes)
+        corpo = texto if binario else texto.encode("utf-8")
+        nome = f"{base}.{hashlib.sha1(corpo).hexdigest()[:10]}.{ext}"
+        if nome in self.ativos:
+            return PREFIXO + nome  # mesmo arquivo referenciado de novo
+        gz = None if binario else gzip.compress(corpo, 9, mtime=0)
+        br = brotli.compress(corpo) if brotli and not binario else None
+        self.ativos[nome] = (corpo, gz, br, mimetype)
+        self.tamanhos.append((nome, original, len(corpo), len(gz or corpo)))
+        return PREFIXO + nome
+
+    def _urls_css(self, caminho_css: str, css: str) -> str:
+        """Troca url() relativo ao arquivo CSS pelo nome com hash em /assets/."""
+        pasta_css = posixpath.dirname("/" + caminho_css.lstrip("/"))
+
+        def _sub(m):
+            ref = m.group(2).strip()
+            if ref.startswith(("data:", "#", "//")) or ":" in ref.split("/", 1)[0]:
+                return m.group(0)  # data URI, âncora ou outro domínio: fica como está
+            caminho = ref.split("#", 1)[0].split("?", 1)[0]
+            caminho = posixpath.normpath(posixpath.join(pasta_css, caminho))
+            with open(os.path.join(self.pasta, caminho.lstrip("/")), "rb") as f:
+                dados = f.read()
+            base, _, ext = posixpath.basename(caminho).rpartition(".")
+            mimetype = mimetypes.guess_type(caminho)[0] or "application/octet-stream"
+            return f'url("{self._registrar(base, ext, len(dados), dados, mimetype)}")'
+        return _CSS_URL.sub(_sub, css)
+
+    def montar(self):
+        html = self._ler(self.pagina)
+        css = [m.group(1) for m in _LINK_CSS.finditer(html)]
+        js = [m.group(1) for m in _SCRIPT.finditer(html)]
+
+        # Avulsos primeiro: o pacote JS leva os nomes com hash deles
+        trocas = {}
+        for nome in AVULSOS:
+            fonte = self._ler(nome)
+            base = nome.rsplit(".", 1)[0]
+            trocas[nome] = self._registrar(base, "js", len(fonte), minificar_js(fonte),
+                                           "text/javascript")
+
+        url_css = url_js = None
+        if css:
+            fontes = [self._ler(c) for c in css]
+            pacote = "".join(minificar_css(self._urls_css(c, f)) for c, f in zip(css, fontes))
+            url_css = self._registrar("app", "css", sum(map(len, fontes)), pacote, "text/css")
+        if js:
+            fontes = [self._ler(j) for j in js]
+            pacote = ";\n".join(minificar_js(f) for f in fontes)
+            for nome, url in trocas.items():
+                pacote = pacote.replace(f'"{nome}"', f'"{url}"').replace(f"'{nome}'", f"'{url}'")
+            url_js = self._registrar("app", "js", sum(map(len, fontes)), pacote, "text/javascript")
+
+        # index.html: primeira tag de cada tipo vira a do pacote, as demais saem
+        def _trocar(padrao, tag):
+            feito = False
+
+            def _sub(_m):
+                nonlocal feito
+                if feito:
+                    return ""
+                feito = True
+                return tag + "\n"
+            return lambda texto: padrao.sub(_sub, texto)
+
+        html = _COMENTARIO_HTML.sub("", html)
+        if url_css:
+            html = _trocar(_LINK_CSS, f'<link rel="stylesheet" href="{url_css}">')(html)
+        if url_js:
+            html = _trocar(_SCRIPT, f'<script src="{url_js}"></script>')(html)
+        html = re.sub(r"\n\s*\n", "\n", html)
+        corpo = html.encode("utf-8")
+        self.index = (corpo, gzip.compress(corpo, 9, mtime=0),
+                      brotli.compress(corpo) if brotli else None,
+                      hashlib.sha1(corpo).hexdigest()[:16])
+
+
+def corpo_para(accept_encoding: str, corpo: bytes, gz: bytes, br):
+    """(bytes, Content-Encoding ou None) conforme o Accept-Encoding."""
+    aceita = accept_encoding.lower()
+    if br is not None and "br" in aceita:
+        return br, "br"
+    if gz is not None and "gzip" in aceita:
+        return gz, "gzip"
+    return corpo, None
+
+
+if __name__ == "__main__":
+    pacote = PacoteEstatico(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+    print(f"{'arquivo':<34}{'original':>10}{'minificado':>12}{'gzip':>8}")
+    for nome, original, mini, gz in pacote.tamanhos:
+        print(f"{nome:<34}{original:>10}{mini:>12}{gz:>8}")
+    print(f"{'index.html':<34}{'':>10}{len(pacote.index[0]):>12}{len(pacote.index[1]):>8}")
@@ -0,0 +1,600 @@
+# ============================================================
+# historico.py — histórico local de status (SQLite em data/)
+# Uma amostra por host a cada varredura do coletor; leitura em
+# streaming (cursor + fetchmany) para exportações longas.
+# Agregados em camadas (1 min, 1 h, 1 dia) mantidos incrementalmente
+# para consultas de intervalos longos com número limitado de pontos.
+# Retenção por camada com compactação em segundo plano (lotes pequenos).
+# Tabela de transições (só mudanças de status) para o replay do mapa.
+# Latência e perda de pacotes (check_ping) gravadas junto com as amostras.
+# ============================================================
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from indices import STATUS_POR_CODIGO
+from metricas import ou_none
+
+LOTE_LEITURA = 1000  # linhas por fetchmany nas leituras em streaming
+
+# Migrações em ordem; PRAGMA user_version guarda quantas já rodaram.
+_MIGRACOES = [
+    """
+    CREATE TABLE hosts (
+        id   INTEGER PRIMARY KEY,
+        host TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE amostras (
+        ts       INTEGER NOT NULL,
+        host_id  INTEGER NOT NULL,
+        status   INTEGER NOT NULL,
+        flapping INTEGER NOT NULL
+    );
+    CREATE INDEX amostras_ts ON amostras(ts);
+    """,
+    """
+    CREATE INDEX amostras_host_ts ON amostras(host_id, ts);
+    CREATE TABLE agregados (
+        passo     INTEGER NOT NULL,
+        bucket    INTEGER NOT NULL,
+        host_id   INTEGER NOT NULL,
+        c_up      INTEGER NOT NULL,
+        c_unknown INTEGER NOT NULL,
+        c_warning INTEGER NOT NULL,
+        c_down    INTEGER NOT NULL,
+        PRIMARY KEY (passo, host_id, bucket)
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE INDEX agregados_passo_bucket ON agregados(passo, bucket);
+    CREATE TABLE meta (
+        chave TEXT PRIMARY KEY,
+        valor INTEGER NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE transicoes (
+        host_id  INTEGER NOT NULL,
+        ts       INTEGER NOT NULL,
+        status   INTEGER NOT NULL,
+        flapping INTEGER NOT NULL,
+        PRIMARY KEY (host_id, ts)
+    ) WITHOUT ROWID;
+    CREATE INDEX transicoes_ts ON transicoes(ts);
+    INSERT INTO transicoes(host_id, ts, status, flapping)
+    SELECT host_id, ts, status, flapping FROM (
+        SELECT host_id, ts, status, flapping,
+               lag(status) OVER w AS status_ant, lag(flapping) OVER w AS flapping_ant
+        FROM amostras WINDOW w AS (PARTITION BY host_id ORDER BY ts)
+    ) WHERE status_ant IS NULL OR status_ant != status OR flapping_ant != flapping;
+    """,
+    """
+    ALTER TABLE amostras ADD COLUMN rta REAL;
+    ALTER TABLE amostras ADD COLUMN perda REAL;
+    """,
+    """
+    ALTER TABLE agregados ADD COLUMN soma_rta REAL NOT NULL DEFAULT 0;
+    ALTER TABLE agregados ADD COLUMN n_rta INTEGER NOT NULL DEFAULT 0;
+    """,
+]
+
+# -------------------------------
+# CAMADAS DE RESOLUÇÃO
+# -------------------------------
+# Cada agregado guarda quantas amostras o host passou em cada status
+# dentro do bucket (na ordem de STATUS_POR_CODIGO); daí saem o pior
+# status, o dominante e as frações de tempo em cada estado. Também soma
+# a latência (soma_rta / n_rta = média do bucket) para a camada de
+# qualidade do mapa.
+PASSO_RAW = 10  # intervalo nominal entre varreduras (CACHE_SECONDS)
+CAMADAS = {"1m": 60, "1h": 3600, "1d": 86400}
+RESOLUCOES = ("raw",) + tuple(CAMADAS)
+MAX_PONTOS = 500        # pontos por série no modo resolution=auto
+LIMITE_PONTOS = 10000   # teto absoluto por consulta
+
+_COLUNAS = ("c_up", "c_unknown", "c_warning", "c_down")  # mesma ordem de STATUS_POR_CODIGO
+
+_SQL_UPSERT_AGREGADO = (
+    "INSERT INTO agregados(passo, bucket, host_id, c_up, c_unknown, c_warning, c_down, soma_rta, n_rta) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(passo, host_id, bucket) DO UPDATE SET "
+    "c_up = c_up + excluded.c_up, c_unknown = c_unknown + excluded.c_unknown, "
+    "c_warning = c_warning + excluded.c_warning, c_down = c_down + excluded.c_down, "
+    "soma_rta = soma_rta + excluded.soma_rta, n_rta = n_rta + excluded.n_rta"
+)
+
+# -------------------------------
+# RETENÇÃO E COMPACTAÇÃO
+# -------------------------------
+# HIST_RETENCAO="raw=2d,1m=7d,1h=400d,1d=0,transicoes=400d" (0 = manter
+# para sempre). Sufixos aceitos: s, m, h, d; sem sufixo = segundos.
+RETENCAO_PADRAO = {"raw": 2 * 86400, "1m": 7 * 86400, "1h": 400 * 86400, "1d": 0,
+                   "transicoes": 400 * 86400}
+INTERVALO_COMPACTACAO = 300  # segundos entre rodadas
+LOTE_EXCLUSAO = 5000         # linhas por transação de exclusão
+PAUSA_ENTRE_LOTES = 0.05     # segundos; deixa o coletor gravar entre lotes
+
+_UNIDADES = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _parse_duracao(texto: str) -> int:
+    texto = texto.strip().lower()
+    if texto and texto[-1] in _UNIDADES:
+        return int(texto[:-1]) * _UNIDADES[texto[-1]]
+    return int(texto)
+
+
+def retencao_configurada(texto: str = None) -> dict:
+    """Retenção por resolução a partir de HIST_RETENCAO (sobre os padrões)."""
+    texto = os.environ.get("HIST_RETENCAO", "") if texto is None else texto
+    out = dict(RETENCAO_PADRAO)
+    for parte in filter(None, (p.strip() for p in texto.split(","))):
+        nome, _, valor = parte.partition("=")
+        nome = nome.strip()
+        if nome not in out:
+            raise ValueError(f"HIST_RETENCAO: resolução desconhecida '{nome}'")
+        out[nome] = _parse_duracao(valor)
+    return out
+
+
+class Historico:
+    """
+    Armazena as amostras de cada varredura. Uma conexão de escrita
+    (protegida por lock, usada pelo coletor) e conexões de leitura
+    abertas por consulta; com WAL, leitores não bloqueiam o coletor.
+    """
+
+    def __init__(self, caminho: str, retencao: dict = None):
+        self.caminho = caminho
+        self.retencao = retencao or retencao_configurada()
+        self._lock = threading.Lock()
+        self._con = self._conectar()
+        self._migrar()
+        self._ids = dict(self._con.execute("SELECT host, id FROM hosts"))
+        self._ultimo = self._ler_ultimo()
+        # Minuto corrente acumulado em memória: contagens por status e host
+        self._bucket = None
+        self._acum_ids = []
+        self._acum = []
+        self._soma_rta = array("d")
+        self._n_rta = array("H")
+        self._recuperar_agregados()
+
+    def _ler_ultimo(self) -> dict:
+        """Último (status, flapping) gravado em transicoes, por host_id."""
+        return {
+            h: (st, fl) for h, st, fl in self._con.execute(
+                "SELECT host_id, status, flapping FROM transicoes t "
+                "WHERE ts = (SELECT max(ts) FROM transicoes WHERE host_id = t.host_id)"
+            )
+        }
+
+    def _conectar(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.caminho, check_same_thread=False, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("PRAGMA busy_timeout=5000")
+        return con
+
+    def _migrar(self):
+        versao = self._con.execute("PRAGMA user_version").fetchone()[0]
+        for n, sql in enumerate(_MIGRACOES[versao:], start=versao + 1):
+            self._con.executescript(f"BEGIN; {sql} PRAGMA user_version = {n}; COMMIT;")
+
+    def _meta(self, chave: str, con=None):
+        row = (con or self._con).execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return row[0] if row else None
+
+    def _definir_meta(self, chave: str, valor: int):
+        self._con.execute(
+            "INSERT INTO meta(chave, valor) VALUES (?, ?) "
+            "ON CONFLICT(chave) DO UPDATE SET valor = max(valor, excluded.valor)",
+            (chave, valor),
+        )
+
+    def _recuperar_agregados(self):
+        """
+        Amostras gravadas depois do último minuto descarregado (parada
+        abrupta no meio do minuto) são somadas às camadas a partir do raw.
+        "agregado_ate" marca até onde o raw já está nos agregados.
+        """
+        ate = self._meta("agregado_ate")
+        ultimo = self._con.execute("SELECT max(ts) FROM amostras").fetchone()[0]
+        if ultimo is None:
+            return
+        if ate is None:
+            # base anterior à marca d'água: os agregados já vinham do coletor
+            with self._lock:
+                self._definir_meta("agregado_ate", ultimo + 1)
+            return
+        if ultimo < ate:
+            return
+        with self._lock:
+            self._con.execute("BEGIN")
+            try:
+                linhas = self._con.execute(
+                    "SELECT ts - ts % 60 AS m, host_id, sum(status = 0), sum(status = 1), "
+                    "sum(status = 2), sum(status = 3), total(rta), count(rta) FROM amostras "
+                    "WHERE ts >= ? GROUP BY m, host_id",
+                    (ate,),
+                ).fetchall()
+                for passo in CAMADAS.values():
+                    self._con.executemany(
+                        _SQL_UPSERT_AGREGADO,
+                        ((passo, m - m % passo) + tuple(resto) for m, *resto in linhas),
+                    )
+                self._definir_meta("agregado_ate", ultimo + 1)
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+
+    def _leitura(self) -> sqlite3.Connection:
+        con = sqlite3.connect(f"file:{self.caminho}?mode=ro", uri=True)
+        con.execute("PRAGMA query_only=1")
+        return con
+
+    def _host_ids(self, hosts) -> list:
+        novos = [h for h in hosts if h not in self._ids]
+        if novos:
+            self._con.executemany("INSERT OR IGNORE INTO hosts(host) VALUES (?)", ((h,) for h in novos))
+            self._ids = dict(self._con.execute("SELECT host, id FROM hosts"))
+        return [self._ids[h] for h in hosts]
+
+    # -------------------------------
+    # ESCRITA (coletor)
+    # -------------------------------
+
+    def registrar(self, ts: int, tabela):
+        """
+        Grava uma amostra por host da tabela de estado e soma no minuto
+        corrente; ao virar o minuto, o acumulado entra nas três camadas.
+        Hosts cujo status/flapping mudou também entram em transicoes.
+        Tudo numa transação.
+        """
+        hosts = [p["host"] for p in tabela.promotorias]
+        with self._lock:
+            self._con.execute("BEGIN")
+            try:
+                ids = self._host_ids(hosts)
+                self._con.executemany(
+                    "INSERT INTO amostras(ts, host_id, status, flapping, rta, perda) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    zip([ts] * len(ids), ids, tabela.status, tabela.flapping,
+                        map(ou_none, tabela.rta), map(ou_none, tabela.perda)),
+                )
+                self._acumular(ts, ids, tabela.status, tabela.rta)
+                self._gravar_transicoes(ts, ids, tabela.status, tabela.flapping)
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+
+    def _acumular(self, ts: int, ids, status, rta):
+        bucket = ts - ts % CAMADAS["1m"]
+        if bucket != self._bucket or ids != self._acum_ids:
+            self._descarregar()
+            self._bucket = bucket
+            self._acum_ids = ids
+            self._acum = [array("H", bytes(2 * len(ids))) for _ in _COLUNAS]
+            self._soma_rta = array("d", bytes(8 * len(ids)))
+            self._n_rta = array("H", bytes(2 * len(ids)))
+        acum = self._acum
+        for i, cod in enumerate(status):
+            acum[cod][i] += 1
+        soma, n = self._soma_rta, self._n_rta
+        for i, r in enumerate(rta):
+            if r == r:  # NaN = sem medida
+                soma[i] += r
+                n[i] += 1
+
+    def _gravar_transicoes(self, ts: int, ids, status, flapping):
+        ultimo = self._ultimo
+        mudancas = []
+        for ident, st, fl in zip(ids, status, flapping):
+            if ultimo.get(ident) != (st, fl):
+                mudancas.append((ident, ts, st, fl))
+        if mudancas:
+            self._con.executemany(
+                "INSERT OR REPLACE INTO transicoes(host_id, ts, status, flapping) VALUES (?, ?, ?, ?)",
+                mudancas,
+            )
+            for ident, _, st, fl in mudancas:
+                ultimo[ident] = (st, fl)
+
+    def importar_transicoes(self, linhas):
+        """
+        (ts, host, status, is_flapping) gravadas por outro nó (replicação:
+        o que este nó perdeu enquanto estava parado). Transições já
+        presentes (mesmo host e ts) ficam como estão.
+        """
+        linhas = list(linhas)
+        if not linhas:
+            return
+        codigo = {nome: i for i, nome in enumerate(STATUS_POR_CODIGO)}
+        with self._lock:
+            self._con.execute("BEGIN")
+            try:
+                ids = self._host_ids([host for _, host, _, _ in linhas])
+                self._con.executemany(
+                    "INSERT OR IGNORE INTO transicoes(host_id, ts, status, flapping) VALUES (?, ?, ?, ?)",
+                    ((ident, ts, codigo[st], int(fl)) for ident, (ts, _, st, fl) in zip(ids, linhas)),
+                )
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+            self._ultimo = self._ler_ultimo()
+
+    def _descarregar(self):
+        """Soma o minuto acumulado nos buckets de 1m, 1h e 1d (upsert)."""
+        if self._bucket is None:
+            return
+        linhas = [
+            (ident, c0, c1, c2, c3, soma, n)
+            for ident, c0, c1, c2, c3, soma, n in zip(self._acum_ids, *self._acum, self._soma_rta, self._n_rta)
+            if c0 or c1 or c2 or c3
+        ]
+        for passo in CAMADAS.values():
+            bucket = self._bucket - self._bucket % passo
+            self._con.executemany(_SQL_UPSERT_AGREGADO, ((passo, bucket) + linha for linha in linhas))
+        self._definir_meta("agregado_ate", self._bucket + CAMADAS["1m"])
+        self._bucket = None
+
+    # -------------------------------
+    # LEITURA EM STREAMING
+    # -------------------------------
+
+    def amostras(self, inicio: int, fim: int):
+        """
+        Gerador de (ts, host, status, is_flapping) em ordem de tempo no
+        intervalo [inicio, fim). Memória constante: lê em lotes do cursor.
+        """
+        con = self._leitura()
+        try:
+            cur = con.execute(
+                "SELECT a.ts, h.host, a.status, a.flapping FROM amostras a "
+                "JOIN hosts h ON h.id = a.host_id "
+                "WHERE a.ts >= ? AND a.ts < ? ORDER BY a.ts",
+                (inicio, fim),
+            )
+            while True:
+                lote = cur.fetchmany(LOTE_LEITURA)
+                if not lote:
+                    break
+                for ts, host, status, flapping in lote:
+                    yield ts, host, STATUS_POR_CODIGO[status], bool(flapping)
+        finally:
+            con.close()
+
+    def estado_em(self, ts: int) -> list:
+        """
+        (host, status, is_flapping) de cada host no instante ts: a última
+        transição de cada host até ts, numa única consulta agrupada pela
+        chave (host_id, ts).
+        """
+        con = self._leitura()
+        try:
+            rows = con.execute(
+                "SELECT h.host, t.status, t.flapping FROM ("
+                "  SELECT host_id, MAX(ts) AS ts FROM transicoes WHERE ts <= ? GROUP BY host_id"
+                ") u JOIN transicoes t ON t.host_id = u.host_id AND t.ts = u.ts "
+                "JOIN hosts h ON h.id = u.host_id",
+                (ts,),
+            ).fetchall()
+            return [(host, STATUS_POR_CODIGO[st], bool(fl)) for host, st, fl in rows]
+        finally:
+            con.close()
+
+    def ultima_transicao(self) -> int:
+        """ts da transição mais recente (0 sem nenhuma), pelo índice de ts."""
+        con = self._leitura()
+        try:
+            return con.execute("SELECT max(ts) FROM transicoes").fetchone()[0] or 0
+        finally:
+            con.close()
+
+    def transicoes(self, inicio: int, fim: int):
+        """
+        Gerador de (ts, host, status, is_flapping) das mudanças de estado
+        em (inicio, fim), em ordem de tempo, lido pelo índice de ts.
+        """
+        con = self._leitura()
+        try:
+            cur = con.execute(
+                "SELECT t.ts, h.host, t.status, t.flapping FROM transicoes t "
+                "JOIN hosts h ON h.id = t.host_id "
+                "WHERE t.ts > ? AND t.ts < ? ORDER BY t.ts",
+                (inicio, fim),
+            )
+            while True:
+                lote = cur.fetchmany(LOTE_LEITURA)
+                if not lote:
+                    break
+                for ts, host, status, flapping in lote:
+                    yield ts, host, STATUS_POR_CODIGO[status], bool(flapping)
+        finally:
+            con.close()
+
+    def resolucao_auto(self, inicio: int, fim: int, max_pontos: int = MAX_PONTOS) -> str:
+        """Camada mais fina cujo número de pontos no intervalo cabe em max_pontos."""
+        duracao = max(fim - inicio, 1)
+        if duracao / PASSO_RAW <= max_pontos:
+            return "raw"
+        for nome, passo in CAMADAS.items():
+            if duracao / passo <= max_pontos:
+                return nome
+        return "1d"
+
+    def serie(self, host: str, inicio: int, fim: int, resolucao: str) -> list:
+        """
+        Série de um host em [inicio, fim). raw: uma amostra por varredura;
+        camadas: pior e dominante status do bucket e fração do tempo em cada
+        estado. No máximo LIMITE_PONTOS pontos.
+        """
+        host_id = self._ids.get(host)
+        if host_id is None:
+            return []
+        con = self._leitura()
+        try:
+            if resolucao == "raw":
+                cur = con.execute(
+                    "SELECT ts, status, flapping FROM amostras "
+                    "WHERE host_id = ? AND ts >= ? AND ts < ? ORDER BY ts LIMIT ?",
+                    (host_id, inicio, fim, LIMITE_PONTOS),
+                )
+                return [
+                    {"ts": ts, "status": STATUS_POR_CODIGO[st], "is_flapping": bool(fl)}
+                    for ts, st, fl in cur
+                ]
+            passo = CAMADAS[resolucao]
+            cur = con.execute(
+                "SELECT bucket, c_up, c_unknown, c_warning, c_down FROM agregados "
+                "WHERE passo = ? AND host_id = ? AND bucket >= ? AND bucket < ? "
+                "ORDER BY bucket LIMIT ?",
+                (passo, host_id, inicio - inicio % passo, fim, LIMITE_PONTOS),
+            )
+            out = []
+            for bucket, *contagens in cur:
+                total = sum(contagens)
+                pior = max(c for c, qtd in enumerate(contagens) if qtd)
+                dominante = max(range(len(contagens)), key=lambda c: (contagens[c], c))
+                out.append({
+                    "ts": bucket,
+                    "pior": STATUS_POR_CODIGO[pior],
+                    "dominante": STATUS_POR_CODIGO[dominante],
+                    "fracoes": {
+                        STATUS_POR_CODIGO[c]: round(qtd / total, 4)
+                        for c, qtd in enumerate(contagens) if qtd
+                    },
+                })
+            return out
+        finally:
+            con.close()
+
+    def metricas(self, host: str, inicio: int, fim: int, passo: int) -> list:
+        """
+        Latência e perda de um host em [inicio, fim), das amostras raw
+        (dentro da retenção do raw). Com passo > PASSO_RAW, média e máximo
+        por intervalo de passo segundos.
+        """
+        host_id = self._ids.get(host)
+        if host_id is None:
+            return []
+        con = self._leitura()
+        try:
+            cur = con.execute(
+                "SELECT ts - ts % ? AS b, avg(rta), max(rta), avg(perda), max(perda) FROM amostras "
+                "WHERE host_id = ? AND ts >= ? AND ts < ? GROUP BY b ORDER BY b LIMIT ?",
+                (max(passo, 1), host_id, inicio, fim, LIMITE_PONTOS),
+            )
+            return [
+                {
+                    "ts": b,
+                    "rta_ms": None if rta is None else round(rta, 3),
+                    "rta_max_ms": rta_max,
+                    "perda_pct": None if perda is None else round(perda, 2),
+                    "perda_max_pct": perda_max,
+                }
+                for b, rta, rta_max, perda, perda_max in cur
+            ]
+        finally:
+            con.close()
+
+    def resumo_por_host(self, inicio: int, camada: str) -> dict:
+        """
+        {host: (amostras UP, amostras totais, soma_rta, n_rta)} somando os
+        buckets da camada a partir de inicio (uma leitura do índice
+        (passo, bucket), agrupada por host).
+        """
+        passo = CAMADAS[camada]
+        con = self._leitura()
+        try:
+            cur = con.execute(
+                "SELECT h.host, sum(a.c_up), sum(a.c_up + a.c_unknown + a.c_warning + a.c_down), "
+                "sum(a.soma_rta), sum(a.n_rta) FROM agregados a JOIN hosts h ON h.id = a.host_id "
+                "WHERE a.passo = ? AND a.bucket >= ? GROUP BY a.host_id",
+                (passo, inicio - inicio % passo),
+            )
+            return {host: (up, total, soma, n) for host, up, total, soma, n in cur}
+        finally:
+            con.close()
+
+    # -------------------------------
+    # COMPACTAÇÃO EM SEGUNDO PLANO
+    # -------------------------------
+
+    def iniciar_compactacao(self):
+        threading.Thread(target=self._compactacao_loop, name="compactacao", daemon=True).start()
+
+    def _compactacao_loop(self):
+        while True:
+            try:
+                self.compactar()
+            except Exception as e:
+                print(f"Falha na compactação do histórico: {e}")
+            time.sleep(INTERVALO_COMPACTACAO)
+
+    def compactar(self, agora: int = None) -> dict:
+        """
+        Remove dados vencidos de cada resolução em lotes de LOTE_EXCLUSAO
+        linhas, cada lote na sua transação (conexão própria, sem o lock do
+        coletor). Raw só é removido depois de estar nos agregados.
+        Retorna quantas linhas saíram de cada resolução.
+        """
+        agora = int(time.time()) if agora is None else agora
+        con = self._conectar()
+        removidas = {}
+        try:
+            ret = self.retencao.get("raw")
+            if ret:
+                limite = agora - ret
+                ate = self._meta("agregado_ate", con)
+                limite = min(limite, ate) if ate is not None else limite
+                removidas["raw"] = self._excluir_em_lotes(
+                    con,
+                    "DELETE FROM amostras WHERE rowid IN "
+                    "(SELECT rowid FROM amostras WHERE ts < ? LIMIT ?)",
+                    (limite,),
+                )
+            for nome, passo in CAMADAS.items():
+                ret = self.retencao.get(nome)
+                if not ret:
+                    continue
+                removidas[nome] = self._excluir_em_lotes(
+                    con,
+                    "DELETE FROM agregados WHERE (passo, host_id, bucket) IN "
+                    "(SELECT passo, host_id, bucket FROM agregados "
+                    "WHERE passo = ? AND bucket < ? LIMIT ?)",
+                    (passo, agora - ret),
+                )
+            ret = self.retencao.get("transicoes")
+            if ret:
+                # A última transição de cada host antes do limite fica: é
+                # ela que dá o estado inicial de um replay que comece ali.
+                limite = agora - ret
+                removidas["transicoes"] = self._excluir_em_lotes(
+                    con,
+                    "DELETE FROM transicoes WHERE (host_id, ts) IN "
+                    "(SELECT t.host_id, t.ts FROM transicoes t WHERE t.ts < ? AND EXISTS "
+                    "(SELECT 1 FROM transicoes u WHERE u.host_id = t.host_id "
+                    "AND u.ts > t.ts AND u.ts <= ?) LIMIT ?)",
+                    (limite, limite),
+                )
+            # Devolve o WAL ao tamanho mínimo; páginas livres são reaproveitadas
+            con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            con.close()
+        return removidas
+
+    @staticmethod
+    def _excluir_em_lotes(con, sql: str, params: tuple) -> int:
+        total = 0
+        while True:
+            n = con.execute(sql, params + (LOTE_EXCLUSAO,)).rowcount
+            total += n
+            if n < LOTE_EXCLUSAO:
+                return total
+            time.sleep(PAUSA_ENTRE_LOTES)
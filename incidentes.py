@@ -0,0 +1,161 @@
+# ============================================================
+# incidentes.py — correlação de quedas simultâneas
+# Quedas próximas no tempo que compartilham o mesmo enlace (coluna
+# de upstream da planilha de hosts) ou a mesma região (célula de
+# grade lat/lng) viram um único incidente com os hosts membros.
+# O coletor chama processar() a cada varredura só com os hosts que
+# mudaram de status; nada aqui percorre o inventário inteiro.
+# Um lock separa o coletor das leituras de /api/incidents: consultar()
+# nunca vê um incidente pela metade (sets e listas mudando no meio).
+# ============================================================
+import itertools
+import math
+import threading
+from collections import deque
+
+JANELA_INCIDENTE = 120      # segundos: quedas dentro da janela se agrupam
+MIN_HOSTS_INCIDENTE = 3     # quedas da mesma chave para abrir um incidente
+CELULA_REGIAO_GRAUS = 0.5   # ~50 km; agrupamento geográfico sem upstream
+MAX_ENCERRADOS = 50         # incidentes encerrados mantidos para consulta
+
+
+def chave_correlacao(p) -> str:
+    """Upstream declarado na planilha; sem ele, a célula da grade regional."""
+    if p.get("upstream"):
+        return "upstream:" + p["upstream"]
+    return "regiao:%d:%d" % (
+        math.floor(p["lat"] / CELULA_REGIAO_GRAUS),
+        math.floor(p["lng"] / CELULA_REGIAO_GRAUS),
+    )
+
+
+class Incidente:
+    __slots__ = ("id", "chave", "inicio", "ultimo", "fim", "membros", "down", "_lat", "_lng")
+
+    def __init__(self, ident: int, chave: str, inicio: int):
+        self.id = ident
+        self.chave = chave
+        self.inicio = inicio
+        self.ultimo = inicio   # última queda incorporada
+        self.fim = None
+        self.membros = []      # hosts na ordem em que caíram
+        self.down = set()      # membros ainda DOWN
+        self._lat = 0.0
+        self._lng = 0.0
+
+    def incluir(self, p, ts: int):
+        self.ultimo = ts
+        self.down.add(p["host"])
+        if p["host"] in self.membros:  # voltou e caiu de novo
+            return
+        self.membros.append(p["host"])
+        self._lat += p["lat"]
+        self._lng += p["lng"]
+
+    def resumo(self) -> dict:
+        n = len(self.membros)
+        tipo, _, valor = self.chave.partition(":")
+        return {
+            "id": self.id,
+            "tipo": tipo,
+            "upstream": valor if tipo == "upstream" else None,
+            "inicio": self.inicio,
+            "ultimo": self.ultimo,
+            "fim": self.fim,
+            "hosts": list(self.membros),
+            "down": sorted(self.down),
+            "centro": [round(self._lat / n, 5), round(self._lng / n, 5)],
+        }
+
+
+class DetectorIncidentes:
+    """
+    Candidatos por chave de correlação (fila de quedas dentro da janela);
+    quando a fila atinge MIN_HOSTS_INCIDENTE, abre um incidente com todos
+    eles. Novas quedas da mesma chave entram no incidente enquanto a
+    janela desde a última queda não fecha. O incidente encerra quando o
+    último membro sai de DOWN.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._lista = []
+        self._chaves = []
+        self._candidatos = {}   # chave -> deque[(ts, posição)]
+        self._agrupando = {}    # chave -> Incidente que ainda aceita membros
+        self._por_host = {}     # host -> Incidente aberto do qual é membro
+        self.abertos = {}       # id -> Incidente
+        self.encerrados = deque(maxlen=MAX_ENCERRADOS)
+
+    def inventario(self, lista):
+        """Recalcula as chaves por posição (só na carga do inventário)."""
+        chaves = [chave_correlacao(p) for p in lista]
+        with self._lock:
+            self._lista = lista
+            self._chaves = chaves
+            self._candidatos.clear()
+
+    def processar(self, agora: int, quedas, retornos) -> list:
+        """
+        quedas / retornos: posições que entraram em / saíram de DOWN nesta
+        varredura. Devolve os incidentes abertos agora.
+        """
+        novos = []
+        with self._lock:
+            for i in retornos:
+                self._retorno(i, agora)
+            for i in quedas:
+                inc = self._queda(i, agora)
+                if inc is not None:
+                    novos.append(inc)
+        return novos
+
+    def _queda(self, i: int, agora: int):
+        chave, p = self._chaves[i], self._lista[i]
+        inc = self._agrupando.get(chave)
+        if inc is not None and agora - inc.ultimo <= JANELA_INCIDENTE:
+            inc.incluir(p, agora)
+            self._por_host[p["host"]] = inc
+            return None
+
+        fila = self._candidatos.setdefault(chave, deque())
+        while fila and agora - fila[0][0] > JANELA_INCIDENTE:
+            fila.popleft()
+        fila.append((agora, i))
+        if len(fila) < MIN_HOSTS_INCIDENTE:
+            return None
+
+        inc = Incidente(next(self._ids), chave, fila[0][0])
+        for ts, j in fila:
+            inc.incluir(self._lista[j], ts)
+            self._por_host[self._lista[j]["host"]] = inc
+        del self._candidatos[chave]
+        self._agrupando[chave] = inc
+        self.abertos[inc.id] = inc
+        return inc
+
+    def _retorno(self, i: int, agora: int):
+        host, chave = self._lista[i]["host"], self._chaves[i]
+        fila = self._candidatos.get(chave)
+        if fila:
+            self._candidatos[chave] = deque(c for c in fila if c[1] != i)
+        inc = self._por_host.pop(host, None)
+        if inc is None:
+            return
+        inc.down.discard(host)
+        if inc.down:
+            return
+        inc.fim = agora
+        del self.abertos[inc.id]
+        if self._agrupando.get(inc.chave) is inc:
+            del self._agrupando[inc.chave]
+        self.encerrados.append(inc)
+
+    def consultar(self) -> dict:
+        with self._lock:  # resumo() percorre membros/down, que o processar() altera
+            abertos = sorted(self.abertos.values(), key=lambda x: -x.inicio)
+            return {
+                "abertos": [inc.resumo() for inc in abertos],
+                "encerrados": [inc.resumo() for inc in reversed(self.encerrados)],
+            }
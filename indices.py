@@ -0,0 +1,323 @@
+# ============================================================
+# indices.py — índices em memória sobre o inventário
+# Grade espacial por zoom para agregação de clusters no servidor
+# Índice espacial + por status para filtros do /api/status
+# Índice de n-gramas para a busca por nome/host (/api/search)
+# ============================================================
+import math
+import threading
+
+# -------------------------------
+# CÓDIGOS DE STATUS (ordem = severidade)
+# -------------------------------
+# Mesma ordem de statusSeverity() no mapa.js: quanto maior, pior.
+STATUS_POR_CODIGO = ("UP", "UNKNOWN", "WARNING", "DOWN")
+CODIGO_STATUS = {s: i for i, s in enumerate(STATUS_POR_CODIGO)}
+COD_UNKNOWN = CODIGO_STATUS["UNKNOWN"]
+COD_WARNING = CODIGO_STATUS["WARNING"]
+
+
+def codigo_efetivo(status: str, is_flapping: bool = False) -> int:
+    """
+    Código de severidade do status exibido no mapa.
+    Host em flapping conta como WARNING (mesma regra do mapa.js).
+    """
+    if is_flapping:
+        return COD_WARNING
+    return CODIGO_STATUS.get(status, COD_UNKNOWN)
+
+
+def parse_bbox(texto: str):
+    """
+    Converte "oeste,sul,leste,norte" (formato de L.LatLngBounds.toBBoxString)
+    em tupla de floats. Retorna None se vazio ou inválido.
+    """
+    if not texto:
+        return None
+    try:
+        oeste, sul, leste, norte = (float(v) for v in texto.split(","))
+    except ValueError:
+        return None
+    if sul > norte:
+        sul, norte = norte, sul
+    return oeste, sul, leste, norte
+
+# -------------------------------
+# PROJEÇÃO (Web Mercator, igual ao Leaflet)
+# -------------------------------
+TILE_PX = 256
+LAT_MAX = 85.0511287798
+
+
+def _projetar(lat: float, lng: float):
+    """Coordenadas normalizadas [0, 1) do mundo em Web Mercator."""
+    lat = max(-LAT_MAX, min(LAT_MAX, lat))
+    x = (lng + 180.0) / 360.0
+    s = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+    return x, y
+
+# -------------------------------
+# GRADE DE CLUSTERS POR ZOOM
+# -------------------------------
+ZOOM_MIN = 3    # mesmo minZoom do mapa
+ZOOM_MAX = 18   # mesmo maxZoom do mapa
+RAIO_CLUSTER_PX = 50  # mesmo maxClusterRadius do markerClusterGroup
+
+
+class _Celula:
+    __slots__ = ("contagem", "soma_lat", "soma_lng", "membros")
+
+    def __init__(self):
+        self.contagem = [0] * len(STATUS_POR_CODIGO)
+        self.soma_lat = 0.0
+        self.soma_lng = 0.0
+        self.membros = []
+
+
+class GradeClusters:
+    """
+    Grade pré-calculada sobre o inventário, uma por nível de zoom.
+    Cada célula tem RAIO_CLUSTER_PX pixels de lado e guarda a contagem
+    de hosts por status; mudanças de status só tocam a célula do host
+    em cada zoom (O(zooms) por transição).
+    """
+
+    def __init__(self, promotorias):
+        self._lock = threading.Lock()
+        self._promotorias = promotorias
+        self._codigos = [COD_UNKNOWN] * len(promotorias)
+        self._celulas = {}       # zoom -> {(cx, cy): _Celula}
+        self._celula_host = {}   # zoom -> [(cx, cy) por posição do inventário]
+
+        projetados = [_projetar(p["lat"], p["lng"]) for p in promotorias]
+        for z in range(ZOOM_MIN, ZOOM_MAX + 1):
+            escala = TILE_PX * (1 << z) / RAIO_CLUSTER_PX
+            celulas = {}
+            chaves = []
+            for i, (x, y) in enumerate(projetados):
+                chave = (int(x * escala), int(y * escala))
+                cel = celulas.get(chave)
+                if cel is None:
+                    cel = celulas[chave] = _Celula()
+                cel.contagem[COD_UNKNOWN] += 1
+                cel.soma_lat += promotorias[i]["lat"]
+                cel.soma_lng += promotorias[i]["lng"]
+                cel.membros.append(i)
+                chaves.append(chave)
+            self._celulas[z] = celulas
+            self._celula_host[z] = chaves
+
+    def definir_status(self, i: int, codigo: int) -> bool:
+        """Atualiza o status do host na posição i. Retorna True se mudou."""
+        antigo = self._codigos[i]
+        if antigo == codigo:
+            return False
+        with self._lock:
+            self._codigos[i] = codigo
+            for z, celulas in self._celulas.items():
+                cont = celulas[self._celula_host[z][i]].contagem
+                cont[antigo] -= 1
+                cont[codigo] += 1
+        return True
+
+    def consultar(self, zoom: int, bbox=None) -> list:
+        """
+        Clusters visíveis no zoom dado. bbox = (oeste, sul, leste, norte);
+        sem bbox retorna todas as células ocupadas.
+        """
+        z = max(ZOOM_MIN, min(ZOOM_MAX, int(zoom)))
+        escala = TILE_PX * (1 << z) / RAIO_CLUSTER_PX
+        if bbox:
+            oeste, sul, leste, norte = bbox
+            x0, y0 = _projetar(norte, oeste)
+            x1, y1 = _projetar(sul, leste)
+            cx0, cy0 = int(x0 * escala), int(y0 * escala)
+            cx1, cy1 = int(x1 * escala), int(y1 * escala)
+
+        out = []
+        with self._lock:
+            for (cx, cy), cel in self._celulas[z].items():
+                if bbox and not (cx0 <= cx <= cx1 and cy0 <= cy <= cy1):
+                    continue
+                n = len(cel.membros)
+                pior = max(c for c, qtd in enumerate(cel.contagem) if qtd)
+                item = {
+                    "lat": cel.soma_lat / n,
+                    "lng": cel.soma_lng / n,
+                    "count": n,
+                    "status": STATUS_POR_CODIGO[pior],
+                    "counts": {s: cel.contagem[c] for c, s in enumerate(STATUS_POR_CODIGO) if cel.contagem[c]},
+                }
+                if n == 1:
+                    p = self._promotorias[cel.membros[0]]
+                    item["nome"] = p["nome"]
+                    item["host"] = p["host"]
+                out.append(item)
+        return out
+
+# -------------------------------
+# ÍNDICE PARA FILTROS DO /api/status
+# -------------------------------
+PASSO_GRAUS = 0.25  # lado da célula do índice espacial (~25 km)
+
+
+def _celula_graus(lat: float, lng: float):
+    return int(math.floor(lat / PASSO_GRAUS)), int(math.floor(lng / PASSO_GRAUS))
+
+
+class IndiceInventario:
+    """
+    Índice montado junto com o inventário (load_data) para filtrar o
+    /api/status sem percorrer a lista inteira:
+    - grade fixa de PASSO_GRAUS graus -> posições no inventário
+    - baldes por status (status do Nagios, sem a regra de flapping)
+    - nome normalizado pré-calculado para o filtro por nome
+    """
+
+    def __init__(self, promotorias, normalizar):
+        self._lock = threading.Lock()
+        self._promotorias = promotorias
+        self._normalizar = normalizar
+        self._nomes = [normalizar(p["nome"]) for p in promotorias]
+        self._codigos = [COD_UNKNOWN] * len(promotorias)
+        self._por_status = [set() for _ in STATUS_POR_CODIGO]
+        self._por_status[COD_UNKNOWN].update(range(len(promotorias)))
+        self._grade = {}
+        for i, p in enumerate(promotorias):
+            self._grade.setdefault(_celula_graus(p["lat"], p["lng"]), []).append(i)
+
+    def definir_status(self, i: int, status: str):
+        codigo = CODIGO_STATUS.get(status, COD_UNKNOWN)
+        antigo = self._codigos[i]
+        if antigo == codigo:
+            return
+        with self._lock:
+            self._codigos[i] = codigo
+            self._por_status[antigo].discard(i)
+            self._por_status[codigo].add(i)
+
+    def _no_bbox(self, bbox) -> set:
+        oeste, sul, leste, norte = bbox
+        la0, lo0 = _celula_graus(sul, oeste)
+        la1, lo1 = _celula_graus(norte, leste)
+        lats = range(la0, la1 + 1)
+        lngs = range(lo0, lo1 + 1)
+        out = set()
+        if len(lats) * len(lngs) <= len(self._grade):
+            celulas = ((la, lo) for la in lats for lo in lngs)
+        else:
+            celulas = (c for c in self._grade if c[0] in lats and c[1] in lngs)
+        for c in celulas:
+            for i in self._grade.get(c, ()):
+                p = self._promotorias[i]
+                if sul <= p["lat"] <= norte and oeste <= p["lng"] <= leste:
+                    out.add(i)
+        return out
+
+    def filtrar(self, bbox=None, status=None, nome: str = "") -> list:
+        """
+        Posições (em ordem de inventário) que atendem a todos os filtros.
+        status é uma lista de nomes ("DOWN", "WARNING"...); nome é comparado
+        por substring sobre o nome normalizado.
+        """
+        with self._lock:
+            candidatos = None
+            if status:
+                candidatos = set()
+                for s in status:
+                    c = CODIGO_STATUS.get(s.strip().upper())
+                    if c is not None:
+                        candidatos |= self._por_status[c]
+            if bbox:
+                if candidatos is None:
+                    candidatos = self._no_bbox(bbox)
+                else:
+                    oeste, sul, leste, norte = bbox
+                    candidatos = {
+                        i for i in candidatos
+                        if sul <= self._promotorias[i]["lat"] <= norte
+                        and oeste <= self._promotorias[i]["lng"] <= leste
+                    }
+        if candidatos is None:
+            candidatos = range(len(self._promotorias))
+        termo = self._normalizar(nome) if nome else ""
+        if termo:
+            candidatos = [i for i in candidatos if termo in self._nomes[i]]
+        return sorted(candidatos)
+
+# -------------------------------
+# ÍNDICE DE BUSCA (nome / host)
+# -------------------------------
+TAM_NGRAMA = 3
+
+RANK_EXATO = 0
+RANK_PREFIXO = 1
+RANK_SUBSTRING = 2
+
+
+def _ngramas(chave: str):
+    """Todos os n-gramas de 1 a TAM_NGRAMA caracteres da chave."""
+    out = set()
+    for n in range(1, TAM_NGRAMA + 1):
+        for i in range(len(chave) - n + 1):
+            out.add(chave[i:i + n])
+    return out
+
+
+class IndiceBusca:
+    """
+    Chaves normalizadas de nome e host calculadas uma única vez por carga
+    do inventário, com lista invertida de n-gramas (até trigramas).
+    Uma consulta intersecta as listas dos trigramas do termo e só confere
+    substring nos candidatos; o resultado vem ordenado por exato, prefixo
+    e substring.
+    """
+
+    def __init__(self, promotorias, normalizar):
+        self._normalizar = normalizar
+        self._chaves = [
+            (normalizar(p["nome"]), normalizar(p["host"])) for p in promotorias
+        ]
+        self._postings = {}
+        for i, chaves in enumerate(self._chaves):
+            for chave in chaves:
+                for g in _ngramas(chave):
+                    self._postings.setdefault(g, set()).add(i)
+
+    def _candidatos(self, termo: str) -> set:
+        if len(termo) <= TAM_NGRAMA:
+            return self._postings.get(termo, set())
+        grams = sorted(
+            (termo[i:i + TAM_NGRAMA] for i in range(len(termo) - TAM_NGRAMA + 1)),
+            key=lambda g: len(self._postings.get(g, ())),
+        )
+        out = set(self._postings.get(grams[0], ()))
+        for g in grams[1:]:
+            if not out:
+                break
+            out &= self._postings.get(g, set())
+        return out
+
+    def buscar(self, termo: str, limite: int = 50) -> list:
+        """Lista de (rank, posição) do melhor para o pior."""
+        termo = self._normalizar(termo)
+        if not termo:
+            return []
+        achados = []
+        for i in self._candidatos(termo):
+            rank = None
+            for chave in self._chaves[i]:
+                if chave == termo:
+                    r = RANK_EXATO
+                elif chave.startswith(termo):
+                    r = RANK_PREFIXO
+                elif termo in chave:
+                    r = RANK_SUBSTRING
+                else:
+                    continue
+                rank = r if rank is None else min(rank, r)
+            if rank is not None:
+                achados.append((rank, i))
+        achados.sort()
+        return achados[:limite]
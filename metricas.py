@@ -0,0 +1,52 @@
+# ============================================================
+# metricas.py — métricas numéricas a partir da saída do check_ping
+# perf_data no formato do Nagios ('rótulo'=valor[unidade];warn;crit;min;max)
+# e, na falta dele, o texto "Packet loss = 0%, RTA = 1.23 ms" do
+# plugin_output. Latência sempre em ms, perda em %.
+# ============================================================
+import math
+import re
+
+SEM_VALOR = math.nan
+
+_PERF_ITEM = re.compile(r"""('[^']+'|[^\s=]+)=([-+]?[\d.]+(?:[eE][-+]?\d+)?)([a-zA-Z%]*)""")
+_RTA_TEXTO = re.compile(r"RTA\s*=\s*([\d.]+)\s*ms", re.IGNORECASE)
+_PERDA_TEXTO = re.compile(r"(?:packet\s+)?loss\s*=\s*([\d.]+)\s*%", re.IGNORECASE)
+
+_PARA_MS = {"s": 1000.0, "ms": 1.0, "us": 0.001}
+
+
+def parse_perfdata(texto: str) -> dict:
+    """{rótulo: (valor, unidade)} de uma string de perfdata."""
+    out = {}
+    for rotulo, valor, unidade in _PERF_ITEM.findall(texto or ""):
+        try:
+            out[rotulo.strip("'")] = (float(valor), unidade)
+        except ValueError:
+            continue
+    return out
+
+
+def extrair_ping(perf_data: str, plugin_output: str):
+    """(rta_ms, perda_pct); SEM_VALOR (NaN) no que não foi encontrado."""
+    rta = perda = SEM_VALOR
+    perf = parse_perfdata(perf_data)
+    if "rta" in perf:
+        valor, unidade = perf["rta"]
+        rta = valor * _PARA_MS.get(unidade.lower(), 1.0)
+    if "pl" in perf:
+        perda = perf["pl"][0]
+    if math.isnan(rta) and plugin_output:
+        m = _RTA_TEXTO.search(plugin_output)
+        if m:
+            rta = float(m.group(1))
+    if math.isnan(perda) and plugin_output:
+        m = _PERDA_TEXTO.search(plugin_output)
+        if m:
+            perda = float(m.group(1))
+    return rta, perda
+
+
+def ou_none(valor: float):
+    """NaN -> None (JSON null / SQL NULL)."""
+    return None if math.isnan(valor) else valor
@@ -0,0 +1,252 @@
+# ============================================================
+# notificador.py — notificações de quedas e retornos
+# O coletor só enfileira eventos (fila limitada, sem bloquear); uma
+# thread própria junta os eventos numa janela, descarta repetições
+# por host e entrega o lote a cada remetente (webhook, chat, e-mail),
+# respeitando um intervalo mínimo entre envios.
+#
+# Configuração (variáveis de ambiente; sem nenhuma, fica desligado):
+#   NOTIFICAR_WEBHOOK=https://...      POST JSON com o lote
+#   NOTIFICAR_CHAT=https://...         POST {"text": ...} (Slack/Mattermost/Teams)
+#   NOTIFICAR_SMTP=host:porta  NOTIFICAR_EMAIL_DE=...  NOTIFICAR_EMAIL_PARA=a@x,b@y
+# ============================================================
+import os
+import queue
+import smtplib
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from email.message import EmailMessage
+
+import requests
+
+JANELA_NOTIFICACAO = 30     # segundos de coalescência a partir do 1º evento
+INTERVALO_MINIMO = 60       # segundos entre dois envios do mesmo remetente
+RESFRIAMENTO_HOST = 600     # host oscilando: no máximo 1 aviso de DOWN nesse período (o resto espera)
+TAMANHO_FILA = 1000         # eventos pendentes; além disso, descarta (e conta)
+
+
+# -------------------------------
+# REMETENTES
+# -------------------------------
+
+class Remetente(ABC):
+    """Destino de notificações; subclasses implementam enviar(lote)."""
+
+    nome = "remetente"
+
+    def __init__(self):
+        self.proximo_envio = 0.0
+
+    @abstractmethod
+    def enviar(self, lote: dict):
+        """Entrega o lote; exceção = falha (contada pelo Notificador)."""
+
+
+class RemetenteWebhook(Remetente):
+    nome = "webhook"
+
+    def __init__(self, url: str, timeout: float = 10):
+        super().__init__()
+        self.url = url
+        self.timeout = timeout
+
+    def enviar(self, lote: dict):
+        requests.post(self.url, json=lote, timeout=self.timeout).raise_for_status()
+
+
+class RemetenteChat(RemetenteWebhook):
+    """Webhook de entrada de chat: só o texto formatado."""
+
+    nome = "chat"
+
+    def enviar(self, lote: dict):
+        requests.post(self.url, json={"text": formatar_texto(lote)}, timeout=self.timeout).raise_for_status()
+
+
+class RemetenteEmail(Remetente):
+    nome = "email"
+
+    def __init__(self, servidor: str, remetente: str, destinatarios, timeout: float = 10):
+        super().__init__()
+        host, _, porta = servidor.partition(":")
+        self.host, self.porta = host, int(porta or 25)
+        self.remetente = remetente
+        self.destinatarios = list(destinatarios)
+        self.timeout = timeout
+
+    def enviar(self, lote: dict):
+        msg = EmailMessage()
+        msg["Subject"] = formatar_assunto(lote)
+        msg["From"] = self.remetente
+        msg["To"] = ", ".join(self.destinatarios)
+        msg.set_content(formatar_texto(lote))
+        with smtplib.SMTP(self.host, self.porta, timeout=self.timeout) as smtp:
+            smtp.send_message(msg)
+
+
+def remetentes_do_ambiente() -> list:
+    out = []
+    if os.environ.get("NOTIFICAR_WEBHOOK"):
+        out.append(RemetenteWebhook(os.environ["NOTIFICAR_WEBHOOK"]))
+    if os.environ.get("NOTIFICAR_CHAT"):
+        out.append(RemetenteChat(os.environ["NOTIFICAR_CHAT"]))
+    if os.environ.get("NOTIFICAR_SMTP") and os.environ.get("NOTIFICAR_EMAIL_PARA"):
+        out.append(RemetenteEmail(
+            os.environ["NOTIFICAR_SMTP"],
+            os.environ.get("NOTIFICAR_EMAIL_DE", "monitoramento@localhost"),
+            [e.strip() for e in os.environ["NOTIFICAR_EMAIL_PARA"].split(",") if e.strip()],
+        ))
+    return out
+
+# -------------------------------
+# FORMATAÇÃO
+# -------------------------------
+
+def _hora(ts: int) -> str:
+    return datetime.fromtimestamp(ts).strftime("%d/%m %H:%M")
+
+
+def formatar_assunto(lote: dict) -> str:
+    quedas = sum(1 for e in lote["eventos"] if e["status"] == "DOWN")
+    partes = []
+    if lote["incidentes"]:
+        partes.append(f"{len(lote['incidentes'])} incidente(s)")
+    if quedas:
+        partes.append(f"{quedas} host(s) DOWN")
+    retornos = len(lote["eventos"]) - quedas
+    if retornos:
+        partes.append(f"{retornos} retorno(s)")
+    return "[Monitoramento] " + ", ".join(partes)
+
+
+def formatar_texto(lote: dict) -> str:
+    linhas = []
+    for inc in lote["incidentes"]:
+        origem = f"upstream {inc['upstream']}" if inc["tipo"] == "upstream" else "mesma região"
+        linhas.append(f"INCIDENTE #{inc['id']} ({origem}) desde {_hora(inc['inicio'])}: "
+                      f"{len(inc['hosts'])} hosts DOWN — {', '.join(inc['hosts'])}")
+    for e in lote["eventos"]:
+        linhas.append(f"{e['status']}: {e['nome']} ({e['host']}) às {_hora(e['ts'])}")
+    return "\n".join(linhas)
+
+# -------------------------------
+# NOTIFICADOR
+# -------------------------------
+
+class Notificador:
+    """
+    Eventos: {"ts", "host", "nome", "status"} (status novo: DOWN ou o de
+    retorno) e incidentes (resumo() de incidentes.Incidente). Hosts de
+    um incidente do mesmo lote saem da lista individual.
+    """
+
+    def __init__(self, remetentes=None):
+        self.remetentes = list(remetentes or [])
+        self._fila = queue.Queue(maxsize=TAMANHO_FILA)
+        self._notificado = {}       # host -> último status avisado
+        self._ultima_queda = {}     # host -> ts do último aviso de DOWN
+        self._pendente = {}         # host -> queda segurada pelo resfriamento
+        self.descartados = 0        # eventos perdidos por fila cheia
+        self.enviados = 0
+        self.falhas = 0
+
+    @property
+    def habilitado(self) -> bool:
+        return bool(self.remetentes)
+
+    def iniciar(self):
+        if self.habilitado:
+            threading.Thread(target=self._loop, name="notificador", daemon=True).start()
+
+    # --- lado do coletor: nunca bloqueia ---
+
+    def publicar(self, eventos=(), incidentes=()):
+        if not self.habilitado:
+            return
+        for item in [("evento", e) for e in eventos] + [("incidente", i) for i in incidentes]:
+            try:
+                self._fila.put_nowait(item)
+            except queue.Full:
+                self.descartados += 1
+
+    # --- thread do notificador ---
+
+    def _loop(self):
+        while True:
+            try:
+                itens = [self._fila.get(timeout=self._espera_pendente())]
+            except queue.Empty:
+                itens = []  # só venceu o resfriamento de uma queda pendente
+            limite = time.monotonic() + (JANELA_NOTIFICACAO if itens else 0)
+            while True:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    itens.append(self._fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            lote = self.montar_lote(itens)
+            if lote is not None:
+                self._entregar(lote)
+
+    def _espera_pendente(self):
+        """Segundos até vencer o resfriamento da próxima queda pendente (None: nenhuma)."""
+        if not self._pendente:
+            return None
+        vence = min(self._ultima_queda[h] for h in self._pendente) + RESFRIAMENTO_HOST
+        return max(0.0, vence - time.time())
+
+    def montar_lote(self, itens, agora: float = None):
+        """
+        Coalescência: último status por host, sem repetir o já avisado.
+        Uma queda dentro do resfriamento fica pendente e sai quando ele
+        vence (agora: padrão time.time()), se o host não voltou antes.
+        """
+        agora = time.time() if agora is None else agora
+        incidentes = [i for tipo, i in itens if tipo == "incidente"]
+        em_incidente = {h for inc in incidentes for h in inc["hosts"]}
+        ultimo = {}
+        for tipo, e in itens:
+            if tipo == "evento":
+                ultimo[e["host"]] = e
+        eventos = []
+        for host, e in ultimo.items():
+            if e["status"] != "DOWN":
+                self._pendente.pop(host, None)  # voltou: a queda segurada não sai mais
+            if self._notificado.get(host, "UP") == e["status"]:
+                continue  # caiu e voltou (ou o contrário) dentro da janela
+            if e["status"] == "DOWN":
+                if e["ts"] - self._ultima_queda.get(host, 0) < RESFRIAMENTO_HOST:
+                    self._pendente[host] = e  # oscilando: avisa no fim do resfriamento
+                    continue
+                self._ultima_queda[host] = e["ts"]
+            self._notificado[host] = e["status"]
+            if host not in em_incidente:
+                eventos.append(e)
+        # pendentes que venceram o resfriamento ainda DOWN (o retorno tira daqui)
+        for host, e in list(self._pendente.items()):
+            if agora - self._ultima_queda[host] >= RESFRIAMENTO_HOST:
+                del self._pendente[host]
+                self._ultima_queda[host] = agora
+                self._notificado[host] = "DOWN"
+                if host not in em_incidente:
+                    eventos.append(e)
+        if not (eventos or incidentes):
+            return None
+        return {"gerado_em": int(time.time()), "incidentes": incidentes, "eventos": eventos}
+
+    def _entregar(self, lote: dict):
+        for r in self.remetentes:
+            espera = r.proximo_envio - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)  # limite de taxa por remetente
+            r.proximo_envio = time.monotonic() + INTERVALO_MINIMO
+            try:
+                r.enviar(lote)
+                self.enviados += 1
+            except Exception as e:
+                self.falhas += 1
+                print(f"Falha ao notificar via {r.nome}: {e}")
@@ -0,0 +1,94 @@
+# ============================================================
+# publicador.py — estado publicado em arquivos, para um proxy servir
+# Opcional (PUBLICAR_DIR). Depois de cada varredura grava no diretório,
+# com os mesmos caminhos que o mapa pede ao servidor:
+#   api/status      lista completa (a mesma do /api/status sem filtros)
+#   api/incidents   incidentes abertos e encerrados recentes
+#   api/mudancas    {"seq","ts","origem","varreduras":[{"seq","ts","hosts"}]}
+#                   hosts alterados nas últimas varreduras (mais antiga primeiro),
+#                   para clientes que só querem o que mudou desde a sua seq
+# cada um com .gz (e .br, se o módulo brotli estiver instalado) ao lado,
+# e, uma vez na partida, index.html + assets/ do pacote dos estáticos.
+# Todo arquivo é gravado num .tmp do mesmo diretório e trocado com
+# os.replace: o proxy nunca entrega um arquivo pela metade.
+#
+# Só essas leituras viram arquivo (o mapa em si lê api/status); o resto (/api/status com filtros,
+# /api/clusters, /api/search, /api/replay, /api/quality, /api/history,
+# /api/stream, /tiles, /icons...) continua no server.py. Exemplo (nginx):
+#   upstream mapa { server 127.0.0.1:8080; }
+#   root /srv/mapa;
+#   location = / { try_files /index.html @mapa; add_header Cache-Control no-cache;
+#                  gzip_static on; }
+#   location = /api/status { set $filtro $arg_bbox$arg_status$arg_nome;
+#                            if ($filtro) { proxy_pass http://mapa; }
+#                            default_type application/json; gzip_static on;
+#                            add_header Cache-Control no-cache; }
+#   location ~ ^/api/(incidents|mudancas)$ { default_type application/json;
+#                               gzip_static on; add_header Cache-Control no-cache; }
+#   location /assets/ { try_files $uri @mapa; gzip_static on; expires max; }
+#   location / { proxy_pass http://mapa; }
+#   location @mapa { proxy_pass http://mapa; }
+# ============================================================
+import collections
+import gzip
+import os
+
+from estaticos import brotli
+from serializacao import dumps
+
+VARREDURAS_NO_FEED = 30  # ~5 min a cada 10 s; atrás disso, o cliente relê api/status
+
+
+class PublicadorEstatico:
+    def __init__(self, diretorio: str, varreduras: int = VARREDURAS_NO_FEED):
+        self.diretorio = diretorio
+        self._varreduras = collections.deque(maxlen=varreduras)  # (seq, ts, json dos alterados)
+        os.makedirs(os.path.join(diretorio, "api"), exist_ok=True)
+
+    def _gravar(self, rel: str, corpo: bytes, gz: bytes = None, br: bytes = None,
+                comprimir: bool = True):
+        """Grava rel (e as variantes comprimidas) com rename-into-place."""
+        caminho = os.path.join(self.diretorio, rel)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        if gz is None and comprimir:
+            gz = gzip.compress(corpo, 6, mtime=0)
+        if br is None and brotli and comprimir:
+            br = brotli.compress(corpo, quality=5)
+        # variantes antes do original: quem já vê o novo original acha as
+        # comprimidas pelo menos tão novas quanto ele
+        for destino, dados in ((caminho + ".gz", gz), (caminho + ".br", br), (caminho, corpo)):
+            if dados is None:
+                continue
+            tmp = os.path.join(os.path.dirname(destino), "." + os.path.basename(destino) + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(dados)
+            os.replace(tmp, destino)
+
+    def publicar_pacote(self, pacote):
+        """index.html e assets/ do PacoteEstatico (nomes com hash: nunca sobrescritos)."""
+        for nome, (corpo, gz, br, _mimetype) in pacote.ativos.items():
+            if not os.path.exists(os.path.join(self.diretorio, "assets", nome)):
+                # sem gz no pacote: formato já comprimido (PNG...), vai só o original
+                self._gravar(os.path.join("assets", nome), corpo, gz, br, comprimir=gz is not None)
+        corpo, gz, br, _etag = pacote.index
+        self._gravar("index.html", corpo, gz, br)
+
+    def publicar_varredura(self, seq: int, ts: float, origem, status_json: bytes,
+                           mudancas_json: bytes, incidentes_json: bytes):
+        """
+        status_json e mudancas_json já vêm codificados (TabelaEstado.json);
+        api/mudancas junta as listas de alterados sem decodificar de novo.
+        """
+        self._varreduras.append((seq, int(ts), mudancas_json))
+        cab = dumps({"seq": seq, "ts": int(ts), "origem": origem})[:-1] + b',"varreduras":['
+        itens = b",".join(b'{"seq":%d,"ts":%d,"hosts":%s}' % v for v in self._varreduras)
+        # status antes do feed: quem vê a seq nova no feed já acha o status dela
+        self._gravar(os.path.join("api", "status"), status_json)
+        self._gravar(os.path.join("api", "incidents"), incidentes_json)
+        self._gravar(os.path.join("api", "mudancas"), cab + itens + b"]}")
+
+
+def publicador_do_ambiente():
+    """PublicadorEstatico em PUBLICAR_DIR, ou None (padrão: não publica)."""
+    diretorio = os.environ.get("PUBLICAR_DIR", "")
+    return PublicadorEstatico(diretorio) if diretorio else None
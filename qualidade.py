@@ -0,0 +1,157 @@
+# ============================================================
+# qualidade.py — camada de qualidade dos enlaces (choropleth)
+# Disponibilidade ou latência média por célula de grade, numa janela
+# de tempo, a partir dos agregados do histórico (sem tocar no raw).
+# As células ficam em cache por (métrica, janela, zoom), cada uma com
+# o fragmento JSON da sua feature; quando o resumo da janela é relido
+# (no máximo uma vez por intervalo dela), só as células dos hosts cujos
+# números mudaram são refeitas e o GeoJSON é remontado juntando bytes.
+# ============================================================
+import hashlib
+import math
+import threading
+import time
+
+from indices import ZOOM_MIN
+from serializacao import dumps
+
+# janela -> (segundos, camada do histórico, intervalo mínimo entre regenerações)
+JANELAS = {
+    "1h": (3600, "1m", 60),
+    "24h": (86400, "1h", 300),
+    "7d": (7 * 86400, "1h", 900),
+    "30d": (30 * 86400, "1d", 3600),
+}
+METRICAS = ("availability", "latency")
+ZOOM_MAX_QUALIDADE = 12      # acima disso a célula já é menor que um município
+CELULA_BASE_GRAUS = 8.0      # tamanho da célula no zoom 0 (divide por 2 a cada nível)
+
+# Escalas de cor (limite inferior/superior, cor); última entrada = resto
+_ESCALA_DISPONIBILIDADE = ((0.999, "#22c55e"), (0.99, "#84cc16"), (0.95, "#f59e0b"),
+                           (0.90, "#f97316"), (None, "#ef4444"))
+_ESCALA_LATENCIA = ((20.0, "#22c55e"), (50.0, "#84cc16"), (100.0, "#f59e0b"),
+                    (200.0, "#f97316"), (None, "#ef4444"))
+
+
+def cor_para(metrica: str, valor: float) -> str:
+    if metrica == "availability":
+        for limite, cor in _ESCALA_DISPONIBILIDADE:
+            if limite is None or valor >= limite:
+                return cor
+    for limite, cor in _ESCALA_LATENCIA:
+        if limite is None or valor < limite:
+            return cor
+
+
+def tamanho_celula(zoom: int) -> float:
+    return CELULA_BASE_GRAUS / (2 ** zoom)
+
+
+class _Grade:
+    """
+    Células de uma (métrica, janela, zoom) para um inventário: membros de
+    cada célula (fixos) e o fragmento JSON da feature de cada uma. Um
+    resumo novo só refaz as células dos hosts cujos números mudaram.
+    """
+
+    def __init__(self, promotorias, metrica: str, janela: str, zoom: int):
+        self.promotorias = promotorias
+        self.metrica = metrica
+        self.tam = tamanho_celula(zoom)
+        self.membros = {}       # (cx, cy) -> [posições no inventário]
+        self.celula_host = []   # posição -> (cx, cy)
+        for i, p in enumerate(promotorias):
+            chave = (math.floor(p["lng"] / self.tam), math.floor(p["lat"] / self.tam))
+            self.membros.setdefault(chave, []).append(i)
+            self.celula_host.append(chave)
+        self.fragmentos = dict.fromkeys(self.membros)  # (cx, cy) -> bytes ou None (sem dados)
+        self.resumo = {}
+        self.lido_em = None
+        self.cabecalho = dumps({"type": "FeatureCollection", "metric": metrica, "window": janela,
+                                "zoom": zoom})[:-1] + b',"features":['
+        self.corpo = self.etag = None
+
+    def atualizar(self, lido_em: float, resumo: dict):
+        anterior = self.resumo
+        sujas = {self.celula_host[i] for i, p in enumerate(self.promotorias)
+                 if resumo.get(p["host"]) != anterior.get(p["host"])}
+        for chave in sujas:
+            self.fragmentos[chave] = self._feature(chave, resumo)
+        self.resumo, self.lido_em = resumo, lido_em
+        if sujas or self.corpo is None:
+            self.corpo = self.cabecalho + b",".join(f for f in self.fragmentos.values() if f) + b"]}"
+            self.etag = hashlib.sha1(self.corpo).hexdigest()[:16]
+
+    def _feature(self, chave, resumo):
+        num = den = hosts = 0
+        nomes = []
+        for i in self.membros[chave]:
+            p = self.promotorias[i]
+            r = resumo.get(p["host"])
+            if r is None:
+                continue
+            up, total, soma_rta, n_rta = r
+            n, d = (up, total) if self.metrica == "availability" else (soma_rta, n_rta)
+            if not d:
+                continue
+            num += n
+            den += d
+            hosts += 1
+            if len(nomes) < 5:
+                nomes.append(p["nome"])
+        if not den:
+            return None
+        valor = num / den
+        tam = self.tam
+        oeste, sul = chave[0] * tam, chave[1] * tam
+        return dumps({
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[oeste, sul], [oeste + tam, sul], [oeste + tam, sul + tam],
+                                 [oeste, sul + tam], [oeste, sul]]],
+            },
+            "properties": {
+                "valor": round(valor, 4 if self.metrica == "availability" else 1),
+                "cor": cor_para(self.metrica, valor),
+                "hosts": hosts,
+                "nomes": nomes,
+            },
+        })
+
+
+class CamadaQualidade:
+    """
+    Por (métrica, janela): valores por host lidos de resumo_por_host()
+    no máximo a cada intervalo da janela. Por zoom: as células (_Grade),
+    atualizadas só onde algum host mudou, e o ETag do GeoJSON (hash do
+    conteúdo — não muda se os números não mudaram).
+    """
+
+    def __init__(self, historico):
+        self.historico = historico
+        self._lock = threading.Lock()
+        self._resumos = {}   # janela -> (instante da leitura, {host: (...)})
+        self._grades = {}    # (métrica, janela, zoom) -> _Grade
+
+    def _resumo(self, janela: str):
+        segundos, camada, intervalo = JANELAS[janela]
+        agora = time.time()
+        lido = self._resumos.get(janela)
+        if lido is None or agora - lido[0] >= intervalo:
+            lido = (agora, self.historico.resumo_por_host(int(agora) - segundos, camada))
+            self._resumos[janela] = lido
+        return lido
+
+    def geojson(self, promotorias, metrica: str, janela: str, zoom: int):
+        """(corpo em bytes, etag) da camada pedida."""
+        zoom = max(ZOOM_MIN, min(zoom, ZOOM_MAX_QUALIDADE))
+        with self._lock:
+            lido_em, resumo = self._resumo(janela)
+            chave = (metrica, janela, zoom)
+            grade = self._grades.get(chave)
+            if grade is None or grade.promotorias is not promotorias:
+                grade = self._grades[chave] = _Grade(promotorias, metrica, janela, zoom)
+            if grade.lido_em != lido_em:
+                grade.atualizar(lido_em, resumo)
+            return grade.corpo, grade.etag
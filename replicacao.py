@@ -0,0 +1,241 @@
+# ============================================================
+# replicacao.py — dois nós servindo o mapa com um único coletor
+# Um nó é o líder (só ele varre o Nagios); o outro é seguidor: recebe
+# do líder, por long-poll HTTP, cada varredura (linhas dos hosts que
+# mudaram + latência/perda de todos) e aplica na própria tabela e no
+# próprio histórico, servindo as mesmas leituras. Cada resposta do
+# líder renova o lease; sem resposta por LEASE_SEGUNDOS, o seguidor
+# assume (termo + 1) e começa a varrer. Se os dois se virem como
+# líderes (rede separada e depois reunida), fica o de termo maior; no
+# empate, o de menor nome.
+# Histórico: enquanto segue, o seguidor grava as próprias amostras e
+# transições a partir do que aplica. Ao (re)começar pelo instantâneo
+# completo, manda o ts da sua última transição e recebe junto as
+# transições que o líder gravou depois dela (no máximo as dos últimos
+# REPOSICAO_HISTORICO segundos), para o replay não ter buraco. As
+# amostras (séries e agregados) desse intervalo não são repostas.
+#
+# Configuração (sem REPLICA_PAR o nó é sempre líder, como antes):
+#   REPLICA_PAR=http://outro-no:8080    URL do outro nó
+#   REPLICA_NO=a                        nome deste nó (desempate; padrão: hostname)
+#   REPLICA_TOKEN=...                   segredo compartilhado (obrigatório: sem ele
+#                                       a replicação fica desligada e /api/replica/*
+#                                       responde 403)
+# ============================================================
+import collections
+import hmac
+import os
+import socket
+import threading
+import time
+import uuid
+
+import requests
+
+LEASE_SEGUNDOS = 30         # sem notícia do líder por esse tempo, o seguidor assume
+ESPERA_FEED = 15            # long-poll: o líder segura o pedido até a próxima varredura
+VARREDURAS_NO_FEED = 30     # buffer do líder (~5 min a cada 10 s); atrás disso, instantâneo
+INTERVALO_VERIFICACAO = 5   # líder consulta o par para detectar dois líderes
+REPOSICAO_HISTORICO = 7 * 86400  # transições repostas a quem volta depois de parado
+
+LIDER, SEGUIDOR = "lider", "seguidor"
+
+
+def vence(termo_a: int, no_a: str, termo_b: int, no_b: str) -> bool:
+    """A tem precedência sobre B: termo maior; no empate, menor nome."""
+    return termo_a > termo_b or (termo_a == termo_b and no_a < no_b)
+
+
+class Replicacao:
+    """
+    Lado do líder: registrar_varredura() guarda as últimas varreduras e
+    acorda quem espera em feed(). Lado do seguidor: a thread _loop()
+    chama os callbacks do server (aplicar_varredura / aplicar_completo)
+    com o que chega do líder.
+    """
+
+    def __init__(self, par: str = "", no: str = "", token: str = ""):
+        self.par = par.rstrip("/")
+        self.no = no or socket.gethostname()
+        self.token = token
+        self.papel = SEGUIDOR if self.par else LIDER
+        self.termo = 0
+        self.sessao = uuid.uuid4().hex[:12]  # muda a cada processo e a cada posse
+        self._cond = threading.Condition()
+        self._varreduras = collections.deque(maxlen=VARREDURAS_NO_FEED)
+        self._ultima_seq = 0
+        # seguidor: de quem e até onde já aplicou
+        self._http = requests.Session()
+        self.lider = None           # {"no", "sessao", "termo"} do líder seguido
+        self.seq_lider = 0
+        self.ultimo_contato = time.monotonic()
+        # fornecidos pelo server em iniciar()
+        self._instantaneo = None
+        self._aplicar_varredura = None
+        self._aplicar_completo = None
+        self._ultima_transicao = None
+        self.ao_aplicar = None  # chamado depois de aplicar dados do líder (ASGI: acorda o /api/stream)
+
+    @property
+    def ativa(self) -> bool:
+        return bool(self.par)
+
+    def sou_lider(self) -> bool:
+        return self.papel == LIDER
+
+    def iniciar(self, instantaneo, aplicar_varredura, aplicar_completo, ultima_transicao=None):
+        """
+        instantaneo(transicoes_desde) -> {"seq", "ts", "hosts", "transicoes"};
+        aplicar_* recebem o que o líder mandou; ultima_transicao() -> ts da
+        última transição no histórico deste nó (0: nenhuma).
+        """
+        self._instantaneo = instantaneo
+        self._aplicar_varredura = aplicar_varredura
+        self._aplicar_completo = aplicar_completo
+        self._ultima_transicao = ultima_transicao
+        if self.ativa:
+            threading.Thread(target=self._loop, name="replicacao", daemon=True).start()
+
+    def autorizado(self, token: str) -> bool:
+        return bool(self.token) and hmac.compare_digest(token.encode(), self.token.encode())
+
+    def estado(self) -> dict:
+        return {"no": self.no, "papel": self.papel, "termo": self.termo, "sessao": self.sessao,
+                "par": self.par, "lider": self.lider if self.papel == SEGUIDOR else None,
+                "seq": self._ultima_seq if self.papel == LIDER else self.seq_lider,
+                "sem_contato_s": round(time.monotonic() - self.ultimo_contato, 1)}
+
+    # -------------------------------
+    # LÍDER
+    # -------------------------------
+
+    def registrar_varredura(self, varredura: dict):
+        """varredura: {"seq", "ts", "inventario", "linhas", "rta", "perda"}."""
+        if not self.ativa or self.papel != LIDER:
+            return
+        with self._cond:
+            self._varreduras.append(varredura)
+            self._ultima_seq = varredura["seq"]
+            self._cond.notify_all()
+
+    def feed(self, sessao: str, desde: int, espera: float, historico: int = 0) -> dict:
+        """
+        Varreduras posteriores a desde (long-poll de até espera segundos)
+        ou, se o seguidor é de outra sessão/ficou para trás, o instantâneo
+        completo, com as transições gravadas depois de historico (ts da
+        última do seguidor). Um nó que não é líder só responde quem é.
+        """
+        resposta = {"no": self.no, "sessao": self.sessao, "termo": self.termo, "papel": self.papel}
+        if self.papel != LIDER:
+            return resposta
+        with self._cond:
+            if sessao == self.sessao and desde == self._ultima_seq:
+                self._cond.wait_for(lambda: self._ultima_seq != desde or self.papel != LIDER,
+                                    timeout=max(0.0, min(espera, ESPERA_FEED)))
+            varreduras = list(self._varreduras)
+            ultima = self._ultima_seq
+        resposta["papel"] = self.papel
+        continua = sessao == self.sessao and desde <= ultima and (
+            desde == ultima or (varreduras and varreduras[0]["seq"] <= desde + 1))
+        if continua:
+            resposta["varreduras"] = [v for v in varreduras if v["seq"] > desde]
+        else:
+            completo = self._instantaneo(max(historico, int(time.time()) - REPOSICAO_HISTORICO))
+            with self._cond:
+                # a seq do instantâneo vira a base: o próximo pedido (desde = ela)
+                # espera a varredura seguinte, mesmo logo depois de assumir
+                self._ultima_seq = max(self._ultima_seq, completo["seq"])
+            resposta["completo"] = completo
+        return resposta
+
+    def _verificar_par(self):
+        try:
+            r = self._http.get(self.par + "/api/replica/estado", headers=self._cabecalhos(), timeout=5)
+            r.raise_for_status()
+            par = r.json()
+        except (requests.RequestException, ValueError):
+            return  # par fora: continua líder
+        if par["papel"] == LIDER and vence(par["termo"], par["no"], self.termo, self.no):
+            print(f"Replicação: {par['no']} também é líder (termo {par['termo']}); passando a seguidor")
+            self._rebaixar()
+
+    def _rebaixar(self):
+        with self._cond:
+            self.papel = SEGUIDOR
+            self._varreduras.clear()
+            self._cond.notify_all()  # libera os long-polls pendentes
+        self.lider = None
+        self.seq_lider = 0
+        self.ultimo_contato = time.monotonic()
+
+    def _assumir(self, motivo: str):
+        with self._cond:
+            self.termo += 1
+            self.sessao = uuid.uuid4().hex[:12]
+            self._varreduras.clear()
+            self._ultima_seq = 0
+            self.papel = LIDER
+        self.lider = None
+        print(f"Replicação: {self.no} assume como líder (termo {self.termo}): {motivo}")
+
+    # -------------------------------
+    # SEGUIDOR
+    # -------------------------------
+
+    def _cabecalhos(self) -> dict:
+        return {"X-Replica-Token": self.token} if self.token else {}
+
+    def _loop(self):
+        while True:
+            if self.papel == LIDER:
+                time.sleep(INTERVALO_VERIFICACAO)
+                if self.papel == LIDER:
+                    self._verificar_par()
+                continue
+            try:
+                self._seguir()
+            except (requests.RequestException, ValueError, KeyError) as e:
+                sem_contato = time.monotonic() - self.ultimo_contato
+                if sem_contato > LEASE_SEGUNDOS:
+                    self._assumir(f"sem resposta de {self.par} há {int(sem_contato)} s ({e.__class__.__name__})")
+                else:
+                    time.sleep(1)
+            except Exception as e:
+                print(f"Replicação: falha ao aplicar dados do líder: {e}")
+                self.lider = None  # recomeça pelo instantâneo completo
+                time.sleep(1)
+
+    def _seguir(self):
+        params = {"no": self.no, "sessao": (self.lider or {}).get("sessao", ""),
+                  "desde": self.seq_lider, "espera": ESPERA_FEED,
+                  "historico": self._ultima_transicao() if self._ultima_transicao else 0}
+        r = self._http.get(self.par + "/api/replica/feed", params=params,
+                           headers=self._cabecalhos(), timeout=ESPERA_FEED + 10)
+        r.raise_for_status()
+        dados = r.json()
+        self.ultimo_contato = time.monotonic()  # par vivo (líder ou não)
+        self.termo = max(self.termo, dados["termo"])
+        if dados["papel"] != LIDER:
+            # os dois começaram como seguidores: assume o de menor nome
+            if self.no < dados["no"]:
+                self._assumir(f"{dados['no']} também é seguidor")
+            else:
+                time.sleep(1)
+            return
+        if "completo" in dados:
+            self._aplicar_completo(dados["completo"])
+            self.seq_lider = dados["completo"]["seq"]
+        for v in dados.get("varreduras", ()):
+            self._aplicar_varredura(v)
+            self.seq_lider = v["seq"]
+        self.lider = {"no": dados["no"], "sessao": dados["sessao"], "termo": dados["termo"]}
+        if self.ao_aplicar and ("completo" in dados or dados.get("varreduras")):
+            self.ao_aplicar()
+
+
+def replicacao_do_ambiente() -> Replicacao:
+    par, token = os.environ.get("REPLICA_PAR", ""), os.environ.get("REPLICA_TOKEN", "")
+    if par and not token:
+        print("Replicação desligada: REPLICA_PAR sem REPLICA_TOKEN")
+        par = ""
+    return Replicacao(par, os.environ.get("REPLICA_NO", ""), token)
@@ -0,0 +1,41 @@
+# ============================================================
+# serializacao.py — codificação JSON das respostas da API
+# Usa orjson ou msgspec quando instalados; senão, json da stdlib
+# em modo compacto. Sempre devolve bytes UTF-8.
+# ============================================================
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    CODIFICADOR = "orjson"
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+elif msgspec is not None:
+    CODIFICADOR = "msgspec"
+    _encoder = msgspec.json.Encoder()
+
+    def dumps(obj) -> bytes:
+        return _encoder.encode(obj)
+
+else:
+    CODIFICADOR = "json"
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+
+def juntar(fragmentos) -> bytes:
+    """Lista JSON a partir de fragmentos já codificados."""
+    return b"[" + b",".join(fragmentos) + b"]"
@@ -1,16 +1,57 @@
-
 # ============================================================
 # server.py — versão final completa (atualizada)
 # Status baseado exclusivamente no Nagios (statusjson.cgi)
 # Estrutura consolidada + reload automático + API /api/status
+#
+# pandas/openpyxl só são importados quando as planilhas precisam ser
+# lidas de novo (cache do inventário desatualizado) — ver load_data().
+# python server.py --profile-startup: tempos de cada fase da partida.
 # ============================================================
-import os
 import time
+_T0 = time.perf_counter()
+import csv
+import io
+import json
+import os
+import sys
+import threading
 import unicodedata
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
 import getpass
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, Response, request, send_from_directory
+from estado import TabelaEstado
+from historico import Historico, PASSO_RAW, RESOLUCOES
+from incidentes import DetectorIncidentes
+from metricas import SEM_VALOR, ou_none
+from serializacao import dumps
+from qualidade import JANELAS, METRICAS, CamadaQualidade
+from cache_tiles import FONTES, MAX_AGE_NAVEGADOR, CacheTiles, tile_valido
+from estaticos import CACHE_IMUTAVEL, PacoteEstatico, corpo_para
+from publicador import publicador_do_ambiente
+from notificador import Notificador, remetentes_do_ambiente
+from replicacao import replicacao_do_ambiente
+from indices import CODIGO_STATUS, GradeClusters, IndiceBusca, IndiceInventario, parse_bbox, ZOOM_MIN
+
+# -------------------------------
+# PERFIL DA PARTIDA (--profile-startup)
+# -------------------------------
+FASES_PARTIDA = []  # (fase, segundos) — sequenciais: a soma dá o total
+_t_fase = _T0
+_na_partida = True  # recargas do inventário depois da partida não entram no perfil
+
+
+def marcar_fase(nome: str):
+    """Fecha a fase corrente da partida com o tempo desde a marca anterior."""
+    global _t_fase
+    agora = time.perf_counter()
+    FASES_PARTIDA.append((nome, agora - _t_fase))
+    _t_fase = agora
+
+
+marcar_fase("imports (flask, requests, módulos locais)")
 
 # -------------------------------
 # CONFIGURAÇÃO DE CAMINHOS
@@ -18,15 +59,24 @@ from flask import Flask, jsonify, send_from_directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROMOTORIAS_FILE = os.path.join(BASE_DIR, "Promotorias.xlsx")
 HOSTS_FILE = os.path.join(BASE_DIR, "Host_nagiosmpls.xlsx")
-NAGIOS_URL = "http://nagiosmpls.mp.rs.gov.br/nagios/cgi-bin/statusjson.cgi"
+DATA_DIR = os.environ.get("DATA_DIR", os.path.join(BASE_DIR, "data"))
+NAGIOS_URL = os.environ.get("NAGIOS_URL", "http://nagiosmpls.mp.rs.gov.br/nagios/cgi-bin/statusjson.cgi")
+NAGIOS_MAX_CONEXOES = int(os.environ.get("NAGIOS_MAX_CONEXOES", "16"))  # limite de conexões simultâneas
 
 # -------------------------------
-# LOGIN MANUAL NO NAGIOS
+# LOGIN NO NAGIOS (variáveis de ambiente ou manual)
 # -------------------------------
-print("=== Login no Nagios ===")
-NAGIOS_USER = input("Usuário: ").strip()
-NAGIOS_PASS = getpass.getpass("Senha: ").strip()
+NAGIOS_USER = os.environ.get("NAGIOS_USER", "").strip()
+NAGIOS_PASS = os.environ.get("NAGIOS_PASS", "").strip()
+if not NAGIOS_USER:
+    print("=== Login no Nagios ===")
+    NAGIOS_USER = input("Usuário: ").strip()
+    NAGIOS_PASS = getpass.getpass("Senha: ").strip()
+    marcar_fase("login interativo")
 session = requests.Session()
+# keep-alive: um pool do tamanho do limite de conexões do coletor
+session.mount("http://", HTTPAdapter(pool_maxsize=NAGIOS_MAX_CONEXOES))
+session.mount("https://", HTTPAdapter(pool_maxsize=NAGIOS_MAX_CONEXOES))
 app = Flask(__name__, static_folder="static")
 
 # -------------------------------
@@ -47,7 +97,7 @@ def normalize(s: str) -> str:
     return " ".join(s.split())
 
 
-def find_col(df: pd.DataFrame, keywords):
+def find_col(df, keywords):
     cols = list(df.columns)
     norm = {c: normalize(str(c)) for c in cols}
     for c, n in norm.items():
@@ -61,6 +111,12 @@ def find_col(df: pd.DataFrame, keywords):
 # -------------------------------
 
 def load_data():
+    if _na_partida:
+        marcar_fase("inventário (até o import do pandas)")
+    import pandas as pd  # pesado (~0,5 s): só quando as planilhas mudaram
+    if _na_partida:
+        marcar_fase("import pandas/openpyxl")
+
     prom = pd.read_excel(PROMOTORIAS_FILE, engine="openpyxl")
     hosts = pd.read_excel(HOSTS_FILE, engine="openpyxl")
 
@@ -68,6 +124,7 @@ def load_data():
     col_lat = find_col(prom, ["latitude"])   # latitude oficial
     col_lng = find_col(prom, ["longitude"])  # longitude oficial
     col_host = find_col(hosts, ["host"])     # host monitorado no Nagios
+    col_upstream = find_col(hosts, ["upstream", "uplink", "enlace", "parent"])  # opcional
 
     if not all([col_mun, col_lat, col_lng]):
         raise Exception(f"Colunas não encontradas na planilha Promotorias.xlsx: {prom.columns.tolist()}")
@@ -86,7 +143,7 @@ def load_data():
 
     # LEFT JOIN preservando todas as promotorias e APENAS acrescentando o host quando houver correspondência
     merged = prom.merge(
-        hosts[[col_host, "key_mun"]],
+        hosts[[col_host, "key_mun"] + ([col_upstream] if col_upstream else [])],
         on="key_mun",
         how="left",
         validate="m:1"  # cada município mapeia no máximo 1 host
@@ -105,18 +162,85 @@ def load_data():
         except Exception:
             # se lat/lng inválidos, pula
             continue
+        upstream = ""
+        if col_upstream and pd.notna(row[col_upstream]):
+            upstream = strip_nbsp(str(row[col_upstream]))
         lista.append({
             "nome": strip_nbsp(str(row[col_mun])),  # município
             "lat": lat,                              # PRIORIDADE: Promotorias.xlsx
             "lng": lng,                              # PRIORIDADE: Promotorias.xlsx
-            "host": host_val                         # host do Nagios
+            "host": host_val,                        # host do Nagios
+            "upstream": upstream                     # enlace/roteador pai (correlação de quedas)
         })
     return lista
 
+
+def montar_indices(lista, tabela=None):
+    """
+    Tabela de estado e índices em memória derivados do inventário
+    recém-carregado. Com uma tabela já preenchida, os índices nascem com
+    os status dela; a troca dos globais acontece só no final.
+    """
+    global TABELA, GRADE, INDICE, BUSCA
+    INCIDENTES.inventario(lista)
+    tabela = tabela or TabelaEstado(lista)
+    grade = GradeClusters(lista)
+    indice = IndiceInventario(lista, normalize)
+    for i in range(len(lista)):
+        grade.definir_status(i, tabela.codigo_efetivo(i))
+        indice.definir_status(i, tabela.status_nome(i))
+    TABELA, GRADE, INDICE, BUSCA = tabela, grade, indice, IndiceBusca(lista, normalize)
+
+# -------------------------------
+# CACHE DO INVENTÁRIO JÁ PROCESSADO
+# -------------------------------
+# A lista final (nome/lat/lng/host/upstream) fica em data/inventario.json
+# junto com mtime e tamanho das duas planilhas; enquanto elas não mudam,
+# a partida lê só o JSON e nem importa o pandas.
+INVENTARIO_CACHE = os.path.join(DATA_DIR, "inventario.json")
+_VERSAO_CACHE = 1
+
+
+def _assinatura_planilhas() -> dict:
+    out = {}
+    for caminho in (PROMOTORIAS_FILE, HOSTS_FILE):
+        st = os.stat(caminho)
+        out[os.path.basename(caminho)] = [st.st_mtime_ns, st.st_size]
+    return out
+
+
+def carregar_inventario():
+    """Inventário do cache se as planilhas não mudaram; senão, load_data()."""
+    assinatura = _assinatura_planilhas()
+    try:
+        with open(INVENTARIO_CACHE, encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("versao") == _VERSAO_CACHE and cache.get("planilhas") == assinatura:
+            return cache["promotorias"]
+    except (OSError, ValueError):
+        pass
+
+    lista = load_data()
+    tmp = INVENTARIO_CACHE + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"versao": _VERSAO_CACHE, "planilhas": assinatura, "promotorias": lista},
+                      f, ensure_ascii=False)
+        os.replace(tmp, INVENTARIO_CACHE)
+    except OSError as e:
+        print(f"Não foi possível gravar o cache do inventário: {e}")
+    return lista
+
+# Correlação de quedas simultâneas (ver incidentes.py)
+INCIDENTES = DetectorIncidentes()
+
 # Carregamento inicial
-PROMOTORIAS = load_data()
+os.makedirs(DATA_DIR, exist_ok=True)
 PROMOTORIAS_MTIME = os.path.getmtime(PROMOTORIAS_FILE)
 HOSTS_MTIME = os.path.getmtime(HOSTS_FILE)
+PROMOTORIAS = carregar_inventario()
+montar_indices(PROMOTORIAS)
+marcar_fase("inventário (cache ou planilhas) + índices")
 
 # -------------------------------
 # RELOAD AUTOMÁTICO DAS PLANILHAS
@@ -128,7 +252,7 @@ def reload_if_needed():
     hosts_mtime_now = os.path.getmtime(HOSTS_FILE)
     if prom_mtime_now != PROMOTORIAS_MTIME or hosts_mtime_now != HOSTS_MTIME:
         print("Detectada alteração nas planilhas. Recarregando dados...")
-        PROMOTORIAS = load_data()
+        PROMOTORIAS = carregar_inventario()
         PROMOTORIAS_MTIME = prom_mtime_now
         HOSTS_MTIME = hosts_mtime_now
     return PROMOTORIAS
@@ -136,146 +260,720 @@ def reload_if_needed():
 # -------------------------------
 # CONSULTA AO NAGIOS — JSON REAL
 # -------------------------------
+# Uma única requisição por host: status e detalhes vêm do mesmo JSON.
 
-def estado_nagios(host: str) -> str:
+def consultar_host(host: str):
     """
-    Retorna UP, DOWN, WARNING, UNKNOWN
-    seguindo os códigos do Nagios:
-    2 = UP
-    4 = DOWN
-    0 = UNKNOWN
-    outros = WARNING
+    data.host do statusjson.cgi para o host (None se o Nagios não o
+    conhece); False se a consulta falhou.
     """
     try:
-        url = f"{NAGIOS_URL}?query=host&hostname={host}"
-        r = session.get(url, auth=(NAGIOS_USER, NAGIOS_PASS), timeout=8)
+        r = session.get(NAGIOS_URL, params={"query": "host", "hostname": host},
+                        auth=(NAGIOS_USER, NAGIOS_PASS), timeout=8)
         r.raise_for_status()
-        data = r.json()
-        hostdata = data.get("data", {}).get("host")
-        if not hostdata:
-            return "UNKNOWN"
-        raw_code = int(hostdata.get("status", -1))
-        if raw_code == 2:
-            return "UP"
-        if raw_code == 4:
-            return "DOWN"
-        if raw_code == 0:
-            return "UNKNOWN"
-        return "WARNING"
+        return r.json().get("data", {}).get("host")
     except Exception:
-        return "UNKNOWN"
+        return False
+
+# -------------------------------
+# COLETOR EM SEGUNDO PLANO
+# -------------------------------
+# A varredura do Nagios não roda mais dentro da requisição: um coletor
+# (thread no modo Flask, tarefa asyncio no modo ASGI — ver asgi.py)
+# varre a cada CACHE_SECONDS e publica o resultado em _cache.
+HISTORICO = Historico(os.path.join(DATA_DIR, "historico.sqlite3"))
+NOTIFICADOR = Notificador(remetentes_do_ambiente())
+QUALIDADE = CamadaQualidade(HISTORICO)
+TILES = CacheTiles(os.path.join(DATA_DIR, "tiles"))
+marcar_fase("histórico (SQLite) + notificador")
+
+# Pacote dos estáticos (ver estaticos.py); ESTATICOS_DEV=1 serve os originais
+PACOTE = None if os.environ.get("ESTATICOS_DEV") else PacoteEstatico(os.path.join(BASE_DIR, "static"))
+marcar_fase("pacote dos estáticos (minificação + gzip)")
+
+# Publicação em arquivos para um proxy servir (ver publicador.py); PUBLICAR_DIR vazio: desligada
+PUBLICADOR = publicador_do_ambiente()
+if PUBLICADOR and PACOTE:
+    PUBLICADOR.publicar_pacote(PACOTE)
+
+COD_DOWN = CODIGO_STATUS["DOWN"]
+ANOMALIAS = None  # DetectorAnomalias, criado na 1ª varredura
+# origem: "nagios" (varredura deste processo), "replica" (recebida do nó
+# líder, ver replicacao.py), "instantaneo" (restaurado do disco na
+# partida, até a 1ª varredura terminar) ou None (só o inventário, todos
+# UNKNOWN: ainda não há dado de nenhuma fonte)
+_cache = {"ts": 0.0, "seq": 0, "mudancas": [], "json": TABELA.json(), "mudancas_json": b"[]", "origem": None}
+CACHE_SECONDS = 10
 
 
-def _format_duration_dhms(seconds: int) -> str:
-    # Formata como: 2d 03h 15m 42s (omitindo dias se 0)
-    if seconds < 0:
-        seconds = 0
-    d, rem = divmod(seconds, 86400)
-    h, rem = divmod(rem, 3600)
-    m, s = divmod(rem, 60)
-    parts = []
-    if d:
-        parts.append(f"{d}d")
-    parts.append(f"{h:02d}h")
-    parts.append(f"{m:02d}m")
-    parts.append(f"{s:02d}s")
-    return " ".join(parts)
+def aplicar_varredura(lista, hostdatas, agora: int):
+    """
+    Publica o resultado de uma varredura direto na tabela de estado
+    (no lugar). Grade e índice de status só são tocados nos hosts que
+    mudaram; se o inventário mudou, a tabela nova é preenchida antes de
+    trocar tabela + índices de uma vez. A lista de registros alterados
+    fica em _cache["mudancas"] (usada pelo /api/stream do modo ASGI).
+    Entradas e saídas de DOWN alimentam o detector de incidentes e o
+    notificador (só enfileira; o envio roda em outra thread).
+    """
+    if lista is not TABELA.promotorias:
+        tabela = TabelaEstado(lista)
+        for i, h in enumerate(hostdatas):
+            tabela.aplicar(i, h, agora)
+        _avaliar_anomalias(tabela, TABELA)
+        tabela.codificar()
+        montar_indices(lista, tabela)
+        alterados = range(len(lista))
+    else:
+        status = TABELA.status
+        alterados, quedas, retornos = [], [], []
+        for i, h in enumerate(hostdatas):
+            antes = status[i]
+            if not TABELA.aplicar(i, h, agora):
+                continue
+            alterados.append(i)
+            if status[i] != antes:
+                if status[i] == COD_DOWN:
+                    quedas.append(i)
+                elif antes == COD_DOWN:
+                    retornos.append(i)
+        for i in alterados:
+            GRADE.definir_status(i, TABELA.codigo_efetivo(i))
+            INDICE.definir_status(i, TABELA.status_nome(i))
+        degradacao = _avaliar_anomalias(TABELA)
+        if degradacao:
+            alterados = sorted(set(alterados).union(degradacao))
+        TABELA.codificar()  # a duração muda em todo host a cada varredura
+        if _cache["seq"]:  # na 1ª varredura tudo sai de UNKNOWN: não é queda real
+            novos = INCIDENTES.processar(agora, quedas, retornos)
+            for inc in novos:
+                print(f"Incidente #{inc.id}: {len(inc.membros)} hosts DOWN ({inc.chave})")
+            NOTIFICADOR.publicar(
+                [_evento_transicao(i, agora) for i in quedas + retornos],
+                [inc.resumo() for inc in novos],
+            )
+
+    _publicar(alterados, time.time(), "nagios")
+    if REPLICACAO.ativa and REPLICACAO.sou_lider():
+        REPLICACAO.registrar_varredura({
+            "seq": _cache["seq"], "ts": agora, "inventario": TABELA.assinatura,
+            "linhas": TABELA.instantaneo(alterados),
+            "rta": [ou_none(v) for v in TABELA.rta], "perda": [ou_none(v) for v in TABELA.perda],
+        })
+
 
+def _publicar(alterados, ts: float, origem: str, nova_seq: bool = True):
+    """Troca o que as rotas servem (_cache) pelo estado atual da tabela."""
+    _cache["mudancas"] = alterados
+    _cache["json"] = TABELA.json()
+    _cache["mudancas_json"] = TABELA.json(alterados)
+    _cache["ts"] = ts
+    _cache["origem"] = origem
+    if nova_seq:
+        _cache["seq"] += 1
 
-def detalhes_nagios(host: str) -> dict:
+
+def _avaliar_anomalias(tabela, anterior=None) -> list:
     """
-    Coleta detalhes do host conforme JSON oficial.
-    duration_ms: agora calculado como max(now - last_time_down, 0)
-    e também retorna last_downtime_duration_human no formato d h m s
+    Passada vetorizada do detector de enlaces degradados sobre a tabela;
+    grava tabela.degradado e devolve as posições cuja marcação mudou.
+    Com um inventário novo, a linha de base dos hosts que continuam é
+    levada da tabela anterior.
     """
+    global ANOMALIAS
+    if ANOMALIAS is None or (anterior is None and ANOMALIAS.n != len(tabela)):
+        from anomalias import DetectorAnomalias  # numpy: só na 1ª varredura, fora da partida
+        ANOMALIAS = DetectorAnomalias(len(tabela))
+    elif anterior is not None:
+        ANOMALIAS.remapear([anterior.posicao.get(p["host"], -1) for p in tabela.promotorias])
+    return ANOMALIAS.aplicar(tabela)
+
+
+def _evento_transicao(i: int, agora: int) -> dict:
+    p = TABELA.promotorias[i]
+    return {"ts": agora, "host": p["host"], "nome": p["nome"], "status": TABELA.status_nome(i)}
+
+
+def pos_varredura(agora: int):
+    """
+    Tarefas que dependem da varredura recém-publicada e podem fazer I/O
+    (histórico e instantâneo em disco). No modo ASGI roda fora do event loop.
+    """
+    HISTORICO.registrar(agora, TABELA)
+    gravar_instantaneo(agora)
+    publicar_arquivos()
+
+
+def publicar_arquivos():
+    """Estado publicado em PUBLICAR_DIR (se configurado)."""
+    if PUBLICADOR is None:
+        return
     try:
-        url = f"{NAGIOS_URL}?query=host&hostname={host}"
-        r = session.get(url, auth=(NAGIOS_USER, NAGIOS_PASS), timeout=8)
-        r.raise_for_status()
-        data = r.json()
-        hostdata = data.get("data", {}).get("host", {}) or {}
-        last_time_down = int(hostdata.get("last_time_down", 0) or 0)
-        last_time_up = int(hostdata.get("last_time_up", 0) or 0)
-
-        # <<< ALTERAÇÃO PEDIDA >>>
-        # Em vez de: duration_ms = max(last_time_up - last_time_down, 0)
-        # Usar o mtime (tempo atual) - last_time_down para refletir duração corrente.
-        now_sec = int(time.time())
-        duration_sec = max(now_sec - last_time_down, 0)
-        duration_ms = duration_sec  # mantendo o mesmo nome de campo (valores em segundos)
-        duration_human = _format_duration_dhms(duration_sec)
-
-        return {
-            "is_flapping": bool(hostdata.get("is_flapping", False)),
-            "last_time_down": last_time_down,
-            "last_time_up": last_time_up,
-            "last_downtime_duration_ms": duration_ms,
-            "last_downtime_duration_human": duration_human,
-            "plugin_output": hostdata.get("plugin_output", "") or "",
-        }
-    except Exception:
-        return {
-            "is_flapping": False,
-            "last_time_down": 0,
-            "last_time_up": 0,
-            "last_downtime_duration_ms": 0,
-            "last_downtime_duration_human": "00h 00m 00s",
-            "plugin_output": "",
-        }
+        PUBLICADOR.publicar_varredura(_cache["seq"], _cache["ts"], _cache["origem"], _cache["json"],
+                                      _cache["mudancas_json"], dumps(INCIDENTES.consultar()))
+    except OSError as e:
+        print(f"Não foi possível publicar em {PUBLICADOR.diretorio}: {e}")
 
 # -------------------------------
-# FUNÇÃO CONSOLIDADA PARA A API
+# INSTANTÂNEO PARA PARTIDA A QUENTE
 # -------------------------------
+# O estado publicado vai para data/instantaneo.json a cada varredura
+# (.tmp + os.replace: quem lê nunca vê o arquivo pela metade). Na partida
+# ele é carregado antes da 1ª varredura, então o mapa não fica vazio num
+# deploy ou queda; o /api/status informa origem e idade nos cabeçalhos
+# X-Data-Source e X-Data-Age até o coletor alcançar.
+INSTANTANEO = os.path.join(DATA_DIR, "instantaneo.json")
+_VERSAO_INSTANTANEO = 1
+
+
+def gravar_instantaneo(ts: int):
+    tmp = INSTANTANEO + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(dumps({"versao": _VERSAO_INSTANTANEO, "ts": ts, "hosts": TABELA.instantaneo()}))
+        os.replace(tmp, INSTANTANEO)
+    except OSError as e:
+        print(f"Não foi possível gravar o instantâneo: {e}")
+
 
-def get_host_info(host: str) -> dict:
-    status = estado_nagios(host)
-    det = detalhes_nagios(host)
-    return {
-        "status": status,  # campo principal
-        "status_nagios": status,  # alias
-        "plugin_output": det["plugin_output"],
-        "is_flapping": det["is_flapping"],
-        "last_time_down": det["last_time_down"],
-        "last_time_up": det["last_time_up"],
-        "last_downtime_duration_ms": det["last_downtime_duration_ms"],
-        "last_downtime_duration_human": det["last_downtime_duration_human"],
-    }
+def restaurar_instantaneo() -> bool:
+    """Publica o último instantâneo gravado (se houver) enquanto não há varredura."""
+    try:
+        with open(INSTANTANEO, "rb") as f:
+            dados = json.load(f)
+        if dados.get("versao") != _VERSAO_INSTANTANEO:
+            return False
+        restaurados = _carregar_linhas(dados["hosts"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Instantâneo ignorado: {e}")
+        return False
+    # seq continua 0: a 1ª varredura real ainda não gera incidentes/avisos
+    _publicar(range(len(TABELA)), float(dados["ts"]), "instantaneo", nova_seq=False)
+    publicar_arquivos()
+    print(f"Instantâneo de {datetime.fromtimestamp(dados['ts']):%d/%m %H:%M:%S} restaurado "
+          f"({restaurados} de {len(TABELA)} hosts)")
+    return True
+
+
+def _carregar_linhas(linhas) -> int:
+    """Linhas de TabelaEstado.instantaneo() na tabela e nos índices."""
+    posicoes = TABELA.restaurar(linhas)
+    TABELA.codificar()
+    for i in range(len(TABELA)):
+        GRADE.definir_status(i, TABELA.codigo_efetivo(i))
+        INDICE.definir_status(i, TABELA.status_nome(i))
+    return len(posicoes)
+
+
+restaurar_instantaneo()
+marcar_fase("instantâneo da última varredura")
+_na_partida = False
 
 # -------------------------------
-# API /api/status
+# REPLICAÇÃO ENTRE DOIS NÓS (ver replicacao.py)
 # -------------------------------
-_cache = {"ts": 0.0, "data": None}
-CACHE_SECONDS = 10
+# Só o líder varre o Nagios; o seguidor aplica as varreduras recebidas
+# pelo mesmo caminho (tabela, índices, incidentes, histórico) e serve
+# as mesmas rotas. Notificações saem só do líder.
+REPLICACAO = replicacao_do_ambiente()
+
+
+def _instantaneo_replica(transicoes_desde: int) -> dict:
+    """Estado inteiro + transições do histórico a partir de transicoes_desde (inclusive)."""
+    return {"seq": _cache["seq"], "ts": int(_cache["ts"]), "hosts": TABELA.instantaneo(),
+            "transicoes": list(HISTORICO.transicoes(transicoes_desde - 1, int(time.time()) + 1))}
+
+
+def aplicar_varredura_replica(v: dict):
+    """Seguidor: uma varredura do líder (ver aplicar_varredura)."""
+    if _cache["origem"] == "replica" and v["ts"] <= _cache["ts"]:
+        return  # já aplicada (chegou de novo junto com um instantâneo)
+    tabela, status, ts = TABELA, TABELA.status, v["ts"]
+    antes = [status[i] for i in (tabela.posicao.get(l[0]) for l in v["linhas"]) if i is not None]
+    alterados = tabela.restaurar(v["linhas"])
+    quedas = [i for i, a in zip(alterados, antes) if status[i] != a and status[i] == COD_DOWN]
+    retornos = [i for i, a in zip(alterados, antes) if status[i] != a and a == COD_DOWN]
+    if v["inventario"] == tabela.assinatura:  # vetores por posição: mesma ordem de hosts
+        for i, (rta, perda) in enumerate(zip(v["rta"], v["perda"])):
+            tabela.rta[i] = SEM_VALOR if rta is None else rta
+            tabela.perda[i] = SEM_VALOR if perda is None else perda
+    for i in range(len(tabela)):
+        tabela.duracao[i] = max(ts - tabela.last_down[i], 0)
+    for i in alterados:
+        GRADE.definir_status(i, tabela.codigo_efetivo(i))
+        INDICE.definir_status(i, tabela.status_nome(i))
+    tabela.codificar()
+    if _cache["seq"]:
+        for inc in INCIDENTES.processar(ts, quedas, retornos):
+            print(f"Incidente #{inc.id}: {len(inc.membros)} hosts DOWN ({inc.chave})")
+    _publicar(alterados, float(ts), "replica")
+    pos_varredura(ts)
+
+
+def aplicar_completo_replica(c: dict):
+    """Seguidor: estado inteiro do líder (início, ou ficou para trás)."""
+    HISTORICO.importar_transicoes(c.get("transicoes", ()))
+    if not c["ts"]:
+        return  # líder ainda sem nenhuma varredura
+    _carregar_linhas(c["hosts"])
+    _publicar(range(len(TABELA)), float(c["ts"]), "replica")
+
+
+def varrer(lista) -> list:
+    """Consulta todos os hosts em paralelo, até NAGIOS_MAX_CONEXOES por vez."""
+    with ThreadPoolExecutor(max_workers=NAGIOS_MAX_CONEXOES) as pool:
+        return list(pool.map(consultar_host, [p["host"] for p in lista]))
+
+
+def coletor_loop():
+    while True:
+        if not REPLICACAO.sou_lider():
+            time.sleep(1)  # seguidor: os dados vêm do líder
+            continue
+        inicio = time.time()
+        try:
+            lista = reload_if_needed()
+            hostdatas = varrer(lista)
+            agora = int(time.time())
+            aplicar_varredura(lista, hostdatas, agora)
+            pos_varredura(agora)
+        except Exception as e:
+            print(f"Falha na varredura do Nagios: {e}")
+        time.sleep(max(0.0, CACHE_SECONDS - (time.time() - inicio)))
+
+
+def iniciar_coletor():
+    threading.Thread(target=coletor_loop, name="coletor", daemon=True).start()
+    iniciar_replicacao()
+    HISTORICO.iniciar_compactacao()
+    NOTIFICADOR.iniciar()
+
+
+def iniciar_replicacao():
+    REPLICACAO.iniciar(_instantaneo_replica, aplicar_varredura_replica, aplicar_completo_replica,
+                       HISTORICO.ultima_transicao)
+
+
+def resposta_json(obj, status: int = 200) -> Response:
+    """Resposta JSON compacta pelo codificador rápido (orjson/msgspec/stdlib)."""
+    corpo = obj if isinstance(obj, bytes) else dumps(obj)
+    return Response(corpo, status=status, mimetype="application/json")
+
 
 @app.route("/api/status")
 def api_status():
-    now = time.time()
-    # Cache simples de 10s
-    if _cache["data"] is not None and (now - _cache["ts"] < CACHE_SECONDS):
-        return jsonify(_cache["data"])
+    """
+    Filtros opcionais:
+      bbox=oeste,sul,leste,norte   status=DOWN[,WARNING...]   nome=<trecho>
+    Sem filtros devolve a lista inteira, como antes.
+    """
+    bbox_txt = request.args.get("bbox", "")
+    status_txt = request.args.get("status", "")
+    nome = request.args.get("nome", "")
+    if not (bbox_txt or status_txt or nome):
+        return _com_idade(resposta_json(_cache["json"]))
 
-    lista = reload_if_needed()
+    bbox = parse_bbox(bbox_txt)
+    if bbox_txt and bbox is None:
+        return resposta_json({"erro": "bbox inválido (use oeste,sul,leste,norte)"}, 400)
+    status = [s for s in status_txt.split(",") if s.strip()]
+    tabela, indice = TABELA, INDICE
+    return _com_idade(resposta_json(tabela.json(indice.filtrar(bbox, status, nome))))
+
+
+def _com_idade(resp: Response) -> Response:
+    """
+    X-Data-Source (nagios|replica|instantaneo, ou nenhuma antes de qualquer
+    dado) e X-Data-Age (segundos desde a varredura).
+    """
+    resp.headers["X-Data-Source"] = _cache["origem"] or "nenhuma"
+    if _cache["ts"]:
+        resp.headers["X-Data-Age"] = str(int(time.time() - _cache["ts"]))
+    return resp
+
+# -------------------------------
+# API /api/clusters
+# -------------------------------
+
+@app.route("/api/clusters")
+def api_clusters():
+    """
+    Clusters agregados no servidor para o zoom pedido.
+    Parâmetros: bbox=oeste,sul,leste,norte (opcional) e zoom (inteiro).
+    Cada cluster traz contagem total, contagem por status e pior status.
+    """
+    try:
+        zoom = int(request.args.get("zoom", ZOOM_MIN))
+    except ValueError:
+        return resposta_json({"erro": "zoom inválido"}, 400)
+    bbox = parse_bbox(request.args.get("bbox", ""))
+    if request.args.get("bbox") and bbox is None:
+        return resposta_json({"erro": "bbox inválido (use oeste,sul,leste,norte)"}, 400)
+
+    return resposta_json(GRADE.consultar(zoom, bbox))
+
+# -------------------------------
+# API /api/search
+# -------------------------------
+RANK_NOMES = ("exato", "prefixo", "substring")
+
+
+@app.route("/api/search")
+def api_search():
+    """
+    Busca por nome ou host (sem acento, sem diferenciar maiúsculas).
+    Parâmetros: q (termo) e limit (padrão 50).
+    Não dispara varredura: o status vem do último cache disponível.
+    """
+    try:
+        limite = max(1, min(int(request.args.get("limit", 50)), 500))
+    except ValueError:
+        return resposta_json({"erro": "limit inválido"}, 400)
+
+    tabela = TABELA
+    lista = tabela.promotorias
     out = []
-    for p in lista:
-        info = get_host_info(p["host"])
+    for rank, i in BUSCA.buscar(request.args.get("q", ""), limite):
+        p = lista[i]
         out.append({
             "nome": p["nome"],
+            "host": p["host"],
             "lat": p["lat"],
             "lng": p["lng"],
-            "host": p["host"],
-            **info
+            "status": tabela.status_nome(i),
+            "match": RANK_NOMES[rank],
         })
+    return resposta_json(out)
+
+# -------------------------------
+# API /api/incidents
+# -------------------------------
+
+@app.route("/api/incidents")
+def api_incidents():
+    """
+    Incidentes correlacionados: quedas simultâneas do mesmo upstream ou da
+    mesma região. "abertos" (com algum membro ainda DOWN) e os encerrados
+    mais recentes.
+    """
+    return resposta_json(INCIDENTES.consultar())
+
+# -------------------------------
+# API /api/history
+# -------------------------------
+
+@app.route("/api/history")
+def api_history():
+    """
+    Série histórica de um host, com resolução escolhida ou automática.
+    Parâmetros: host, from / to (epoch ou ISO 8601; padrão últimas 24h),
+    resolution=auto|raw|1m|1h|1d e max_points (para auto, padrão 500).
+    """
+    host = request.args.get("host", "").strip()
+    if not host:
+        return resposta_json({"erro": "host é obrigatório"}, 400)
+    resolucao = request.args.get("resolution", "auto")
+    if resolucao != "auto" and resolucao not in RESOLUCOES:
+        return resposta_json({"erro": f"resolution deve ser auto ou {', '.join(RESOLUCOES)}"}, 400)
+    try:
+        fim = _parse_instante(request.args["to"]) if request.args.get("to") else int(time.time()) + 1
+        inicio = _parse_instante(request.args["from"]) if request.args.get("from") else fim - 86400
+        max_pontos = max(1, int(request.args.get("max_points", 500)))
+    except ValueError:
+        return resposta_json({"erro": "from/to/max_points inválidos"}, 400)
+
+    if resolucao == "auto":
+        resolucao = HISTORICO.resolucao_auto(inicio, fim, max_pontos)
+    return resposta_json({
+        "host": host,
+        "from": inicio,
+        "to": fim,
+        "resolution": resolucao,
+        "points": HISTORICO.serie(host, inicio, fim, resolucao),
+    })
+
+# -------------------------------
+# API /api/metrics/host
+# -------------------------------
+
+@app.route("/api/metrics/host")
+def api_metrics_host():
+    """
+    Latência (RTA) e perda de pacotes extraídas do perf_data/plugin_output
+    do check_ping. Parâmetros: name (host), from / to (padrão últimas 6h)
+    e max_points (padrão 500; define o intervalo de agregação).
+    """
+    host = request.args.get("name", "").strip()
+    if not host:
+        return resposta_json({"erro": "name é obrigatório"}, 400)
+    try:
+        fim = _parse_instante(request.args["to"]) if request.args.get("to") else int(time.time()) + 1
+        inicio = _parse_instante(request.args["from"]) if request.args.get("from") else fim - 6 * 3600
+        max_pontos = max(1, int(request.args.get("max_points", 500)))
+    except ValueError:
+        return resposta_json({"erro": "from/to/max_points inválidos"}, 400)
+
+    tabela = TABELA
+    i = tabela.posicao.get(host)
+    atual = None
+    if i is not None:
+        atual = {"rta_ms": ou_none(tabela.rta[i]), "perda_pct": ou_none(tabela.perda[i])}
+    passo = max(PASSO_RAW, -(-(fim - inicio) // max_pontos))
+    return resposta_json({
+        "host": host,
+        "from": inicio,
+        "to": fim,
+        "passo": passo,
+        "atual": atual,
+        "points": HISTORICO.metricas(host, inicio, fim, passo),
+    })
+
+# -------------------------------
+# API /api/quality (camada choropleth)
+# -------------------------------
+
+@app.route("/api/quality")
+def api_quality():
+    """
+    GeoJSON de células com a disponibilidade (fração UP) ou a latência
+    média no período. Parâmetros: metric=availability|latency,
+    window=1h|24h|7d|30d e zoom. Responde com ETag; If-None-Match igual
+    devolve 304 sem corpo.
+    """
+    metrica = request.args.get("metric", "availability")
+    janela = request.args.get("window", "24h")
+    if metrica not in METRICAS:
+        return resposta_json({"erro": f"metric deve ser {' ou '.join(METRICAS)}"}, 400)
+    if janela not in JANELAS:
+        return resposta_json({"erro": f"window deve ser {', '.join(JANELAS)}"}, 400)
+    try:
+        zoom = int(request.args.get("zoom", ZOOM_MIN))
+    except ValueError:
+        return resposta_json({"erro": "zoom inválido"}, 400)
 
-    _cache["data"] = out
-    _cache["ts"] = now
-    return jsonify(out)
+    corpo, etag = QUALIDADE.geojson(TABELA.promotorias, metrica, janela, zoom)
+    resp = Response(corpo, mimetype="application/geo+json")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"  # sempre revalida; 304 se não mudou
+    return resp.make_conditional(request)
+
+# -------------------------------
+# API /api/export
+# -------------------------------
+LINHAS_POR_BLOCO = 500
+CAMPOS_EXPORT = ("ts", "host", "status", "is_flapping")
+
+
+def _parse_instante(texto: str):
+    """Epoch em segundos ou data ISO 8601 (sem fuso = horário local)."""
+    try:
+        return int(texto)
+    except ValueError:
+        return int(datetime.fromisoformat(texto).timestamp())
+
+
+def _linhas_atuais():
+    tabela, ts = TABELA, int(_cache["ts"])
+    if not ts:
+        return
+    for i, p in enumerate(tabela.promotorias):
+        yield ts, p["host"], tabela.status_nome(i), bool(tabela.flapping[i])
+
+
+def _blocos_ndjson(linhas):
+    bloco = []
+    for ts, host, status, flapping in linhas:
+        bloco.append(dumps({"ts": ts, "host": host, "status": status, "is_flapping": flapping}))
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            yield b"\n".join(bloco) + b"\n"
+            bloco = []
+    if bloco:
+        yield b"\n".join(bloco) + b"\n"
+
+
+def _blocos_csv(linhas):
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(CAMPOS_EXPORT)
+    n = 0
+    for ts, host, status, flapping in linhas:
+        w.writerow((ts, host, status, "true" if flapping else "false"))
+        n += 1
+        if n % LINHAS_POR_BLOCO == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+@app.route("/api/export")
+def api_export():
+    """
+    Exporta o status em streaming (chunked), sem montar a lista em memória.
+    Parâmetros: from / to (epoch ou ISO 8601) e format=ndjson|csv.
+    Sem from/to exporta o estado atual; com eles, as amostras do histórico
+    no intervalo [from, to) em ordem de tempo.
+    """
+    formato = request.args.get("format", "ndjson").lower()
+    if formato not in ("ndjson", "csv"):
+        return resposta_json({"erro": "format deve ser ndjson ou csv"}, 400)
+
+    de, ate = request.args.get("from"), request.args.get("to")
+    if de or ate:
+        try:
+            inicio = _parse_instante(de) if de else 0
+            fim = _parse_instante(ate) if ate else int(time.time()) + 1
+        except ValueError:
+            return resposta_json({"erro": "from/to inválidos (use epoch ou ISO 8601)"}, 400)
+        linhas = HISTORICO.amostras(inicio, fim)
+    else:
+        linhas = _linhas_atuais()
+
+    if formato == "csv":
+        corpo, mimetype = _blocos_csv(linhas), "text/csv"
+    else:
+        corpo, mimetype = _blocos_ndjson(linhas), "application/x-ndjson"
+    return Response(corpo, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=status.{formato}",
+        "X-Accel-Buffering": "no",
+    })
+
+# -------------------------------
+# API /api/replay
+# -------------------------------
+PAUSA_MAX_REPLAY = 1.0  # segundos; intervalos sem mudança são comprimidos
+
+
+def _quadros_replay(inicio: int, fim: int, velocidade: float):
+    """
+    NDJSON: "inicio" com o estado de todos os hosts em from, um "quadro"
+    por instante com mudanças e "fim". Com velocidade > 0, o envio segue
+    o tempo do histórico acelerado (velocidade=60: 1 minuto por segundo).
+    """
+    estado = [{"host": h, "status": st, "is_flapping": fl} for h, st, fl in HISTORICO.estado_em(inicio)]
+    yield dumps({"tipo": "inicio", "ts": inicio, "to": fim, "estado": estado}) + b"\n"
+
+    anterior, mudancas = inicio, []
+
+    def quadro():
+        return dumps({"tipo": "quadro", "ts": anterior, "mudancas": mudancas}) + b"\n"
+
+    for ts, host, status, flapping in HISTORICO.transicoes(inicio, fim):
+        if ts != anterior:
+            if mudancas:
+                yield quadro()
+                mudancas = []
+            if velocidade > 0:
+                time.sleep(min((ts - anterior) / velocidade, PAUSA_MAX_REPLAY))
+            anterior = ts
+        mudancas.append({"host": host, "status": status, "is_flapping": flapping})
+    if mudancas:
+        yield quadro()
+    yield dumps({"tipo": "fim", "ts": fim}) + b"\n"
+
+
+@app.route("/api/replay")
+def api_replay():
+    """
+    Reproduz as transições de status do histórico em ordem de tempo.
+    Parâmetros: from (obrigatório), to (padrão agora) — epoch ou ISO 8601 —
+    e speed (multiplicador do tempo; 0 = sem pausas, padrão 60).
+    """
+    if not request.args.get("from"):
+        return resposta_json({"erro": "from é obrigatório"}, 400)
+    try:
+        inicio = _parse_instante(request.args["from"])
+        fim = _parse_instante(request.args["to"]) if request.args.get("to") else int(time.time()) + 1
+        velocidade = max(0.0, float(request.args.get("speed", 60)))
+    except ValueError:
+        return resposta_json({"erro": "from/to/speed inválidos"}, 400)
+    if fim <= inicio:
+        return resposta_json({"erro": "to deve ser maior que from"}, 400)
+    return Response(_quadros_replay(inicio, fim, velocidade), mimetype="application/x-ndjson",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# -------------------------------
+# API /api/replica (entre os nós; ver replicacao.py)
+# -------------------------------
+
+@app.route("/api/replica/estado")
+def api_replica_estado():
+    if not REPLICACAO.autorizado(request.headers.get("X-Replica-Token", "")):
+        return resposta_json({"erro": "token de replicação inválido"}, 403)
+    return resposta_json(REPLICACAO.estado())
+
+
+@app.route("/api/replica/feed")
+def api_replica_feed():
+    """
+    Long-poll do seguidor: varreduras depois de desde (na sessão dada)
+    ou o instantâneo completo. Parâmetros: sessao, desde, espera (s) e
+    historico (ts da última transição do seguidor).
+    """
+    if not REPLICACAO.autorizado(request.headers.get("X-Replica-Token", "")):
+        return resposta_json({"erro": "token de replicação inválido"}, 403)
+    try:
+        desde = int(request.args.get("desde", 0))
+        espera = float(request.args.get("espera", 0))
+        historico = int(request.args.get("historico", 0))
+    except ValueError:
+        return resposta_json({"erro": "desde/espera/historico inválidos"}, 400)
+    return resposta_json(REPLICACAO.feed(request.args.get("sessao", ""), desde, espera, historico))
+
+# -------------------------------
+# TILES DO MAPA BASE (cache local)
+# -------------------------------
+
+@app.route("/tiles/<int:z>/<int:x>/<int:y>.png")
+@app.route("/tiles/<fonte>/<int:z>/<int:x>/<int:y>.png")
+def tiles(z, x, y, fonte="osm"):
+    """
+    Tile da fonte (osm, escuro, rotulos, satelite) a partir do cache em
+    disco; só vai à origem no que falta. Cópia vencida servida por falha
+    da origem sai com max-age curto para o navegador tentar de novo.
+    """
+    if fonte not in FONTES or not tile_valido(z, x, y):
+        return Response(status=404)
+    obtido = TILES.obter(fonte, z, x, y)
+    if obtido is None:
+        return Response(status=502)
+    dados, gravado_em, fresco = obtido
+    resp = Response(dados, mimetype=FONTES[fonte][1])
+    resp.set_etag(f"{fonte}-{z}-{x}-{y}-{int(gravado_em)}")
+    resp.headers["Cache-Control"] = f"public, max-age={MAX_AGE_NAVEGADOR if fresco else 300}"
+    return resp.make_conditional(request)
 
 # -------------------------------
 # ROTAS ESTÁTICAS
 # -------------------------------
+def _resposta_estatica(corpo, gz, br, mimetype):
+    dados, codificacao = corpo_para(request.headers.get("Accept-Encoding", ""), corpo, gz, br)
+    resp = Response(dados, mimetype=mimetype)
+    if codificacao:
+        resp.headers["Content-Encoding"] = codificacao
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
+
+
 @app.route("/")
 def root():
-    return send_from_directory("static", "index.html")
+    if PACOTE is None:
+        return send_from_directory("static", "index.html")
+    corpo, gz, br, etag = PACOTE.index
+    resp = _resposta_estatica(corpo, gz, br, "text/html")
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"  # só o HTML revalida; o resto é imutável
+    return resp.make_conditional(request)
+
+@app.route("/assets/<nome>")
+def assets(nome):
+    ativo = PACOTE.ativos.get(nome) if PACOTE else None
+    if ativo is None:
+        return Response(status=404)
+    resp = _resposta_estatica(*ativo)
+    resp.headers["Cache-Control"] = CACHE_IMUTAVEL
+    return resp
 
 @app.route("/<path:path>")
 def static_proxy(path):
@@ -284,5 +982,27 @@ def static_proxy(path):
 # -------------------------------
 # EXECUÇÃO
 # -------------------------------
+def perfil_partida():
+    """Faz a primeira varredura em primeiro plano e imprime as fases."""
+    lista = reload_if_needed()
+    hostdatas = varrer(lista)
+    agora = int(time.time())
+    aplicar_varredura(lista, hostdatas, agora)
+    pos_varredura(agora)
+    marcar_fase(f"primeira varredura ({len(lista)} hosts)")
+
+    total = time.perf_counter() - _T0
+    print("=== Perfil da partida ===")
+    for fase, seg in FASES_PARTIDA:
+        print(f"{seg * 1000:9.1f} ms  {fase}")
+    print(f"{total * 1000:9.1f} ms  total")
+    print("Detalhe por módulo: python -X importtime server.py --profile-startup")
+
+
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=8080, debug=False)
+    if "--profile-startup" in sys.argv:
+        perfil_partida()
+        sys.exit(0)
+    # Modo assíncrono (ASGI): uvicorn asgi:app --port 8080 — ver asgi.py
+    iniciar_coletor()
+    app.run(host="127.0.0.1", port=int(os.environ.get("PORTA", "8080")), debug=False)
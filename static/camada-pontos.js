@@ -0,0 +1,526 @@
+// ============================================================
+// CAMADA DE PONTOS — marcadores e clusters desenhados em <canvas>
+// - Um único canvas (L.Canvas) no lugar de um divIcon por host
+// - Agrupamento por célula de 50 px na tela (como o maxClusterRadius
+//   do markercluster): com urlClusters, as bolhas vêm prontas do
+//   servidor (/api/clusters, por zoom e bbox); no navegador só no
+//   replay (usarServidor() falso) ou se o servidor não responder
+// - Desenho em lote: um path por cor, um fill/stroke por lote
+// - Clique/hover resolvidos por uma grade de células (hit-test)
+// API usada pelo mapa.js (a mesma do markerClusterGroup):
+//   addLayers, addLayer, removeLayer, refreshClusters, zoomToShowLayer
+// ============================================================
+(function(){
+  const RAIO_PONTO = 9;       // marcador de 18x18 (status.css)
+  const RAIO_CLUSTER = 20;    // bolha de 40x40 (mapa.css)
+  const PISCA_MS = 600;       // meio período do "blink" dos DOWN
+  const CHAVE_Y = 4194304;    // 2^22: chave numérica (cx, cy) sem string
+
+  // ------------------------------
+  // CORES
+  // ------------------------------
+  const _rgba = new Map();
+  function rgba(hex, a){
+    const chave = hex + a;
+    let cor = _rgba.get(chave);
+    if (!cor) {
+      const n = parseInt(hex.slice(1), 16);
+      cor = `rgba(${(n >> 16) & 255}, ${(n >> 8) & 255}, ${n & 255}, ${a})`;
+      _rgba.set(chave, cor);
+    }
+    return cor;
+  }
+
+  // Fase "acesa" do blink (equivale ao brightness(2) do status.css)
+  const _clara = new Map();
+  function clarear(hex){
+    let cor = _clara.get(hex);
+    if (!cor) {
+      const n = parseInt(hex.slice(1), 16);
+      const c = v => Math.min(255, Math.round(v + (255 - v) * 0.5));
+      cor = `rgb(${c((n >> 16) & 255)}, ${c((n >> 8) & 255)}, ${c(n & 255)})`;
+      _clara.set(hex, cor);
+    }
+    return cor;
+  }
+
+  // Cliques em controles/popups/tooltips não são cliques no mapa
+  function foraDoMapa(ev){
+    return !!(ev.target && ev.target.closest &&
+      ev.target.closest('.leaflet-control-container, .leaflet-popup-pane, .leaflet-tooltip-pane'));
+  }
+
+  // ------------------------------
+  // PONTO (o que o mapa.js usava de L.Marker)
+  // ------------------------------
+  L.PontoStatus = L.Class.extend({
+    initialize: function(latlng, options){
+      this._latlng = L.latLng(latlng);
+      this.options = Object.assign({}, options);
+      this._camada = null;
+      this._popup = null;
+      this._pz = null; // zoom da projeção em cache (_px, _py)
+    },
+
+    getLatLng: function(){ return this._latlng; },
+
+    setLatLng: function(latlng){
+      this._latlng = L.latLng(latlng);
+      this._pz = null;
+      if (this._popup) this._popup.setLatLng(this._latlng);
+      if (this._camada) this._camada.refreshClusters();
+      return this;
+    },
+
+    // Só guarda o conteúdo; o L.Popup é criado na primeira abertura
+    bindPopup: function(conteudo, options){
+      this._conteudoPopup = conteudo;
+      this._opcoesPopup = options;
+      return this;
+    },
+
+    openPopup: function(){
+      const map = this._camada && this._camada._map;
+      if (!map || !this._conteudoPopup) return this;
+      if (!this._popup) {
+        this._popup = L.popup(this._opcoesPopup).setContent(() => this._conteudoPopup(this));
+      }
+      this._popup.setLatLng(this._latlng).openOn(map);
+      return this;
+    },
+
+    closePopup: function(){
+      if (this._popup) this._popup.close();
+      return this;
+    },
+
+    isPopupOpen: function(){ return !!(this._popup && this._popup.isOpen()); },
+
+    getPopup: function(){ return this._popup; }
+  });
+
+  L.pontoStatus = (latlng, options) => new L.PontoStatus(latlng, options);
+
+  // ------------------------------
+  // CAMADA
+  // ------------------------------
+  L.CamadaPontos = L.Canvas.extend({
+    options: {
+      pane: 'pontos',
+      padding: 0.5,
+      tamanhoCelula: 50,          // px: raio de agrupamento (= RAIO_CLUSTER_PX do servidor)
+      zoomSemCluster: 16,         // a partir desse zoom, só pontos
+      urlClusters: null,          // ex.: '/api/clusters'; null = agrupa no navegador
+      usarServidor: () => true,   // falso: agrupa no navegador (replay)
+      pontoDoHost: () => null,    // host -> ponto (cluster de 1 host vindo do servidor)
+      corStatus: () => '#6b7280', // cor da bolha pelo pior status do servidor
+      corPonto: () => '#6b7280',  // cor do ponto (e da bolha do pior ponto)
+      severidade: () => 0,        // o maior define a cor da bolha
+      piscando: () => false,      // DOWN: pisca
+      anel: () => false,          // enlace degradado: anel laranja tracejado
+      titulo: () => ''            // texto do hover
+    },
+
+    initialize: function(options){
+      L.Canvas.prototype.initialize.call(this, options);
+      this._pontos = new Set();
+      this._alvos = [];           // [{x, y, n, pontos, pior}] em pixels absolutos do zoom
+      this._grade = new Map();    // célula -> [alvo] (hit-test)
+      this._zoomAgrupado = null;
+      this._modoAgrupado = null;  // 'servidor' | 'local'
+      this._geracao = 0;          // muda a cada agrupamento (p._alvo atual?)
+      this._sujo = true;
+      this._srv = null;           // {zoom, bbox, itens} da última resposta do /api/clusters
+      this._srvVelho = true;      // status mudou desde a última busca
+      this._buscando = false;
+      this._srvFalhou = false;
+      this._aceso = false;
+      this._piscandoVisiveis = 0;
+      this._hover = null;
+    },
+
+    onAdd: function(map){
+      if (!map.getPane(this.options.pane)) {
+        map.createPane(this.options.pane);
+        map.getPane(this.options.pane).style.zIndex = 610; // acima dos marcadores padrão
+      }
+      L.Canvas.prototype.onAdd.call(this, map);
+      // O canvas cobre o mapa inteiro: eventos ficam com as camadas de
+      // baixo (tooltips da qualidade) e o hit-test usa os do container.
+      this._container.style.pointerEvents = 'none';
+      L.DomEvent.on(map.getContainer(), 'click', this._aoClicar, this);
+      L.DomEvent.on(map.getContainer(), 'mousemove', this._aoMover, this);
+      L.DomEvent.on(map.getContainer(), 'mouseout', this._aoSair, this);
+      this._pisca = setInterval(() => {
+        if (!this._piscandoVisiveis) return;
+        this._aceso = !this._aceso;
+        this.redesenhar();
+      }, PISCA_MS);
+    },
+
+    onRemove: function(map){
+      clearInterval(this._pisca);
+      L.DomEvent.off(map.getContainer(), 'click', this._aoClicar, this);
+      L.DomEvent.off(map.getContainer(), 'mousemove', this._aoMover, this);
+      L.DomEvent.off(map.getContainer(), 'mouseout', this._aoSair, this);
+      this._aoSair();
+      L.Canvas.prototype.onRemove.call(this, map);
+    },
+
+    // --- API de dados ---
+
+    addLayers: function(pontos){
+      for (const p of pontos) {
+        this._pontos.add(p);
+        p._camada = this;
+      }
+      return this.refreshClusters();
+    },
+
+    addLayer: function(p){ return this.addLayers([p]); },
+
+    removeLayer: function(p){
+      if (this._pontos.delete(p)) {
+        p.closePopup();
+        p._camada = null;
+        this.refreshClusters();
+      }
+      return this;
+    },
+
+    // Status/posição mudaram: reagrupa e redesenha no próximo quadro
+    refreshClusters: function(){
+      this._sujo = true;
+      this._srvVelho = true;
+      this._srvFalhou = false; // tenta o servidor de novo
+      return this.redesenhar();
+    },
+
+    redesenhar: function(){
+      if (this._map) {
+        this._redrawBounds = null;
+        this._redrawRequest = this._redrawRequest || L.Util.requestAnimFrame(this._redraw, this);
+      }
+      return this;
+    },
+
+    // Se o ponto está dentro de uma bolha, aproxima até ele ficar sozinho
+    zoomToShowLayer: function(p, callback){
+      const map = this._map;
+      if (map) {
+        this._atualizarGrupos();
+        const sozinho = p._alvo && p._alvo.g === this._geracao && p._alvo.n === 1;
+        if (!sozinho && map.getZoom() < this.options.zoomSemCluster) {
+          map.setView(p.getLatLng(), Math.max(map.getZoom() + 1, this.options.zoomSemCluster), { animate: false });
+        }
+      }
+      if (callback) callback();
+      return this;
+    },
+
+    // --- agrupamento ---
+
+    _atualizarGrupos: function(){
+      const zoom = this._map.getZoom();
+      const modo = this._modo(zoom);
+      if (this._sujo || zoom !== this._zoomAgrupado || modo !== this._modoAgrupado ||
+          (modo === 'servidor' && !this._buscando && !this._srvCobre(zoom))) {
+        this._agrupar(zoom, modo);
+      }
+    },
+
+    _modo: function(zoom){
+      const o = this.options;
+      return o.urlClusters && zoom < o.zoomSemCluster && !this._srvFalhou && o.usarServidor()
+        ? 'servidor' : 'local';
+    },
+
+    _agrupar: function(zoom, modo){
+      if (modo === 'servidor') this._agruparServidor(zoom);
+      else this._agruparLocal(zoom);
+      this._zoomAgrupado = zoom;
+      this._modoAgrupado = modo;
+      this._sujo = false;
+    },
+
+    // --- agrupamento no servidor (/api/clusters) ---
+
+    _srvCobre: function(zoom){
+      const srv = this._srv;
+      return !!srv && srv.zoom === zoom && srv.bbox.contains(this._map.getBounds());
+    },
+
+    _agruparServidor: function(zoom){
+      if (!this._buscando && (this._srvVelho || !this._srvCobre(zoom))) this._buscarClusters(zoom);
+      // até a resposta do zoom novo chegar, nada de bolhas em posição errada
+      const itens = this._srv && this._srv.zoom === zoom ? this._srv.itens : [];
+      const map = this._map;
+      const o = this.options;
+      const alvos = [];
+      const g = ++this._geracao;
+      for (const c of itens) {
+        const pt = map.project([c.lat, c.lng], zoom);
+        if (c.count > 1) {
+          alvos.push({ x: pt.x, y: pt.y, n: c.count, pior: null, pontos: null, status: c.status, g });
+          continue;
+        }
+        const p = o.pontoDoHost(c.host);
+        if (!p) continue; // ainda não chegou no /api/status deste navegador
+        alvos.push(p._alvo = { x: pt.x, y: pt.y, n: 1, pior: p, pontos: [p], g });
+      }
+      this._indexarAlvos(alvos);
+    },
+
+    _buscarClusters: function(zoom){
+      const bbox = this._map.getBounds().pad(1); // folga: arrastar não refaz a busca
+      const params = new URLSearchParams({ zoom: String(zoom), bbox: bbox.toBBoxString() });
+      this._buscando = true;
+      this._srvVelho = false;
+      fetch(this.options.urlClusters + '?' + params)
+        .then(resp => {
+          if (!resp.ok) throw new Error('Falha ao buscar ' + this.options.urlClusters);
+          return resp.json();
+        })
+        .then(itens => { this._srv = { zoom, bbox, itens }; })
+        .catch(err => {
+          console.error(err);
+          this._srvFalhou = true; // agrupa no navegador até o próximo refreshClusters
+        })
+        .finally(() => {
+          this._buscando = false;
+          this._sujo = true;
+          this.redesenhar();
+        });
+    },
+
+    // --- agrupamento no navegador ---
+
+    _agruparLocal: function(zoom){
+      const map = this._map;
+      const o = this.options;
+      const tam = o.tamanhoCelula;
+      const agrupa = zoom < o.zoomSemCluster;
+      const g = ++this._geracao;
+      const celulas = new Map();
+      const alvos = [];
+
+      for (const p of this._pontos) {
+        if (p._pz !== zoom) {
+          const pt = map.project(p._latlng, zoom);
+          p._px = pt.x;
+          p._py = pt.y;
+          p._pz = zoom;
+        }
+        const sev = o.severidade(p);
+        if (!agrupa) {
+          alvos.push(p._alvo = { x: p._px, y: p._py, n: 1, pontos: [p], pior: p, g });
+          continue;
+        }
+        const chave = Math.floor(p._px / tam) * CHAVE_Y + Math.floor(p._py / tam);
+        let a = celulas.get(chave);
+        if (!a) {
+          a = { x: 0, y: 0, n: 0, pontos: [], pior: p, sev: sev, g };
+          celulas.set(chave, a);
+          alvos.push(a);
+        } else if (sev > a.sev) {
+          a.pior = p;
+          a.sev = sev;
+        }
+        a.x += p._px;
+        a.y += p._py;
+        a.pontos.push(p);
+        a.n++;
+        p._alvo = a;
+      }
+
+      // Bolha no centróide dos hosts
+      if (agrupa) {
+        for (const a of alvos) {
+          a.x /= a.n;
+          a.y /= a.n;
+        }
+      }
+      this._indexarAlvos(alvos);
+    },
+
+    // Grade de hit-test pelo centro de cada alvo
+    _indexarAlvos: function(alvos){
+      const tam = this.options.tamanhoCelula;
+      const grade = new Map();
+      for (const a of alvos) {
+        const chave = Math.floor(a.x / tam) * CHAVE_Y + Math.floor(a.y / tam);
+        const lista = grade.get(chave);
+        if (lista) lista.push(a); else grade.set(chave, [a]);
+      }
+
+      this._alvos = alvos;
+      this._grade = grade;
+    },
+
+    // --- desenho (chamado pelo L.Canvas em moveend/zoomend e por redesenhar) ---
+
+    _updatePaths: function(){
+      this._redraw();
+    },
+
+    _draw: function(){
+      if (!this._map || !this._bounds) return;
+      this._atualizarGrupos();
+
+      const o = this.options;
+      const ctx = this._ctx;
+      const origem = this._map.getPixelOrigin();
+      const minX = this._bounds.min.x + origem.x - RAIO_CLUSTER;
+      const minY = this._bounds.min.y + origem.y - RAIO_CLUSTER;
+      const maxX = this._bounds.max.x + origem.x + RAIO_CLUSTER;
+      const maxY = this._bounds.max.y + origem.y + RAIO_CLUSTER;
+
+      // Lotes por cor: pontos, pontos com anel e bolhas
+      const pontos = new Map();
+      const aneis = [];
+      const bolhas = new Map();
+      let piscando = 0;
+
+      for (const a of this._alvos) {
+        if (a.x < minX || a.x > maxX || a.y < minY || a.y > maxY) continue;
+        const x = a.x - origem.x;
+        const y = a.y - origem.y;
+        const cor = a.pior ? o.corPonto(a.pior) : o.corStatus(a.status);
+        if (a.n > 1) {
+          const lote = bolhas.get(cor);
+          if (lote) lote.push(x, y, a.n); else bolhas.set(cor, [x, y, a.n]);
+          continue;
+        }
+        const p = a.pior;
+        let preenchimento = cor;
+        if (o.piscando(p)) {
+          piscando++;
+          if (this._aceso) preenchimento = clarear(cor);
+        }
+        const lote = pontos.get(preenchimento);
+        if (lote) lote.push(x, y); else pontos.set(preenchimento, [x, y]);
+        if (o.anel(p)) aneis.push(x, y);
+      }
+      this._piscandoVisiveis = piscando;
+
+      ctx.save();
+
+      // Pontos: um fill por cor + uma borda única para todos
+      const bordas = new Path2D();
+      for (const [cor, xy] of pontos) {
+        const path = new Path2D();
+        for (let i = 0; i < xy.length; i += 2) {
+          path.moveTo(xy[i] + RAIO_PONTO, xy[i + 1]);
+          path.arc(xy[i], xy[i + 1], RAIO_PONTO, 0, 2 * Math.PI);
+        }
+        ctx.fillStyle = cor;
+        ctx.fill(path);
+        bordas.addPath(path);
+      }
+      ctx.lineWidth = 2;
+      ctx.strokeStyle = 'rgba(0, 0, 0, 0.33)';
+      ctx.stroke(bordas);
+
+      if (aneis.length) {
+        ctx.beginPath();
+        for (let i = 0; i < aneis.length; i += 2) {
+          ctx.moveTo(aneis[i] + RAIO_PONTO - 1.5, aneis[i + 1]);
+          ctx.arc(aneis[i], aneis[i + 1], RAIO_PONTO - 1.5, 0, 2 * Math.PI);
+        }
+        ctx.setLineDash([3, 2]);
+        ctx.lineWidth = 3;
+        ctx.strokeStyle = '#f97316';
+        ctx.stroke();
+        ctx.setLineDash([]);
+      }
+
+      // Bolhas: cor translúcida do pior status + contagem
+      ctx.lineWidth = 2;
+      for (const [cor, xyn] of bolhas) {
+        ctx.beginPath();
+        for (let i = 0; i < xyn.length; i += 3) {
+          ctx.moveTo(xyn[i] + RAIO_CLUSTER, xyn[i + 1]);
+          ctx.arc(xyn[i], xyn[i + 1], RAIO_CLUSTER, 0, 2 * Math.PI);
+        }
+        ctx.fillStyle = rgba(cor, 0.28);
+        ctx.fill();
+        ctx.strokeStyle = rgba(cor, 0.55);
+        ctx.stroke();
+      }
+      ctx.fillStyle = '#111';
+      ctx.font = 'bold 12px Arial, Helvetica, sans-serif';
+      ctx.textAlign = 'center';
+      ctx.textBaseline = 'middle';
+      for (const xyn of bolhas.values()) {
+        for (let i = 0; i < xyn.length; i += 3) ctx.fillText(String(xyn[i + 2]), xyn[i], xyn[i + 1] + 1);
+      }
+
+      ctx.restore();
+    },
+
+    // --- hit-test ---
+
+    _alvoEm: function(ev){
+      const map = this._map;
+      this._atualizarGrupos();
+      const pt = map.mouseEventToLayerPoint(ev).add(map.getPixelOrigin());
+      const tam = this.options.tamanhoCelula;
+      const cx = Math.floor(pt.x / tam);
+      const cy = Math.floor(pt.y / tam);
+      let melhor = null;
+      let menor = Infinity;
+      for (let dx = -1; dx <= 1; dx++) {
+        for (let dy = -1; dy <= 1; dy++) {
+          const lista = this._grade.get((cx + dx) * CHAVE_Y + cy + dy);
+          if (!lista) continue;
+          for (const a of lista) {
+            const r = a.n > 1 ? RAIO_CLUSTER : RAIO_PONTO;
+            const d = (a.x - pt.x) ** 2 + (a.y - pt.y) ** 2;
+            if (d <= r * r && d < menor) {
+              melhor = a;
+              menor = d;
+            }
+          }
+        }
+      }
+      return melhor;
+    },
+
+    _aoClicar: function(ev){
+      const map = this._map;
+      if (!map || foraDoMapa(ev) || (map.dragging && map.dragging.moved())) return;
+      const a = this._alvoEm(ev);
+      if (!a) return;
+      if (a.n === 1) {
+        a.pior.openPopup();
+      } else if (!a.pontos) {
+        // bolha do servidor (sem membros aqui): aproxima nela
+        map.setView(map.unproject([a.x, a.y], map.getZoom()),
+          Math.min(map.getZoom() + 2, this.options.zoomSemCluster));
+      } else {
+        map.fitBounds(L.latLngBounds(a.pontos.map(p => p.getLatLng())), { padding: [40, 40] });
+      }
+    },
+
+    _aoMover: function(ev){
+      const map = this._map;
+      if (!map || map._animatingZoom || (map.dragging && map.dragging.moving())) return;
+      const a = foraDoMapa(ev) ? null : this._alvoEm(ev);
+      if (a === this._hover) return;
+      this._hover = a;
+      const container = map.getContainer();
+      container.style.cursor = a ? 'pointer' : '';
+      if (!a) container.removeAttribute('title');
+      else container.title = a.n > 1 ? `${a.n} hosts` : this.options.titulo(a.pior);
+    },
+
+    _aoSair: function(){
+      if (!this._map) return;
+      this._hover = null;
+      this._map.getContainer().style.cursor = '';
+      this._map.getContainer().removeAttribute('title');
+    }
+  });
+
+  L.camadaPontos = options => new L.CamadaPontos(options);
+})();
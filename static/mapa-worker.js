@@ -0,0 +1,111 @@
+// ============================================================
+// mapa-worker.js — busca e diff do /api/status fora da thread principal
+// - fetch + JSON.parse do /api/status
+// - comparação com o estado anterior (por host)
+// - detecção de transição para DOWN
+// - incidentes correlacionados abertos (/api/incidents)
+// Devolve para o mapa.js só a lista compacta de mudanças.
+// ============================================================
+
+const STATUS_DOWN = "DOWN";
+const STATUS_WARNING = "WARNING";
+const STATUS_UNKNOWN = "UNKNOWN";
+
+// Campos recalculados a cada varredura (now - last_time_down) que não
+// representam mudança real do host; ficam fora da assinatura.
+const CAMPOS_VOLATEIS = ["last_downtime_duration_ms", "last_downtime_duration_human"];
+
+// host -> { sig, status, degradado } da última resposta
+let anterior = new Map();
+let ordemAnterior = "";
+
+// Status efetivo (flapping => WARNING), mesma regra do mapa.js
+function statusEfetivo(item) {
+  if (item.is_flapping === true) return STATUS_WARNING;
+  return item.status ?? STATUS_UNKNOWN;
+}
+
+function assinatura(item) {
+  const copia = Object.assign({}, item);
+  for (const c of CAMPOS_VOLATEIS) delete copia[c];
+  return JSON.stringify(copia);
+}
+
+// Incidentes são opcionais: se a chamada falhar, o mapa segue sem eles
+async function buscarIncidentes() {
+  try {
+    const resp = await fetch("/api/incidents?" + Date.now());
+    if (!resp.ok) return null;
+    return (await resp.json()).abertos;
+  } catch (err) {
+    return null;
+  }
+}
+
+async function atualizar(url) {
+  const pedidoIncidentes = buscarIncidentes();
+  const resp = await fetch(url + (url.includes("?") ? "&" : "?") + Date.now()); // cache-busting
+  if (!resp.ok) throw new Error("Falha ao buscar /api/status");
+  const dados = await resp.json();
+
+  const proximo = new Map();
+  const alterados = []; // { item, statusMudou }
+  const quedas = [];    // hosts que passaram para DOWN
+
+  for (const item of dados) {
+    const status = statusEfetivo(item);
+    const degradado = item.degraded === true;
+    const sig = assinatura(item);
+    const prev = anterior.get(item.host);
+    proximo.set(item.host, { sig, status, degradado });
+
+    if (!prev) {
+      alterados.push({ item, status, statusMudou: true });
+      continue;
+    }
+    if (prev.sig !== sig) {
+      // statusMudou = o ícone precisa ser refeito (cor ou marcação de degradado)
+      alterados.push({ item, status, statusMudou: prev.status !== status || prev.degradado !== degradado });
+    }
+    // Som somente em transição (prev não DOWN -> agora DOWN)
+    if (prev.status !== STATUS_DOWN && status === STATUS_DOWN) {
+      quedas.push(item.host);
+    }
+  }
+
+  const removidos = [];
+  anterior.forEach((_, host) => { if (!proximo.has(host)) removidos.push(host); });
+
+  // Ordem do inventário só é reenviada quando muda (inclusão/remoção/reordenação)
+  const ordem = dados.map(d => d.host);
+  const ordemTxt = ordem.join("\n");
+  const ordemMudou = ordemTxt !== ordemAnterior;
+  ordemAnterior = ordemTxt;
+
+  anterior = proximo;
+  return {
+    tipo: "mudancas",
+    alterados,
+    removidos,
+    quedas,
+    ordem: ordemMudou ? ordem : null,
+    total: dados.length,
+    origem: resp.headers.get("X-Data-Source"),          // nagios | replica | instantaneo (partida a quente) | nenhuma
+    idade: Number(resp.headers.get("X-Data-Age") || 0),  // segundos desde a varredura
+    incidentes: await pedidoIncidentes
+  };
+}
+
+self.onmessage = async (ev) => {
+  const msg = ev.data || {};
+  if (msg.tipo === "atualizar") {
+    try {
+      self.postMessage(await atualizar(msg.url || "/api/status"));
+    } catch (err) {
+      self.postMessage({ tipo: "erro", mensagem: String(err && err.message || err) });
+    }
+  } else if (msg.tipo === "reiniciar") {
+    anterior = new Map();
+    ordemAnterior = "";
+  }
+};
@@ -5,6 +5,13 @@
 // - Popup persistente (só fecha no [x])
 // - Alerta sonoro em transição para DOWN
 // - Busca com múltiplos resultados + painel flutuante
+// - Atualização incremental: diff do /api/status em Web Worker
+// - Popups renderizados sob demanda + duração ao vivo (timer único)
+// - Replay do histórico (/api/replay) pelo mesmo caminho incremental
+// - Incidentes correlacionados: um aviso (e um som) por queda em massa
+// - Enlaces degradados (campo degraded) com anel no marcador
+// - Camada de qualidade (disponibilidade/latência) pré-calculada no servidor
+// - Marcadores e clusters em canvas (camada-pontos.js), sem divIcons
 // ============================================================
 
 // ------------------------------
@@ -18,8 +25,8 @@ const map = L.map('map', {
   closePopupOnClick: false
 });
 
-// Camada OSM
-L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+// Camada OSM (pelo cache de tiles do servidor: /tiles/{z}/{x}/{y}.png)
+L.tileLayer('/tiles/{z}/{x}/{y}.png', {
   attribution: '© OpenStreetMap contributors'
 }).addTo(map);
 
@@ -58,16 +65,6 @@ function colorForStatus(s){
   }
 }
 
-function cssClassForStatus(s){
-  switch (s) {
-    case STATUS.UP:      return "status-up";
-    case STATUS.DOWN:    return "status-down";
-    case STATUS.WARNING: return "status-warning";
-    case STATUS.UNKNOWN:
-    default:             return "status-unknown";
-  }
-}
-
 function escapeHtml(s){
   if (s == null) return "";
   return String(s)
@@ -117,48 +114,27 @@ function formatDhms(seconds){
 // ------------------------------
 // CLUSTER POR PIOR STATUS
 // ------------------------------
-function clusterClassForStatus(s){
-  switch (s) {
-    case STATUS.DOWN:    return "cluster-down";
-    case STATUS.WARNING: return "cluster-warning";
-    case STATUS.UNKNOWN: return "cluster-unknown";
-    case STATUS.UP:
-    default:             return "cluster-up";
-  }
-}
-
-const clusters = L.markerClusterGroup({
-  maxClusterRadius: 50,
-  spiderfyOnMaxZoom: true,
-  showCoverageOnHover: false,
-  chunkedLoading: true,
-  iconCreateFunction: function(cluster) {
-    // Determina o pior status entre os filhos
-    let worst = STATUS.UP;
-    cluster.getAllChildMarkers().forEach(marker => {
-      // Se o marcador estiver flapping, tratamos como WARNING (amarelo)
-      let st = marker.options._status ?? STATUS.UNKNOWN;
-      if (marker.options._is_flapping === true) {
-        st = STATUS.WARNING;
-      }
-      if (statusSeverity(st) > statusSeverity(worst)) {
-        worst = st;
-      }
-    });
-
-    const count = cluster.getChildCount();
-    const cls = clusterClassForStatus(worst);
-    return L.divIcon({
-      html: `<div><span>${count}</span></div>`,
-      className: `marker-cluster ${cls}`,
-      iconSize: L.point(40, 40)
-    });
-  }
+// Pontos e bolhas desenhados num único canvas (camada-pontos.js), sem
+// um nó DOM por host. A bolha leva a cor do pior status entre os hosts
+// agrupados (flapping já chega como WARNING em _status). As bolhas vêm
+// do /api/clusters; no replay o status é o do histórico, então agrupa aqui.
+const clusters = L.camadaPontos({
+  tamanhoCelula: 50,
+  urlClusters: "/api/clusters",
+  usarServidor: () => !Replay.ativo(),
+  pontoDoHost: host => { const ref = MARKERS_BY_HOST.get(host); return ref && ref.marker; },
+  corStatus: colorForStatus,
+  corPonto: p => colorForStatus(p.options._status),
+  severidade: p => statusSeverity(p.options._status),
+  piscando: p => p.options._status === STATUS.DOWN,
+  anel: p => p._dados.degraded === true,
+  titulo: p => p.options.title
 });
-map.addLayer(clusters);
+// map.addLayer(clusters) fica depois do Replay: o canvas desenha já no
+// onAdd e as opções acima leem Replay e MARKERS_BY_HOST.
 
 // --- Índice dos marcadores carregados (usado pela busca) ---
-let CURRENT_MARKERS = []; // { marker: L.Marker, data: <obj da API> }
+let CURRENT_MARKERS = []; // { marker: L.PontoStatus, data: <obj da API> } — mesmos objetos de MARKERS_BY_HOST
 
 // ------------------------------
 // ÁUDIO: alerta "gota" quando um host passa para DOWN
@@ -262,37 +238,23 @@ ensureAudioToggleUI();
 // ------------------------------
 // CRIAÇÃO DE MARCADORES
 // ------------------------------
-function createMarker(item){
-  // Status vindo da API...
-  let status = item.status ?? STATUS.UNKNOWN;
 
-  // Se o host está flapping, força WARNING (amarelo)
+// Status exibido: se o host está flapping, força WARNING (amarelo)
+function effectiveStatusOf(item){
+  return item.is_flapping === true ? STATUS.WARNING : (item.status ?? STATUS.UNKNOWN);
+}
+
+function popupHtmlFor(item){
+  const status = effectiveStatusOf(item);
   const isFlapping = item.is_flapping === true;
-  if (isFlapping) {
-    status = STATUS.WARNING;
-  }
-
-  const css = cssClassForStatus(status);
-  const div = document.createElement("div");
-  div.className = css;
-  div.innerHTML = `<div class="marker-dot"></div>`;
-
-  const marker = L.marker([item.lat, item.lng], {
-    icon: L.divIcon({
-      className: "",
-      html: div,
-      iconSize: [18, 18],
-      iconAnchor: [9, 9]
-    }),
-    title: `${item.nome} — ${status}`,
-    _status: status,
-    _is_flapping: isFlapping
-  });
 
   // Badge "Flapping" quando aplicável
   const flappingBadge = isFlapping
     ? `<span class="badge-flapping" title="Host em estado flapping">Flapping</span>`
     : "";
+  const degradedBadge = item.degraded === true
+    ? `<span class="badge-flapping" title="Latência/perda acima da linha de base do host">Degradado</span>`
+    : "";
 
   // --------- CÁLCULO DE DURAÇÃO (robusto s/ms) ----------
   // Pegamos os epochs e normalizamos para SEGUNDOS para o cálculo.
@@ -302,11 +264,14 @@ function createMarker(item){
 
   let durationLabel;
   let durationValueSec = 0;
+  let durationAttrs = "";
 
   if (status === STATUS.DOWN) {
     // Se ainda está DOWN → "Duração até o momento: now - last_down"
+    // (contador ao vivo: o timer compartilhado recalcula a partir de data-desde)
     durationLabel = "Duração até o momento:";
     durationValueSec = Math.max(nowSec - lastUpSec, 0);
+    durationAttrs = ` data-desde="${lastUpSec}"`;
   } else {
     // Se está UP → "Duração última indisponibilidade: last_up - last_down"
     durationLabel = "Duração última indisponibilidade:";
@@ -315,9 +280,9 @@ function createMarker(item){
   const durationHuman = formatDhms(durationValueSec);
   // ------------------------------------------------------
 
-  const popupHtml = `
+  return `
     <div style="min-width:240px">
-      <strong>${escapeHtml(item.nome)}</strong> ${flappingBadge}<br>
+      <strong>${escapeHtml(item.nome)}</strong> ${flappingBadge}${degradedBadge}<br>
       Host: ${escapeHtml(item.host)}<br>
       Status: <b>${escapeHtml(status)}</b><br>
       <small>${escapeHtml(item.plugin_output ?? "")}</small>
@@ -325,13 +290,29 @@ function createMarker(item){
       <small>
         <!-- Removido: Último UP -->
         Último DOWN: ${fmtDate(item.last_time_down)}<br>
-        ${durationLabel} ${durationHuman}
+        ${durationLabel} <span class="popup-duracao"${durationAttrs}>${durationHuman}</span>
       </small>
     </div>
   `;
+}
 
-  // Popup fica aberto até clicar no [x]
-  marker.bindPopup(popupHtml, {
+function tituloMarcador(item, status){
+  return `${item.nome} — ${status}` + (item.degraded === true ? " (enlace degradado)" : "");
+}
+
+function createMarker(item){
+  const status = effectiveStatusOf(item);
+
+  const marker = L.pontoStatus([item.lat, item.lng], {
+    title: tituloMarcador(item, status),
+    _status: status,
+    _is_flapping: item.is_flapping === true
+  });
+
+  // Popup renderizado só ao abrir, a partir do registro atual do host.
+  // Fica aberto até clicar no [x]
+  marker._dados = item;
+  marker.bindPopup(layer => popupHtmlFor(layer._dados), {
     autoClose: false,
     closeOnClick: false,
     closeButton: true
@@ -340,71 +321,412 @@ function createMarker(item){
   return marker;
 }
 
+// Atualiza um marcador existente com o novo registro da API.
+// O HTML do popup só é refeito se ele estiver aberto.
+function updateMarker(marker, item, statusMudou){
+  marker._dados = item;
+  if (statusMudou) {
+    const status = effectiveStatusOf(item);
+    marker.options._status = status;
+    marker.options._is_flapping = item.is_flapping === true;
+    marker.options.title = tituloMarcador(item, status);
+    // o redesenho vem do refreshClusters() de quem chamou
+  }
+  if (marker.isPopupOpen()) marker.getPopup().update();
+}
+
 // ------------------------------
-// BUSCA DE STATUS NO BACKEND
+// TIMER ÚNICO DAS DURAÇÕES "AO VIVO" DOS POPUPS ABERTOS
 // ------------------------------
-async function fetchStatus(){
-  const resp = await fetch("/api/status?" + Date.now()); // cache-busting
-  if (!resp.ok) throw new Error("Falha ao buscar /api/status");
-  return await resp.json();
-}
+const _popupsAbertos = new Set(); // L.Popup
+
+map.on('popupopen', ev => _popupsAbertos.add(ev.popup));
+map.on('popupclose', ev => _popupsAbertos.delete(ev.popup));
+
+setInterval(() => {
+  if (!_popupsAbertos.size) return;
+  const nowSec = Math.floor(Date.now() / 1000);
+  _popupsAbertos.forEach(popup => {
+    const el = popup.getElement();
+    const span = el && el.querySelector('.popup-duracao[data-desde]');
+    if (!span) return;
+    const desde = parseInt(span.getAttribute('data-desde'), 10) || 0;
+    span.textContent = formatDhms(Math.max(nowSec - desde, 0));
+  });
+}, 1000);
 
 // ------------------------------
-// ATUALIZAÇÃO DO MAPA + DETECÇÃO DE QUEDAS (som)
+// ATUALIZAÇÃO DO MAPA (Web Worker) + DETECÇÃO DE QUEDAS (som)
 // ------------------------------
-const _prevStatusByHost = new Map(); // host -> STATUS.*
+// O worker faz fetch, parse e diff do /api/status e devolve só as
+// mudanças; aqui a thread principal apenas aplica nos marcadores.
+const MARKERS_BY_HOST = new Map(); // host -> { marker, data }
+const statusWorker = new Worker("mapa-worker.js");
 
-async function atualizarMapa(){
-  try {
-    const dados = await fetchStatus();
+// ------------------------------
+// INCIDENTES CORRELACIONADOS (/api/incidents, via worker)
+// ------------------------------
+// Quedas simultâneas do mesmo upstream/região chegam agrupadas pelo
+// servidor; o painel lista os incidentes abertos e o som toca uma vez
+// por incidente novo em vez de uma vez por host.
+const Incidentes = (() => {
+  let anunciados = new Set(); // ids já exibidos
+  let hosts = new Set();      // membros de incidentes abertos
 
-    // Detecta transições para DOWN antes de redesenhar
-    const nextMap = new Map();
-    for (const item of dados) {
-      // status efetivo (considerando flapping => WARNING)
-      const isFlapping = item.is_flapping === true;
-      const effectiveStatus = isFlapping ? STATUS.WARNING : (item.status ?? STATUS.UNKNOWN);
+  const panel = document.createElement('div');
+  panel.id = 'incidentPanel';
+  panel.className = 'incident-panel';
+  document.body.appendChild(panel);
 
-      const prev = _prevStatusByHost.get(item.host);
-      nextMap.set(item.host, effectiveStatus);
+  function descricao(inc) {
+    const origem = inc.tipo === 'upstream' ? `upstream ${escapeHtml(inc.upstream)}` : 'mesma região';
+    return `⚠ ${inc.down.length}/${inc.hosts.length} hosts DOWN — ${origem}` +
+      ` <small>desde ${new Date(inc.inicio * 1000).toLocaleTimeString()}</small>`;
+  }
 
-      // Toca som somente em transição (prev não DOWN -> agora DOWN)
-      if (prev !== undefined && prev !== STATUS.DOWN && effectiveStatus === STATUS.DOWN) {
-        AudioAlert.playDroplet();
-      }
-    }
-    // Atualiza memória
-    _prevStatusByHost.clear();
-    nextMap.forEach((v, k) => _prevStatusByHost.set(k, v));
+  function enquadrar(inc) {
+    const bounds = L.latLngBounds([]);
+    inc.hosts.forEach(h => {
+      const ref = MARKERS_BY_HOST.get(h);
+      if (ref) bounds.extend(ref.marker.getLatLng());
+    });
+    if (bounds.isValid()) map.fitBounds(bounds.pad(0.2), { animate: false });
+  }
 
-    // Redesenha
-    clusters.clearLayers();
+  function render(lista) {
+    panel.innerHTML = '';
+    panel.classList.toggle('open', lista.length > 0);
+    lista.forEach(inc => {
+      const row = document.createElement('div');
+      row.className = 'incident-panel__item';
+      row.title = inc.hosts.join(', ');
+      row.innerHTML = descricao(inc);
+      row.addEventListener('click', () => enquadrar(inc));
+      panel.appendChild(row);
+    });
+  }
+
+  // Retorna quantos incidentes apareceram desde a última chamada
+  function atualizar(lista) {
+    if (!Array.isArray(lista)) return 0; // falha na consulta: mantém o painel
+    let novos = 0;
+    lista.forEach(inc => { if (!anunciados.has(inc.id)) novos++; });
+    anunciados = new Set(lista.map(inc => inc.id));
+    hosts = new Set(lista.flatMap(inc => inc.hosts));
+    render(lista);
+    return novos;
+  }
+
+  function contem(host) { return hosts.has(host); }
 
-    // Índice global para buscas no painel
-    CURRENT_MARKERS = [];
+  return { atualizar, contem };
+})();
+
+function aplicarMudancas(msg){
+  const novos = [];
+  const paraRefresh = [];
+
+  for (const host of msg.removidos) {
+    const ref = MARKERS_BY_HOST.get(host);
+    if (!ref) continue;
+    clusters.removeLayer(ref.marker);
+    MARKERS_BY_HOST.delete(host);
+  }
 
-    dados.forEach(item => {
+  for (const { item, statusMudou } of msg.alterados) {
+    const ref = MARKERS_BY_HOST.get(item.host);
+    _chavesDe(item); // chaves de busca calculadas na carga, não na digitação
+    if (!ref) {
       const m = createMarker(item);
-      CURRENT_MARKERS.push({ marker: m, data: item });
-      clusters.addLayer(m);
+      MARKERS_BY_HOST.set(item.host, { marker: m, data: item });
+      novos.push(m);
+      continue;
+    }
+    const moved = ref.data.lat !== item.lat || ref.data.lng !== item.lng;
+    ref.data = item;
+    if (moved) {
+      clusters.removeLayer(ref.marker);
+      ref.marker.setLatLng([item.lat, item.lng]);
+      novos.push(ref.marker);
+    }
+    updateMarker(ref.marker, item, statusMudou);
+    if (statusMudou && !moved) paraRefresh.push(ref.marker);
+  }
+
+  if (novos.length) clusters.addLayers(novos);
+  if (paraRefresh.length) clusters.refreshClusters(paraRefresh);
+
+  // Índice global para buscas no painel (ordem do inventário)
+  if (msg.ordem) {
+    CURRENT_MARKERS = msg.ordem.map(h => MARKERS_BY_HOST.get(h)).filter(Boolean);
+  }
+
+  // Um som por incidente novo; quedas isoladas continuam tocando
+  const novosIncidentes = Incidentes.atualizar(msg.incidentes);
+  const soltas = msg.quedas.filter(h => !Incidentes.contem(h));
+  if (novosIncidentes || soltas.length) AudioAlert.playDroplet();
+}
+
+// Logo após um restart o servidor responde com o último instantâneo
+// gravado (origem "instantaneo") até a 1ª varredura terminar; sem
+// instantâneo, só o inventário, todo UNKNOWN (origem "nenhuma").
+function rotuloAtualizacao(msg){
+  const agora = new Date().toLocaleString();
+  if (msg.origem === "nenhuma") return "Aguardando a 1ª coleta do Nagios";
+  if (msg.origem !== "instantaneo") return agora;
+  const de = new Date(Date.now() - (msg.idade || 0) * 1000).toLocaleString();
+  return `Dados de ${de} (última coleta salva, há ${formatDhms(msg.idade || 0)}) — aguardando o Nagios`;
+}
+
+statusWorker.onmessage = (ev) => {
+  const msg = ev.data;
+  if (Replay.ativo()) return; // resposta atrasada do modo ao vivo
+  const lbl = document.getElementById("lastUpdate");
+  if (msg.tipo === "erro") {
+    console.error(msg.mensagem);
+    if (lbl) lbl.textContent = "Erro";
+    return;
+  }
+
+  aplicarMudancas(msg);
+  if (lbl) lbl.textContent = rotuloAtualizacao(msg);
+
+  if (!atualizarMapa._fitted && CURRENT_MARKERS.length > 0) {
+    const bounds = L.latLngBounds(
+      CURRENT_MARKERS.map(r => [r.data.lat, r.data.lng])
+    );
+    map.fitBounds(bounds.pad(0.15), { animate: false });
+    atualizarMapa._fitted = true;
+  }
+};
+
+function atualizarMapa(){
+  if (Replay.ativo()) return;
+  statusWorker.postMessage({ tipo: "atualizar", url: "/api/status" });
+}
+
+// ------------------------------
+// REPLAY DO HISTÓRICO
+// ------------------------------
+// Lê o NDJSON do /api/replay (o servidor já cadencia pelo speed) e
+// converte cada quadro no mesmo formato de mudanças do worker.
+const Replay = (() => {
+  let controle = null; // AbortController do replay em andamento
+
+  function ativo() { return controle !== null; }
+
+  // Registro do replay: dados fixos do marcador + status do histórico
+  function itemReplay(ref, m) {
+    return Object.assign({}, ref.data, {
+      status: m.status,
+      is_flapping: m.is_flapping,
+      degraded: false,
+      plugin_output: "(replay)"
     });
+  }
 
-    const lbl = document.getElementById("lastUpdate");
-    if (lbl) lbl.textContent = new Date().toLocaleString();
-
-    if (!atualizarMapa._fitted && dados.length > 0) {
-      const bounds = L.latLngBounds(
-        dados.map(d => [d.lat, d.lng])
-      );
-      map.fitBounds(bounds.pad(0.15), { animate: false });
-      atualizarMapa._fitted = true;
+  function aplicarEstados(lista, todos) {
+    const alterados = [];
+    for (const m of lista) {
+      const ref = MARKERS_BY_HOST.get(m.host);
+      if (!ref) continue; // host fora do inventário atual
+      const antes = effectiveStatusOf(ref.data);
+      const item = itemReplay(ref, m);
+      const depois = effectiveStatusOf(item);
+      if (!todos && antes === depois && ref.data.is_flapping === item.is_flapping) continue;
+      alterados.push({ item, status: depois, statusMudou: antes !== depois });
     }
-  } catch (err) {
-    console.error(err);
+    // quedas do passado não tocam o alerta sonoro enquanto se navega no histórico
+    aplicarMudancas({ alterados, removidos: [], quedas: [], ordem: null });
+  }
+
+  async function iniciar(de, ate, speed, aoQuadro) {
+    parar(false);
+    const ctrl = new AbortController();
+    controle = ctrl;
+    const params = new URLSearchParams({ from: de, speed: String(speed) });
+    if (ate) params.set("to", ate);
+    try {
+      const resp = await fetch("/api/replay?" + params, { signal: ctrl.signal });
+      if (!resp.ok) throw new Error("Falha ao buscar /api/replay");
+      const leitor = resp.body.getReader();
+      const dec = new TextDecoder();
+      let resto = "";
+      for (;;) {
+        const { value, done } = await leitor.read();
+        if (done) break;
+        resto += dec.decode(value, { stream: true });
+        const linhas = resto.split("\n");
+        resto = linhas.pop();
+        for (const linha of linhas) {
+          if (!linha) continue;
+          const q = JSON.parse(linha);
+          if (q.tipo === "inicio") aplicarEstados(q.estado, true);
+          else if (q.tipo === "quadro") aplicarEstados(q.mudancas, false);
+          aoQuadro(q);
+        }
+      }
+    } catch (err) {
+      if (err.name !== "AbortError") console.error(err);
+    }
+    // Terminou sozinho: mantém o último quadro na tela até "Parar"
+  }
+
+  // Volta ao modo ao vivo: o worker refaz o diff do zero e restaura tudo
+  function parar(voltarAoVivo = true) {
+    if (controle) controle.abort();
+    controle = null;
+    if (voltarAoVivo) {
+      statusWorker.postMessage({ tipo: "reiniciar" });
+      atualizarMapa();
+    }
+  }
+
+  return { ativo, iniciar, parar };
+})();
+
+(function initReplayPanel(){
+  const btn = document.createElement('button');
+  btn.id = 'replayToggle';
+  btn.type = 'button';
+  btn.className = 'replay-toggle';
+  btn.title = 'Reproduzir o histórico no mapa';
+  btn.textContent = '⏪ Replay';
+  document.body.appendChild(btn);
+
+  const panel = document.createElement('div');
+  panel.id = 'replayPanel';
+  panel.className = 'replay-panel';
+  panel.innerHTML = `
+    <label>De <input id="replayDe" type="datetime-local"></label>
+    <label>Até <input id="replayAte" type="datetime-local"></label>
+    <label>Velocidade
+      <select id="replaySpeed">
+        <option value="60">1 min/s</option>
+        <option value="600" selected>10 min/s</option>
+        <option value="3600">1 h/s</option>
+        <option value="0">máxima</option>
+      </select>
+    </label>
+    <div class="replay-panel__acoes">
+      <button id="replayIniciar" type="button" class="primary">Reproduzir</button>
+      <button id="replayParar" type="button">Voltar ao vivo</button>
+    </div>
+    <div id="replayInstante" class="replay-panel__instante">—</div>
+  `;
+  document.body.appendChild(panel);
+
+  const inDe = panel.querySelector('#replayDe');
+  const inAte = panel.querySelector('#replayAte');
+  const selSpeed = panel.querySelector('#replaySpeed');
+  const lblInstante = panel.querySelector('#replayInstante');
+
+  // Padrão: últimas 24h (datetime-local usa horário local, sem fuso)
+  const local = d => new Date(d.getTime() - d.getTimezoneOffset() * 60000).toISOString().slice(0, 16);
+  inAte.value = local(new Date());
+  inDe.value = local(new Date(Date.now() - 86400000));
+
+  btn.addEventListener('click', () => panel.classList.toggle('open'));
+
+  panel.querySelector('#replayIniciar').addEventListener('click', () => {
+    if (!inDe.value) return;
     const lbl = document.getElementById("lastUpdate");
-    if (lbl) lbl.textContent = "Erro";
+    Replay.iniciar(inDe.value, inAte.value, selSpeed.value, q => {
+      const txt = (q.tipo === "fim" ? "Replay concluído: " : "Replay: ") + fmtDate(q.ts);
+      lblInstante.textContent = txt;
+      if (lbl) lbl.textContent = txt;
+    });
+  });
+
+  panel.querySelector('#replayParar').addEventListener('click', () => {
+    Replay.parar();
+    lblInstante.textContent = "—";
+  });
+})();
+
+map.addLayer(clusters);
+
+// ------------------------------
+// CAMADA DE QUALIDADE (/api/quality)
+// ------------------------------
+// Células coloridas pelo servidor (propriedade "cor"); o navegador só
+// desenha. fetch com cache "no-cache" revalida pelo ETag: sem mudança,
+// o servidor responde 304 e a camada não é redesenhada.
+const CamadaQualidade = (() => {
+  if (!map.getPane('qualidade')) {
+    map.createPane('qualidade');
+    map.getPane('qualidade').style.zIndex = 350; // abaixo dos marcadores
+  }
+  let selecao = '';  // "availability:24h", "latency:1h"... ('' = desligada)
+  let ultimaChave = '';
+
+  const camada = L.geoJSON(null, {
+    pane: 'qualidade',
+    style: f => ({ color: f.properties.cor, weight: 1, fillColor: f.properties.cor, fillOpacity: 0.35 }),
+    onEachFeature: (f, layer) => {
+      const p = f.properties;
+      const valor = selecao.startsWith('availability')
+        ? `${(p.valor * 100).toFixed(2)}% disponível`
+        : `${p.valor} ms de latência média`;
+      layer.bindTooltip(`${valor}<br>${p.hosts} host(s): ${p.nomes.map(escapeHtml).join(', ')}`);
+    }
+  }).addTo(map);
+
+  async function atualizar() {
+    if (!selecao) return;
+    const [metric, windowNome] = selecao.split(':');
+    const zoom = map.getZoom();
+    const params = new URLSearchParams({ metric, window: windowNome, zoom: String(zoom) });
+    try {
+      const resp = await fetch('/api/quality?' + params, { cache: 'no-cache' });
+      if (!resp.ok) throw new Error('Falha ao buscar /api/quality');
+      const chave = `${selecao}|${zoom}|${resp.headers.get('ETag')}`;
+      if (chave === ultimaChave) return; // mesmo conteúdo: nada a redesenhar
+      const dados = await resp.json();
+      ultimaChave = chave;
+      camada.clearLayers();
+      camada.addData(dados);
+    } catch (err) {
+      console.warn(err);
+    }
   }
-}
+
+  function definir(valor) {
+    selecao = valor;
+    ultimaChave = '';
+    camada.clearLayers();
+    atualizar();
+  }
+
+  const Controle = L.Control.extend({
+    options: { position: 'bottomleft' },
+    onAdd: function() {
+      const div = L.DomUtil.create('div', 'quality-control');
+      div.innerHTML = `
+        <label>Qualidade
+          <select>
+            <option value="">desligada</option>
+            <option value="availability:1h">Disponibilidade 1h</option>
+            <option value="availability:24h">Disponibilidade 24h</option>
+            <option value="availability:7d">Disponibilidade 7d</option>
+            <option value="availability:30d">Disponibilidade 30d</option>
+            <option value="latency:1h">Latência 1h</option>
+            <option value="latency:24h">Latência 24h</option>
+            <option value="latency:7d">Latência 7d</option>
+          </select>
+        </label>`;
+      L.DomEvent.disableClickPropagation(div);
+      div.querySelector('select').addEventListener('change', ev => definir(ev.target.value));
+      return div;
+    }
+  });
+  new Controle().addTo(map);
+
+  map.on('zoomend', atualizar);
+  setInterval(atualizar, 60000);
+
+  return { definir, atualizar };
+})();
 
 // Atualização automática
 setInterval(atualizarMapa, 10000);
@@ -414,30 +736,96 @@ atualizarMapa();
 // BUSCA E ABERTURA MÚLTIPLA DE RESULTADOS (APIs públicas)
 // ============================================================
 
-// Normaliza string para busca (sem acento e minúsculas)
+// Normaliza string para busca — mesma regra do normalize() do server.py
+// (sem acento, minúsculas, "_" vira espaço, espaços colapsados)
 function _normalize(s) {
   return (s || "")
     .toString()
     .normalize("NFD")
     .replace(/[\u0300-\u036f]/g, "")
-    .toLowerCase();
+    .toLowerCase()
+    .replace(/_/g, " ")
+    .replace(/\s+/g, " ")
+    .trim();
+}
+
+// Chaves de busca pré-calculadas por host (nome/host normalizados).
+// Calculadas uma vez quando o host aparece no inventário, não a cada tecla.
+const _chavesBusca = new Map(); // host -> { nome, host }
+
+function _chavesDe(item) {
+  let k = _chavesBusca.get(item.host);
+  if (!k || k._nome !== item.nome) {
+    k = { nome: _normalize(item.nome), host: _normalize(item.host), _nome: item.nome };
+    _chavesBusca.set(item.host, k);
+  }
+  return k;
+}
+
+// 0 = exato, 1 = prefixo, 2 = substring, -1 = não casa (mesma ordem da /api/search)
+function _rankBusca(chaves, t) {
+  let rank = -1;
+  for (const c of [chaves.nome, chaves.host]) {
+    let r = -1;
+    if (c === t) r = 0;
+    else if (c.startsWith(t)) r = 1;
+    else if (c.includes(t)) r = 2;
+    if (r >= 0 && (rank < 0 || r < rank)) rank = r;
+  }
+  return rank;
 }
 
-// Retorna array de correspondências para o termo (em nome ou host)
+// Retorna array de correspondências para o termo (em nome ou host),
+// ordenado por exato, prefixo e substring
 function _buscarResultados(termo) {
   const t = _normalize(termo);
   if (!t) return [];
 
-  return CURRENT_MARKERS
-    .map((row, idx) => ({
+  const out = [];
+  CURRENT_MARKERS.forEach((row, idx) => {
+    const rank = _rankBusca(_chavesDe(row.data), t);
+    if (rank < 0) return;
+    out.push({
       idx,                         // índice interno (0-based)
+      rank,
       marker: row.marker,
       item: row.data,              // objeto vindo da API
       nome: row.data?.nome ?? "",
       host: row.data?.host ?? "",
       status: row.data?.status ?? "UNKNOWN"
-    }))
-    .filter(r => _normalize(r.nome).includes(t) || _normalize(r.host).includes(t));
+    });
+  });
+  return out.sort((a, b) => (a.rank - b.rank) || (a.idx - b.idx));
+}
+
+// Busca no índice do servidor (/api/search) e associa aos marcadores atuais.
+// Se a API falhar, cai na busca local com as chaves pré-calculadas.
+async function _buscarResultadosServidor(termo) {
+  const t = (termo || "").trim();
+  if (!t) return [];
+  try {
+    const resp = await fetch("/api/search?q=" + encodeURIComponent(t));
+    if (!resp.ok) throw new Error("Falha ao buscar /api/search");
+    const achados = await resp.json();
+    const porHost = new Map(CURRENT_MARKERS.map((row, idx) => [row.data.host, { row, idx }]));
+    return achados
+      .map(a => {
+        const ref = porHost.get(a.host);
+        if (!ref) return null;
+        return {
+          idx: ref.idx,
+          marker: ref.row.marker,
+          item: ref.row.data,
+          nome: ref.row.data?.nome ?? a.nome,
+          host: ref.row.data?.host ?? a.host,
+          status: ref.row.data?.status ?? a.status
+        };
+      })
+      .filter(Boolean);
+  } catch (err) {
+    console.warn(err);
+    return _buscarResultados(t);
+  }
 }
 
 // Interpreta padrões de seleção: "todos", "1,3,5", "2-4", "primeiros 3"
@@ -535,18 +923,8 @@ window.mapaAbrir = function(termo, selecao = "todos", opts = {}) {
 // Painel flutuante de busca
 // ============================
 (function initSearchPanel(){
-  // --- Fallbacks mínimos se utilitários não existirem ---
-  function _normalizeLocal(s) {
-    return (s || "").toString().normalize("NFD").replace(/[\u0300-\u036f]/g, "").toLowerCase();
-  }
-  const buscar = (window._buscarResultados) ? window._buscarResultados : function(termo) {
-    const t = _normalizeLocal(termo);
-    if (!t) return [];
-    return (window.CURRENT_MARKERS || []).map((row, idx) => ({
-      idx, marker: row.marker, item: row.data,
-      nome: row.data?.nome ?? "", host: row.data?.host ?? "", status: row.data?.status ?? "UNKNOWN"
-    })).filter(r => _normalizeLocal(r.nome).includes(t) || _normalizeLocal(r.host).includes(t));
-  };
+  // --- Busca: índice do servidor, com fallback local (chaves pré-calculadas) ---
+  const buscar = _buscarResultadosServidor;
   const fecharTodos = (window._fecharTodosPopups) ? window._fecharTodosPopups : function() {
     (window.CURRENT_MARKERS || []).forEach(({ marker }) => { try { marker.closePopup(); } catch(e){} });
   };
@@ -689,14 +1067,25 @@ window.mapaAbrir = function(termo, selecao = "todos", opts = {}) {
     }
   });
 
-  // Buscar (Enter no input e botão)
+  // Buscar (Enter no input, botão e digitação com debounce)
+  let buscaSeq = 0;
+  async function executarBusca() {
+    const seq = ++buscaSeq;
+    const termo = termInput.value.trim();
+    const res = await buscar(termo);
+    if (seq === buscaSeq) renderResults(res); // descarta respostas atrasadas
+  }
+  let debounceBusca = null;
+  termInput.addEventListener('input', () => {
+    clearTimeout(debounceBusca);
+    debounceBusca = setTimeout(executarBusca, 150);
+  });
   termInput.addEventListener('keydown', (ev) => {
     if (ev.key === 'Enter') { ev.preventDefault(); btnSearch.click(); }
   });
   btnSearch.addEventListener('click', () => {
-    const termo = termInput.value.trim();
-    const res = buscar(termo);
-    renderResults(res);
+    clearTimeout(debounceBusca);
+    executarBusca();
   });
 
   // Selecionar todos
@@ -1,47 +1,233 @@
+# ============================================================
+# testa_nagios.py — diagnóstico do inventário contra o Nagios
+# Consulta em paralelo todos os hosts de Host_nagiosmpls.xlsx (ou os
+# passados em --host) do mesmo jeito que o coletor do server.py
+# (statusjson.cgi?query=host, campo data.host.status) e relata, por host:
+#   ok           respondeu e o status tem mapeamento (UP/DOWN/UNKNOWN)
+#   ausente      o Nagios não conhece o hostname
+#   auth         HTTP 401/403 (usuário, senha ou permissão)
+#   login_html   veio HTML (página de login) em vez de JSON
+#   mapeamento   resposta sem data.host.status, código fora da tabela do
+#                server (vira WARNING), hoststatus.current_state divergente
+#                ou nome devolvido diferente do da planilha
+#   erro         timeout, conexão, HTTP inesperado ou JSON inválido
+# e a latência de cada consulta, com percentis no resumo.
+#
+# Sem perguntas: credenciais em NAGIOS_USER/NAGIOS_PASS (ou --usuario e
+# NAGIOS_PASS). Saída 0 se todos ok, 1 se houve problema, 2 se não rodou.
+#   python testa_nagios.py [--planilha X.xlsx] [--host H ...] [--todos] [--json]
+# ============================================================
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
-import getpass
-import json
+from requests.adapters import HTTPAdapter
+
+from estado import codigo_nagios
+from indices import STATUS_POR_CODIGO
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+NAGIOS_URL = os.environ.get("NAGIOS_URL", "http://nagiosmpls.mp.rs.gov.br/nagios/cgi-bin/statusjson.cgi")
+HOSTS_FILE = os.path.join(BASE_DIR, "Host_nagiosmpls.xlsx")
+
+# data.host.status (bitmask do statusjson) que o server mapeia explicitamente
+CODIGOS_MAPEADOS = {0: "UNKNOWN", 2: "UP", 4: "DOWN"}
+# hoststatus.current_state (formato antigo) -> status equivalente
+CURRENT_STATE = {0: "UP", 1: "DOWN", 2: "DOWN"}
+PERCENTIS = (50, 90, 95, 99)
+CATEGORIAS = ("ok", "ausente", "auth", "login_html", "mapeamento", "erro")
+
+# -------------------------------
+# INVENTÁRIO
+# -------------------------------
+
+def _normalizar(s: str) -> str:
+    s = unicodedata.normalize("NFKD", str(s).lower().replace("_", " "))
+    return " ".join("".join(ch for ch in s if not unicodedata.combining(ch)).split())
+
+
+def ler_hosts(planilha: str) -> list:
+    """Hosts da coluna 'Host' da planilha, na ordem, sem vazios."""
+    import pandas as pd  # pesado: só quando a planilha é usada
+    df = pd.read_excel(planilha, engine="openpyxl")
+    col = next((c for c in df.columns if "host" in _normalizar(c)), None)
+    if col is None:
+        raise ValueError(f"Coluna 'Host' não encontrada em {planilha}: {df.columns.tolist()}")
+    hosts = []
+    for valor in df[col]:
+        if pd.notna(valor):
+            h = str(valor).replace("\xa0", " ").strip()
+            if h:
+                hosts.append(h)
+    return hosts
+
+# -------------------------------
+# CONSULTA
+# -------------------------------
 
-NAGIOS_URL = "http://nagiosmpls.mp.rs.gov.br/nagios/cgi-bin/statusjson.cgi"
+def diagnosticar(sessao, url: str, auth, host: str, timeout: float) -> dict:
+    """Uma consulta; {"host", "categoria", "ms", "status", "detalhe"}."""
+    out = {"host": host, "categoria": "ok", "ms": None, "status": None, "detalhe": ""}
+    t = time.perf_counter()
+    try:
+        r = sessao.get(url, params={"query": "host", "hostname": host}, auth=auth, timeout=timeout)
+        out["ms"] = round((time.perf_counter() - t) * 1000, 1)
+    except requests.RequestException as e:
+        out["ms"] = round((time.perf_counter() - t) * 1000, 1)
+        out.update(categoria="erro", detalhe=e.__class__.__name__)
+        return out
 
-print("\n=== Teste de Host no Nagios ===")
-usuario = input("Usuário: ").strip()
-senha = getpass.getpass("Senha: ").strip()
+    if r.status_code in (401, 403):
+        out.update(categoria="auth", detalhe=f"HTTP {r.status_code}")
+        return out
+    if "html" in r.headers.get("Content-Type", "").lower():
+        out.update(categoria="login_html", detalhe=f"HTTP {r.status_code}, HTML em vez de JSON")
+        return out
+    if r.status_code != 200:
+        out.update(categoria="erro", detalhe=f"HTTP {r.status_code}")
+        return out
+    try:
+        dados = r.json().get("data") or {}
+    except ValueError:
+        out.update(categoria="erro", detalhe="JSON inválido")
+        return out
 
-host = input("Hostname Nagios para testar: ").strip()
+    hd = dados.get("host")
+    antigo = (dados.get("hoststatus") or {}).get("current_state")
+    if not hd and antigo is None:
+        out.update(categoria="ausente", detalhe="hostname desconhecido no Nagios")
+        return out
+    if not hd or hd.get("status") is None:
+        out.update(categoria="mapeamento",
+                   detalhe=f"sem data.host.status (hoststatus.current_state={antigo}): o server mostraria UNKNOWN")
+        return out
 
-url = f"{NAGIOS_URL}?query=host&hostname={host}"
+    try:
+        bruto = int(hd["status"])
+    except (TypeError, ValueError):
+        out.update(categoria="mapeamento", detalhe=f"data.host.status não numérico: {hd['status']!r}")
+        return out
+    out["status"] = STATUS_POR_CODIGO[codigo_nagios(bruto)]
+    problemas = []
+    if bruto not in CODIGOS_MAPEADOS:
+        problemas.append(f"código {bruto} fora da tabela (vira {out['status']})")
+    if antigo is not None and CURRENT_STATE.get(int(antigo)) != out["status"]:
+        problemas.append(f"hoststatus.current_state={antigo} diverge de data.host.status={bruto}")
+    nome = hd.get("name")
+    if nome and nome != host:
+        problemas.append(f"Nagios devolveu o nome {nome!r}")
+    if problemas:
+        out.update(categoria="mapeamento", detalhe="; ".join(problemas))
+    return out
 
-print(f"\nConsultando: {url}\n")
 
-try:
-    r = requests.get(url, auth=(usuario, senha), timeout=10)
-    print("Status HTTP:", r.status_code)
+def diagnosticar_todos(hosts, url: str, auth, conexoes: int, timeout: float) -> list:
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_maxsize=conexoes)
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    with ThreadPoolExecutor(max_workers=conexoes) as pool:
+        return list(pool.map(lambda h: diagnosticar(sessao, url, auth, h, timeout), hosts))
 
-    # Verificar se a resposta é JSON ou HTML da página de login
-    content_type = r.headers.get("Content-Type", "")
-    print("Content-Type:", content_type)
+# -------------------------------
+# RELATÓRIO
+# -------------------------------
 
-    if "html" in content_type.lower():
-        print("\n❌ ERRO: O Nagios devolveu HTML em vez de JSON.")
-        print("Provável problema de autenticação (cookie, usuário ou permissão).")
-        print("\nTrecho da resposta:\n")
-        print(r.text[:500])
-        exit()
+def percentil(valores, p: float):
+    """Percentil pelo posto mais próximo (valores já ordenados)."""
+    if not valores:
+        return None
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
 
-    data = r.json()
-    print("\nJSON recebido do Nagios:\n")
-    print(json.dumps(data, indent=4))
 
-    state = data.get("data", {}).get("hoststatus", {}).get("current_state", None)
+def resumo(resultados, duplicados, segundos: float) -> dict:
+    lat = sorted(r["ms"] for r in resultados if r["ms"] is not None)
+    contagem = {c: 0 for c in CATEGORIAS}
+    for r in resultados:
+        contagem[r["categoria"]] += 1
+    return {
+        "hosts": len(resultados),
+        "segundos": round(segundos, 2),
+        "categorias": contagem,
+        "duplicados": duplicados,
+        "latencia_ms": {**{f"p{p}": percentil(lat, p) for p in PERCENTIS},
+                        "max": lat[-1] if lat else None},
+    }
 
-    if state is None:
-        print("\n⚠ O Nagios não retornou current_state para esse hostname.")
-        print("Provavelmente o hostname não existe no Nagios.")
+
+def imprimir(resultados, res: dict, todos: bool, lentos: int):
+    problemas = [r for r in resultados if r["categoria"] != "ok"]
+    if todos:
+        linhas = resultados
     else:
-        print(f"\nEstado encontrado: {state}")
+        mais_lentos = sorted((r for r in resultados if r["categoria"] == "ok"),
+                             key=lambda r: -r["ms"])[:lentos]
+        linhas = problemas + mais_lentos
+    if linhas:
+        largura = max(len(r["host"]) for r in linhas)
+        print(f"{'host':<{largura}}  {'categoria':<10}  {'ms':>8}  {'status':<8}  detalhe")
+        for r in linhas:
+            ms = f"{r['ms']:.1f}" if r["ms"] is not None else "-"
+            print(f"{r['host']:<{largura}}  {r['categoria']:<10}  {ms:>8}  {r['status'] or '-':<8}  {r['detalhe']}")
+        if not todos and lentos:
+            print(f"(problemas e os {lentos} ok mais lentos; --todos lista tudo)")
+        print()
+
+    print(f"{res['hosts']} hosts em {res['segundos']} s — "
+          + ", ".join(f"{c}: {n}" for c, n in res["categorias"].items() if n))
+    if res["duplicados"]:
+        print(f"Duplicados no inventário: {', '.join(res['duplicados'])}")
+    lat = res["latencia_ms"]
+    if lat["max"] is not None:
+        print("Latência (ms): " + "  ".join(f"{k}={v:.1f}" for k, v in lat.items()))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Diagnóstico do inventário de hosts contra o Nagios.")
+    ap.add_argument("--planilha", default=HOSTS_FILE, help="planilha com a coluna Host")
+    ap.add_argument("--host", action="append", default=[], help="testa só este host (pode repetir)")
+    ap.add_argument("--url", default=NAGIOS_URL, help="statusjson.cgi (padrão: NAGIOS_URL)")
+    ap.add_argument("--usuario", default=os.environ.get("NAGIOS_USER", "").strip())
+    ap.add_argument("--conexoes", type=int, default=int(os.environ.get("NAGIOS_MAX_CONEXOES", "16")))
+    ap.add_argument("--timeout", type=float, default=8.0, help="segundos por consulta")
+    ap.add_argument("--todos", action="store_true", help="lista todos os hosts, não só os problemas")
+    ap.add_argument("--lentos", type=int, default=10, help="quantos ok mais lentos listar")
+    ap.add_argument("--json", action="store_true", help="saída em JSON (hosts + resumo)")
+    args = ap.parse_args(argv)
+
+    senha = os.environ.get("NAGIOS_PASS", "").strip()
+    if not args.usuario:
+        print("Defina NAGIOS_USER/NAGIOS_PASS (ou --usuario e NAGIOS_PASS).", file=sys.stderr)
+        return 2
+    try:
+        hosts = args.host or ler_hosts(args.planilha)
+    except (OSError, ValueError) as e:
+        print(f"Não foi possível ler o inventário: {e}", file=sys.stderr)
+        return 2
+
+    vistos, duplicados = set(), []
+    for h in hosts:
+        if h in vistos and h not in duplicados:
+            duplicados.append(h)
+        vistos.add(h)
+    unicos = list(dict.fromkeys(hosts))
+
+    inicio = time.perf_counter()
+    resultados = diagnosticar_todos(unicos, args.url, (args.usuario, senha),
+                                    max(1, args.conexoes), args.timeout)
+    res = resumo(resultados, duplicados, time.perf_counter() - inicio)
+    if args.json:
+        print(json.dumps({"hosts": resultados, "resumo": res}, ensure_ascii=False, indent=1))
+    else:
+        imprimir(resultados, res, args.todos, args.lentos)
+    return 0 if res["categorias"]["ok"] == len(resultados) and not duplicados else 1
+
 
-except Exception as e:
-    print("\n❌ EXCEÇÃO OCORREU:")
-    print(e)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# ============================================================
+# conftest.py — stubs locais para os testes (sem rede externa)
+# stub_http: servidor HTTP numa thread; a função responder(metodo,
+# caminho, corpo) decide (status, cabeçalhos, corpo) de cada pedido.
+# ============================================================
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# módulos do projeto ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubHTTP:
+    def __init__(self, responder):
+        self.pedidos = []  # (metodo, caminho, corpo)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self):
+                tamanho = int(self.headers.get("Content-Length") or 0)
+                corpo = self.rfile.read(tamanho) if tamanho else b""
+                stub.pedidos.append((self.command, self.path, corpo))
+                status, cabecalhos, saida = responder(self.command, self.path, corpo)
+                self.send_response(status)
+                for nome, valor in cabecalhos.items():
+                    self.send_header(nome, valor)
+                self.send_header("Content-Length", str(len(saida)))
+                self.end_headers()
+                self.wfile.write(saida)
+
+            do_GET = do_POST = _responder
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.servidor.daemon_threads = True
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.servidor.server_address[1]}"
+
+    def fechar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+@pytest.fixture
+def stub_http():
+    criados = []
+
+    def criar(responder):
+        stub = StubHTTP(responder)
+        criados.append(stub)
+        return stub
+
+    yield criar
+    for stub in criados:
+        stub.fechar()
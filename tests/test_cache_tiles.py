@@ -0,0 +1,102 @@
+# ============================================================
+# test_cache_tiles.py — cache de tiles contra uma origem local
+# TILES_ORIGEM_OSM aponta para um http.server do teste; cada tile da
+# origem tem TAMANHO bytes, para o limite do LRU ser exato.
+# ============================================================
+import os
+import threading
+import time
+
+import pytest
+
+import cache_tiles
+from cache_tiles import CacheTiles
+
+TAMANHO = 100
+
+
+class Origem:
+    """Responde z/x/y com TAMANHO bytes; status e atraso configuráveis."""
+
+    def __init__(self):
+        self.status = 200
+        self.atraso = 0.0
+        self.pedidos = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, metodo, caminho, corpo):
+        with self._lock:
+            self.pedidos[caminho] = self.pedidos.get(caminho, 0) + 1
+        time.sleep(self.atraso)
+        if self.status != 200:
+            return self.status, {}, b"erro"
+        return 200, {"Content-Type": "image/png"}, caminho.encode().ljust(TAMANHO, b".")
+
+
+@pytest.fixture
+def origem(stub_http, monkeypatch):
+    o = Origem()
+    stub = stub_http(o)
+    monkeypatch.setenv("TILES_ORIGEM_OSM", stub.url + "/{z}/{x}/{y}.png")
+    return o
+
+
+def _existe(cache, z, x, y):
+    return os.path.exists(os.path.join(cache.diretorio, CacheTiles.relativo("osm", z, x, y)))
+
+
+def test_lru_remove_o_menos_usado_ao_passar_do_limite(origem, tmp_path):
+    cache = CacheTiles(str(tmp_path), limite_bytes=3 * TAMANHO)
+    for x in range(3):
+        assert cache.obter("osm", 5, x, 0)[2]
+    cache.obter("osm", 5, 0, 0)          # tile 0 volta a ser o mais recente
+    cache.obter("osm", 5, 3, 0)          # estoura o limite: sai o tile 1
+    assert not _existe(cache, 5, 1, 0) and not cache.contem("osm", 5, 1, 0)
+    assert all(_existe(cache, 5, x, 0) for x in (0, 2, 3))
+    est = cache.estatisticas()
+    assert est["bytes"] == 3 * TAMANHO <= est["limite"]
+    assert est["removidos"] == 1 and est["downloads"] == 4 and est["acertos"] == 1
+
+
+def test_pedidos_simultaneos_do_mesmo_tile_fazem_um_download(origem, tmp_path):
+    origem.atraso = 0.3
+    cache = CacheTiles(str(tmp_path))
+    resultados = []
+
+    def pedir():
+        resultados.append(cache.obter("osm", 7, 10, 20))
+
+    threads = [threading.Thread(target=pedir) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert origem.pedidos == {"/7/10/20.png": 1}
+    assert len(resultados) == 8 and all(r is not None and r[2] for r in resultados)
+    assert len({r[0] for r in resultados}) == 1
+    assert cache.estatisticas()["downloads"] == 1
+
+
+def test_tile_vencido_continua_servindo_se_a_origem_falha(origem, tmp_path, monkeypatch):
+    cache = CacheTiles(str(tmp_path))
+    dados, _, fresco = cache.obter("osm", 3, 1, 1)
+    assert fresco
+    monkeypatch.setattr(cache_tiles, "VALIDADE_TILE", 0)  # tudo vencido
+    origem.status = 503
+    velho = cache.obter("osm", 3, 1, 1)
+    assert velho is not None and velho[0] == dados and velho[2] is False
+    assert origem.pedidos["/3/1/1.png"] == 2
+    # sem cópia local e origem fora: nada a servir
+    assert cache.obter("osm", 3, 2, 2) is None
+    assert cache.estatisticas()["falhas"] == 2
+
+
+def test_indice_refeito_do_disco_descarta_tmp(tmp_path):
+    pasta = tmp_path / "osm" / "4" / "3"
+    pasta.mkdir(parents=True)
+    (pasta / "2").write_bytes(b"x" * TAMANHO)
+    (pasta / "5.1234.tmp").write_bytes(b"pela metade")
+    cache = CacheTiles(str(tmp_path))
+    assert not (pasta / "5.1234.tmp").exists()
+    assert cache.contem("osm", 4, 3, 2)
+    assert cache.estatisticas()["tiles"] == 1 and cache.estatisticas()["bytes"] == TAMANHO
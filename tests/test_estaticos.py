@@ -0,0 +1,105 @@
+# ============================================================
+# test_estaticos.py — minificador e pacote dos estáticos
+# O JS minificado tem de dar a mesma árvore sintática do original:
+# os dois são analisados pelo acorn que vem dentro do node (sem
+# posições). Sem node (ou sem o acorn interno), esses testes pulam.
+# ============================================================
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from estaticos import PREFIXO, PacoteEstatico, corpo_para, minificar_css, minificar_js
+
+STATIC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+# lê [[original, minificado], ...] do stdin; devolve os índices que diferem
+_COMPARAR = r"""
+const acorn = require('internal/deps/acorn/acorn/dist/acorn');
+const pares = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const semPosicao = (k, v) => (k === 'start' || k === 'end') ? undefined : v;
+const arvore = (src) => JSON.stringify(acorn.parse(src, {ecmaVersion: 'latest'}), semPosicao);
+const diferentes = [];
+pares.forEach(([a, b], i) => { if (arvore(a) !== arvore(b)) diferentes.push(i); });
+console.log(JSON.stringify(diferentes));
+"""
+
+
+def _node_com_acorn() -> bool:
+    if not shutil.which("node"):
+        return False
+    r = subprocess.run(["node", "--expose-internals", "-e",
+                        "require('internal/deps/acorn/acorn/dist/acorn')"],
+                       capture_output=True)
+    return r.returncode == 0
+
+
+precisa_node = pytest.mark.skipif(not _node_com_acorn(), reason="node com acorn indisponível")
+
+
+def _diferentes(fontes):
+    pares = [[f, minificar_js(f)] for f in fontes]
+    r = subprocess.run(["node", "--expose-internals", "-e", _COMPARAR],
+                       input=json.dumps(pares), capture_output=True, text=True, check=True)
+    return json.loads(r.stdout)
+
+
+CASOS = [
+    "var a = b / c / d; var e = (f) / 2, g = [1] / h;",
+    "x = a\n/b/g.exec(s)",                                  # divisão, não regex
+    "if (/\\/\\/x/.test(s)) { y = 1 }",                     # regex com //
+    "var r = /[\"'`]/g, t = /[/]/, u = / +/;",              # aspas, barra na classe, espaço
+    "function f(s) { return /x y/.test(s) || typeof /z/ }",
+    "a\n++b",                                               # ASI
+    "function g() { return\nx }",                           # ASI depois de return
+    "var t = `x${ {a: 1}.a }y${ `z${ 1 + 2 }` }`;",
+    "var u = \"http://x\"; // comentário\nvar v = 'it\\'s'; /* bloco */ var w = 1",
+    "x = y - -z; x = y + +z; i++ + ++j; k = a /* c */ / d",
+    "const o = {a: 1,\n  b: [1,\n 2],\n}\nlet p = o\n(q)",
+]
+
+
+@precisa_node
+def test_minificar_js_preserva_a_arvore_dos_casos_dificeis():
+    assert [CASOS[i] for i in _diferentes(CASOS)] == []
+
+
+@precisa_node
+@pytest.mark.parametrize("nome", ["camada-pontos.js", "mapa.js", "mapa-worker.js"])
+def test_minificar_js_preserva_a_arvore_dos_fontes(nome):
+    with open(os.path.join(STATIC, nome), encoding="utf-8") as f:
+        fonte = f.read()
+    assert _diferentes([fonte]) == []
+    assert len(minificar_js(fonte)) < len(fonte)
+
+
+def test_minificar_css():
+    css = "/* x */\n.a  .b {\n  color: red ;\n  margin: 0 auto;\n}\n@media (max-width: 600px) { .c { top: 0; } }"
+    assert minificar_css(css) == ".a .b{color: red;margin: 0 auto}@media (max-width: 600px){.c{top: 0}}\n"
+
+
+def test_pacote_troca_url_do_css_pelo_nome_com_hash(tmp_path):
+    (tmp_path / "icons").mkdir()
+    png = b"\x89PNG\r\n\x1a\nfalso"
+    (tmp_path / "icons" / "up.png").write_bytes(png)
+    (tmp_path / "icons" / "status.css").write_text(
+        ".up { background: url(up.png) }\n.dn { background: url('./up.png?v=2') }\n"
+        ".x { background: url(data:image/gif;base64,R0lG) }\n", encoding="utf-8")
+    (tmp_path / "a.js").write_text("var a = 1;\n", encoding="utf-8")
+    (tmp_path / "mapa-worker.js").write_text("onmessage = null;\n", encoding="utf-8")
+    (tmp_path / "index.html").write_text(
+        '<link rel="stylesheet" href="/icons/status.css">\n<script src="/a.js"></script>\n',
+        encoding="utf-8")
+    pacote = PacoteEstatico(str(tmp_path))
+
+    icones = [n for n in pacote.ativos if n.startswith("up.")]
+    assert len(icones) == 1 and icones[0].endswith(".png")
+    corpo, gz, br, mimetype = pacote.ativos[icones[0]]
+    assert corpo == png and gz is None and br is None and mimetype == "image/png"
+    assert corpo_para("gzip, br", corpo, gz, br) == (png, None)
+
+    css = next(v[0] for n, v in pacote.ativos.items() if n.endswith(".css")).decode()
+    assert css.count(f'url("{PREFIXO}{icones[0]}")') == 2
+    assert "url(data:image/gif;base64,R0lG)" in css
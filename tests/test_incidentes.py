@@ -0,0 +1,61 @@
+# ============================================================
+# test_incidentes.py — correlação de quedas e leitura concorrente
+# ============================================================
+import sys
+import threading
+
+from incidentes import MIN_HOSTS_INCIDENTE, DetectorIncidentes
+
+
+def _lista(n):
+    return [{"host": f"h{i}", "lat": -30.0, "lng": -51.0, "upstream": "pe1"} for i in range(n)]
+
+
+def test_quedas_do_mesmo_upstream_abrem_e_encerram_um_incidente():
+    det = DetectorIncidentes()
+    det.inventario(_lista(5))
+    assert det.processar(100, [0, 1], []) == []
+    novos = det.processar(110, [2], [])
+    assert len(novos) == 1 and novos[0].membros == ["h0", "h1", "h2"]
+    det.processar(120, [3], [])  # entra no incidente aberto
+    det.processar(130, [], [0, 1, 2])
+    aberto = det.consultar()["abertos"][0]
+    assert aberto["hosts"] == ["h0", "h1", "h2", "h3"] and aberto["down"] == ["h3"]
+    det.processar(140, [], [3])
+    resumo = det.consultar()
+    assert resumo["abertos"] == [] and resumo["encerrados"][0]["fim"] == 140
+
+
+def test_consultar_nao_ve_incidente_pela_metade():
+    # troca de thread a cada poucos bytecodes: expõe estados intermediários
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        det = DetectorIncidentes()
+        det.inventario(_lista(40))
+        parar = threading.Event()
+        erros = []
+
+        def coletor():
+            agora = 0
+            while not parar.is_set():
+                agora += 10
+                det.processar(agora, list(range(40)), [])
+                agora += 10
+                det.processar(agora, [], list(range(40)))
+
+        t = threading.Thread(target=coletor)
+        t.start()
+        try:
+            for _ in range(3000):
+                for inc in det.consultar()["abertos"]:
+                    if not inc["down"] or inc["fim"] is not None or not set(inc["down"]) <= set(inc["hosts"]):
+                        erros.append(inc)
+                    if len(inc["hosts"]) < MIN_HOSTS_INCIDENTE:
+                        erros.append(inc)
+        finally:
+            parar.set()
+            t.join()
+        assert erros == []
+    finally:
+        sys.setswitchinterval(intervalo)
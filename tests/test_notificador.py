@@ -0,0 +1,207 @@
+# ============================================================
+# test_notificador.py — lotes, repetições, resfriamento, taxa e fila
+# Webhook contra um http.server local e e-mail contra um stub SMTP
+# mínimo; janela e intervalo encurtados para o teste levar segundos.
+# ============================================================
+import json
+import socketserver
+import threading
+import time
+
+import pytest
+
+import notificador
+from notificador import Notificador, Remetente, RemetenteEmail, RemetenteWebhook
+
+
+def _evento(host, status, ts=1000):
+    return {"ts": ts, "host": host, "nome": host.title(), "status": status}
+
+
+def _esperar(condicao, limite=5.0):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if condicao():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def rapido(monkeypatch):
+    monkeypatch.setattr(notificador, "JANELA_NOTIFICACAO", 0.3)
+    monkeypatch.setattr(notificador, "INTERVALO_MINIMO", 0.6)
+
+
+@pytest.fixture
+def webhook(stub_http):
+    return stub_http(lambda metodo, caminho, corpo: (200, {}, b"ok"))
+
+
+def _lotes(stub):
+    return [json.loads(corpo) for metodo, _, corpo in stub.pedidos if metodo == "POST"]
+
+# -------------------------------
+# STUB SMTP
+# -------------------------------
+
+class _SMTP(socketserver.StreamRequestHandler):
+    def _linha(self, texto):
+        self.wfile.write(texto.encode() + b"\r\n")
+
+    def handle(self):
+        self._linha("220 stub")
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            cmd = linha.decode().strip().upper()
+            if cmd.startswith(("EHLO", "HELO")):
+                self._linha("250 stub")
+            elif cmd == "DATA":
+                self._linha("354 fim com .")
+                dados = []
+                while True:
+                    l = self.rfile.readline()
+                    if l in (b".\r\n", b".\n", b""):
+                        break
+                    dados.append(l)
+                self.server.mensagens.append(b"".join(dados).decode())
+                self._linha("250 ok")
+            elif cmd == "QUIT":
+                self._linha("221 tchau")
+                return
+            else:
+                self._linha("250 ok")
+
+
+@pytest.fixture
+def smtp():
+    servidor = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTP)
+    servidor.daemon_threads = True
+    servidor.mensagens = []
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+# -------------------------------
+# TESTES
+# -------------------------------
+
+def test_remetente_e_abstrato():
+    with pytest.raises(TypeError):
+        Remetente()
+
+
+def test_eventos_da_janela_saem_num_unico_lote(rapido, webhook):
+    n = Notificador([RemetenteWebhook(webhook.url)])
+    n.iniciar()
+    n.publicar([_evento("a", "DOWN")])
+    time.sleep(0.1)
+    n.publicar([_evento("b", "DOWN"), _evento("c", "DOWN")])
+    assert _esperar(lambda: len(webhook.pedidos) >= 1)
+    time.sleep(0.4)
+    lotes = _lotes(webhook)
+    assert len(lotes) == 1
+    assert sorted(e["host"] for e in lotes[0]["eventos"]) == ["a", "b", "c"]
+
+
+def test_repeticoes_do_mesmo_host_viram_um_evento(rapido, webhook):
+    n = Notificador([RemetenteWebhook(webhook.url)])
+    n.iniciar()
+    n.publicar([_evento("a", "DOWN"), _evento("a", "DOWN", 1001), _evento("a", "UP", 1002),
+                _evento("a", "DOWN", 1003), _evento("b", "DOWN"), _evento("b", "UP", 1001)])
+    assert _esperar(lambda: len(webhook.pedidos) >= 1)
+    lote = _lotes(webhook)[0]
+    # a termina DOWN (um aviso só); b caiu e voltou dentro da janela: nada
+    assert [(e["host"], e["status"], e["ts"]) for e in lote["eventos"]] == [("a", "DOWN", 1003)]
+
+
+def _lote(n, evento):
+    """montar_lote de um evento só, com o relógio no ts do evento."""
+    return n.montar_lote([("evento", evento)], agora=evento["ts"])
+
+
+def test_resfriamento_segura_nova_queda_do_mesmo_host():
+    n = Notificador()
+    assert _lote(n, _evento("a", "DOWN", 1000))["eventos"]
+    # retorno depois da queda avisada sai normalmente
+    assert _lote(n, _evento("a", "UP", 1100))["eventos"]
+    # nova queda dentro de 600 s: segurada (e o retorno seguinte também)
+    assert _lote(n, _evento("a", "DOWN", 1000 + notificador.RESFRIAMENTO_HOST - 1)) is None
+    assert _lote(n, _evento("a", "UP", 1650)) is None
+    # passado o resfriamento, a queda volta a ser avisada
+    lote = _lote(n, _evento("a", "DOWN", 1000 + notificador.RESFRIAMENTO_HOST))
+    assert [e["status"] for e in lote["eventos"]] == ["DOWN"]
+
+
+def test_queda_segurada_sai_no_fim_do_resfriamento_se_o_host_continua_down():
+    n = Notificador()
+    assert _lote(n, _evento("a", "DOWN", 1000))["eventos"]
+    assert _lote(n, _evento("a", "UP", 1100))["eventos"]
+    assert _lote(n, _evento("a", "DOWN", 1200)) is None   # segurada, e o host fica DOWN
+    assert n.montar_lote([], agora=1599) is None           # ainda no resfriamento
+    lote = n.montar_lote([], agora=1600)
+    assert [(e["host"], e["status"], e["ts"]) for e in lote["eventos"]] == [("a", "DOWN", 1200)]
+    assert n.montar_lote([], agora=2000) is None           # sai uma vez só
+    # o retorno depois do aviso atrasado também é avisado
+    assert [e["status"] for e in _lote(n, _evento("a", "UP", 2100))["eventos"]] == ["UP"]
+
+
+def test_queda_pendente_sai_pela_thread_sem_novo_evento(rapido, webhook, monkeypatch):
+    monkeypatch.setattr(notificador, "RESFRIAMENTO_HOST", 2.0)
+    n = Notificador([RemetenteWebhook(webhook.url)])
+    n.iniciar()
+    inicio = time.time()
+    n.publicar([_evento("a", "DOWN", inicio)])
+    assert _esperar(lambda: len(_lotes(webhook)) == 1)
+    n.publicar([_evento("a", "UP", time.time())])
+    assert _esperar(lambda: len(_lotes(webhook)) == 2)
+    n.publicar([_evento("a", "DOWN", time.time())])  # dentro do resfriamento: nada ainda
+    time.sleep(0.5)
+    assert len(_lotes(webhook)) == 2
+    assert _esperar(lambda: len(_lotes(webhook)) == 3)
+    assert time.time() - inicio >= notificador.RESFRIAMENTO_HOST
+    assert [e["status"] for e in _lotes(webhook)[2]["eventos"]] == ["DOWN"]
+
+
+def test_um_envio_por_intervalo_por_remetente(rapido, webhook, monkeypatch):
+    instantes = []
+    original = RemetenteWebhook.enviar
+
+    def enviar(self, lote):
+        instantes.append(time.monotonic())
+        original(self, lote)
+
+    monkeypatch.setattr(RemetenteWebhook, "enviar", enviar)
+    n = Notificador([RemetenteWebhook(webhook.url)])
+    n.iniciar()
+    n.publicar([_evento("a", "DOWN")])
+    assert _esperar(lambda: len(instantes) == 1)
+    n.publicar([_evento("b", "DOWN")])  # janela termina antes do intervalo
+    assert _esperar(lambda: len(instantes) == 2)
+    assert instantes[1] - instantes[0] >= notificador.INTERVALO_MINIMO - 0.05
+    assert _esperar(lambda: len(_lotes(webhook)) == 2)
+
+
+def test_email_pelo_stub_smtp(rapido, smtp):
+    porta = smtp.server_address[1]
+    n = Notificador([RemetenteEmail(f"127.0.0.1:{porta}", "mon@local", ["noc@local"])])
+    n.iniciar()
+    n.publicar([_evento("a", "DOWN"), _evento("b", "DOWN")])
+    assert _esperar(lambda: smtp.mensagens)
+    msg = smtp.mensagens[0]
+    assert "Subject: [Monitoramento] 2 host(s) DOWN" in msg
+    assert "DOWN: A (a)" in msg and "DOWN: B (b)" in msg
+    assert _esperar(lambda: n.enviados == 1) and n.falhas == 0
+
+
+def test_fila_cheia_descarta_sem_bloquear(monkeypatch, webhook):
+    monkeypatch.setattr(notificador, "TAMANHO_FILA", 5)
+    n = Notificador([RemetenteWebhook(webhook.url)])  # sem iniciar: ninguém consome
+    inicio = time.monotonic()
+    n.publicar([_evento(f"h{i}", "DOWN") for i in range(50)])
+    assert time.monotonic() - inicio < 0.5
+    assert n.descartados == 45
+    assert n._fila.qsize() == 5
@@ -0,0 +1,38 @@
+# ============================================================
+# test_publicador.py — arquivos publicados para o proxy
+# ============================================================
+import gzip
+import json
+import os
+
+from publicador import PublicadorEstatico
+
+
+def _ler(diretorio, rel):
+    with open(os.path.join(diretorio, rel), "rb") as f:
+        return f.read()
+
+
+def test_varredura_grava_status_incidentes_e_feed(tmp_path):
+    pub = PublicadorEstatico(str(tmp_path), varreduras=2)
+    for seq in (1, 2, 3):
+        hosts = json.dumps([{"host": f"h{seq}", "status": "DOWN"}]).encode()
+        pub.publicar_varredura(seq, 100.0 * seq, 'nagios "a"\\b', b"[1,2,3]", hosts, b'{"abertos":[]}')
+
+    assert _ler(tmp_path, "api/status") == b"[1,2,3]"
+    assert gzip.decompress(_ler(tmp_path, "api/status.gz")) == b"[1,2,3]"
+    assert json.loads(_ler(tmp_path, "api/incidents")) == {"abertos": []}
+
+    feed = json.loads(_ler(tmp_path, "api/mudancas"))  # origem com aspas e barra: JSON válido
+    assert (feed["seq"], feed["ts"], feed["origem"]) == (3, 300, 'nagios "a"\\b')
+    assert [(v["seq"], v["ts"], v["hosts"][0]["host"]) for v in feed["varreduras"]] == [
+        (2, 200, "h2"), (3, 300, "h3")]  # só as últimas, mais antiga primeiro
+    assert json.loads(gzip.decompress(_ler(tmp_path, "api/mudancas.gz"))) == feed
+    assert not [n for n in os.listdir(tmp_path / "api") if n.endswith(".tmp")]
+
+
+def test_feed_sem_origem(tmp_path):
+    pub = PublicadorEstatico(str(tmp_path))
+    pub.publicar_varredura(0, 0, None, b"[]", b"[]", b"{}")
+    assert json.loads(_ler(tmp_path, "api/mudancas")) == {"seq": 0, "ts": 0, "origem": None,
+                                                          "varreduras": [{"seq": 0, "ts": 0, "hosts": []}]}
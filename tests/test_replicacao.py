@@ -0,0 +1,154 @@
+# ============================================================
+# test_replicacao.py — líder e seguidor no mesmo processo
+# Cada nó é uma Replicacao servida por um stub HTTP com as rotas
+# /api/replica/estado e /api/replica/feed do server.py; "separados"
+# derruba a rede entre os dois (as duas rotas respondem 503).
+# Lease, long-poll e verificação encurtados para segundos.
+# ============================================================
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import replicacao
+from historico import Historico
+from replicacao import LIDER, SEGUIDOR, Replicacao, vence
+
+
+def _esperar(condicao, limite=8.0):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if condicao():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class No:
+    """Uma Replicacao com os callbacks do server trocados por listas."""
+
+    def __init__(self, stub_http, rede, nome):
+        self.nome = nome
+        self.rede = rede
+        self.stub = stub_http(self._responder)
+        self.rep = None
+        self.varreduras = []     # recebidas do líder
+        self.completos = []
+        self.pedidos_de_transicoes = []  # transicoes_desde pedido a este nó como líder
+        self.ultima = 0          # ts da última transição "no histórico" deste nó
+        self.seq = 0             # _cache["seq"] do server: vai no instantâneo completo
+
+    def _responder(self, metodo, caminho, corpo):
+        if self.rede["separados"] or self.rep is None:
+            return 503, {}, b""
+        url = urlsplit(caminho)
+        args = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/api/replica/estado":
+            dados = self.rep.estado()
+        else:
+            dados = self.rep.feed(args.get("sessao", ""), int(args["desde"]),
+                                  float(args["espera"]), int(args.get("historico", 0)))
+        return 200, {"Content-Type": "application/json"}, json.dumps(dados).encode()
+
+    def _instantaneo(self, transicoes_desde):
+        self.pedidos_de_transicoes.append(transicoes_desde)
+        return {"seq": self.seq, "ts": 0, "hosts": [], "transicoes": [[transicoes_desde, "h1", "DOWN", False]]}
+
+    def iniciar(self, par: "No"):
+        self.rep = Replicacao(par.stub.url, self.nome, "segredo")
+        self.rep.iniciar(self._instantaneo, self.varreduras.append, self.completos.append,
+                         lambda: self.ultima)
+
+
+@pytest.fixture
+def nos(stub_http, monkeypatch):
+    monkeypatch.setattr(replicacao, "LEASE_SEGUNDOS", 1.0)
+    monkeypatch.setattr(replicacao, "ESPERA_FEED", 0.3)
+    monkeypatch.setattr(replicacao, "INTERVALO_VERIFICACAO", 0.2)
+    rede = {"separados": False}
+    a, b = No(stub_http, rede, "a"), No(stub_http, rede, "b")
+    a.iniciar(b)
+    b.iniciar(a)
+    # os dois partem como seguidores: assume o de menor nome
+    assert _esperar(lambda: a.rep.papel == LIDER and (b.rep.lider or {}).get("no") == "a")
+    return a, b, rede
+
+
+def test_vence_por_termo_e_depois_por_nome():
+    assert vence(2, "b", 1, "a") and not vence(1, "a", 2, "b")
+    assert vence(1, "a", 1, "b") and not vence(1, "b", 1, "a")
+
+
+def test_token_comparado():
+    rep = Replicacao("http://par", "a", "segredo")
+    assert rep.autorizado("segredo")
+    assert not rep.autorizado("") and not rep.autorizado("segred0")
+    # sem token configurado, ninguém é autorizado
+    assert not Replicacao("http://par", "a").autorizado("")
+
+
+def test_seguidor_recebe_as_varreduras_do_lider(nos):
+    a, b, _ = nos
+    assert a.rep.termo == b.rep.termo == 1
+    for seq in (1, 2, 3):
+        a.rep.registrar_varredura({"seq": seq, "ts": 100 + seq, "inventario": "x",
+                                   "linhas": [], "rta": [], "perda": []})
+    assert _esperar(lambda: [v["seq"] for v in b.varreduras] == [1, 2, 3])
+    assert b.rep.seq_lider == 3
+
+
+def test_seguidor_assume_quando_o_lease_vence_e_o_termo_resolve_a_volta(nos):
+    a, b, rede = nos
+    rede["separados"] = True
+    inicio = time.monotonic()
+    # b fica sem contato: depois do lease assume com termo maior; a, isolado, segue líder
+    assert _esperar(lambda: b.rep.papel == LIDER)
+    assert time.monotonic() - inicio >= replicacao.LEASE_SEGUNDOS
+    assert b.rep.termo == 2 and a.rep.papel == LIDER and a.rep.termo == 1
+
+    # rede de volta: a vê b líder com termo maior, passa a seguidor e segue b,
+    # recomeçando pelo instantâneo completo com as transições desde a última sua
+    a.ultima = int(time.time()) - 60
+    rede["separados"] = False
+    assert _esperar(lambda: a.rep.papel == SEGUIDOR and (a.rep.lider or {}).get("no") == "b")
+    assert b.rep.papel == LIDER and a.rep.termo == 2
+    assert _esperar(lambda: a.completos)
+    assert b.pedidos_de_transicoes == [a.ultima]
+    assert a.completos[-1]["transicoes"] == [[a.ultima, "h1", "DOWN", False]]
+
+
+def test_feed_espera_depois_do_instantaneo_mesmo_sem_varredura(nos):
+    a, b, _ = nos
+    a.seq = 57  # líder recém-empossado: seq do estado > 0, nenhuma varredura registrada ainda
+    a.rep.sessao = "nova"  # b fica de outra sessão: recomeça pelo instantâneo completo
+    assert _esperar(lambda: b.rep.seq_lider == 57)
+    antes = sum(1 for _, caminho, _ in a.stub.pedidos if caminho.startswith("/api/replica/feed"))
+    time.sleep(1.0)
+    depois = sum(1 for _, caminho, _ in a.stub.pedidos if caminho.startswith("/api/replica/feed"))
+    # long-poll de ESPERA_FEED (0,3 s): poucos pedidos por segundo, não um laço
+    assert depois - antes <= 6
+    a.rep.registrar_varredura({"seq": 58, "ts": 200, "inventario": "x", "linhas": [], "rta": [], "perda": []})
+    assert _esperar(lambda: [v["seq"] for v in b.varreduras] == [58])
+
+
+def test_completo_limita_a_reposicao_de_transicoes(nos):
+    a, b, _ = nos
+    agora = int(time.time())
+    pedidos = len(a.pedidos_de_transicoes)
+    a.rep.sessao = "nova"  # força o recomeço pelo instantâneo completo
+    assert _esperar(lambda: len(a.pedidos_de_transicoes) > pedidos)
+    # b nunca gravou transição (0): só vem a janela de REPOSICAO_HISTORICO
+    assert agora - replicacao.REPOSICAO_HISTORICO <= a.pedidos_de_transicoes[-1] <= agora + 1 \
+        - replicacao.REPOSICAO_HISTORICO
+
+
+def test_importar_transicoes_completa_o_historico(tmp_path):
+    h = Historico(str(tmp_path / "h.sqlite3"))
+    h.importar_transicoes([(100, "h1", "DOWN", False), (200, "h1", "UP", False),
+                           (150, "h2", "WARNING", True)])
+    h.importar_transicoes([(100, "h1", "UP", True)])  # já existe: fica a primeira
+    assert list(h.transicoes(0, 1000)) == [(100, "h1", "DOWN", False), (150, "h2", "WARNING", True),
+                                           (200, "h1", "UP", False)]
+    assert h.ultima_transicao() == 200
+    assert sorted(h.estado_em(160)) == [("h1", "DOWN", False), ("h2", "WARNING", True)]